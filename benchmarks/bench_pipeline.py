@@ -0,0 +1,301 @@
+"""
+Benchmark: Throughput y Latencia del Pipeline
+=============================================
+
+Mide el pipeline completo (preparar imagen, enviar, esperar el render,
+consultar estado, descargar) contra kling_mock_server, con imágenes
+sintéticas de varios tamaños y lotes de varios tamaños.
+
+Por escenario (tamaño de imagen x tamaño de lote) reporta:
+  - clips/hora y segundos totales
+  - latencia punta a punta p50/p95/p99 (desde que el lote arranca)
+  - tiempo medio por etapa: preparar, cola local, submit, render,
+    demora en detectar el fin (polling) y descarga
+  - requests HTTP por clip y bytes subidos por clip (contados por el
+    servidor simulado)
+  - pico de RSS del proceso (y de sus workers de preprocesamiento)
+
+Cada escenario corre en un subproceso propio (ru_maxrss es por proceso).
+Los tiempos de render del servidor y el calendario de polling se
+escalan con --time-scale, así una hora de render cabe en segundos;
+el resto (codificar, subir, descargar) corre a velocidad real.
+
+Uso:
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --sizes 1080x1920,6000x8000 --batches 4,16 --output pipeline.json
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kling_api_correcto import KlingAPICorrect  # noqa: E402
+from kling_batch import BatchEngine, BatchJob  # noqa: E402
+from kling_mock_server import MockConfig, MockKlingServer  # noqa: E402
+from kling_polling import AdaptivePolling, BatchStatusPoller  # noqa: E402
+from kling_preprocess import preprocess_image  # noqa: E402
+
+
+def max_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano (0 si no hay valores)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def synthetic_image(path: str, width: int, height: int) -> None:
+    """Foto sintética: ruido sobre un degradado, comprime como una real"""
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, Image.blend(noise, gradient, 0.5)))
+    img.save(path, format="JPEG", quality=95)
+
+
+class TimedClient(KlingAPICorrect):
+    """Cliente que anota cuándo empieza y termina cada etapa por imagen"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.marks: Dict[str, Dict[str, float]] = {}
+
+    def _mark(self, image_path: str, name: str) -> None:
+        self.marks.setdefault(str(image_path), {})[name] = time.time()
+
+    def image_to_video(self, image_path, *args, **kwargs):
+        self._mark(image_path, "submit_start")
+        try:
+            return super().image_to_video(image_path, *args, **kwargs)
+        finally:
+            self._mark(image_path, "submit_end")
+
+    def download_video(self, video_url, output_path, expected_sha256=None):
+        start = time.time()
+        ok = super().download_video(video_url, output_path, expected_sha256)
+        self.marks.setdefault(output_path, {}).update(download_start=start, download_end=time.time())
+        return ok
+
+
+class TimedPoller(BatchStatusPoller):
+    """Poller que anota cuándo se vio terminada cada tarea"""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.seen: Dict[str, Dict[str, float]] = {}
+
+    def poll(self, task_ids):
+        results = super().poll(task_ids)
+        now = time.time()
+        for task_id, result in results.items():
+            data = result.get("data") or {}
+            if data.get("task_status") in ("succeed", "failed") and task_id not in self.seen:
+                # Mock updated_at stops at the render end time
+                self.seen[task_id] = {"seen_at": now, "done_at": data.get("updated_at", 0) / 1000}
+        return results
+
+
+def scaled_polling(time_scale: float) -> AdaptivePolling:
+    """AdaptivePolling por defecto con todos sus tiempos escalados"""
+    polling = AdaptivePolling(
+        min_interval=5 * time_scale,
+        max_interval=60 * time_scale,
+        default_eta=180 * time_scale
+    )
+    polling.DEFAULT_ETAS = {key: eta * time_scale for key, eta in AdaptivePolling.DEFAULT_ETAS.items()}
+    return polling
+
+
+def run_child(args) -> None:
+    """Corre un escenario y escribe su resultado JSON en stdout"""
+    work = Path(args.workdir)
+    outputs = work / "outputs"
+    outputs.mkdir(exist_ok=True)
+
+    # One file per job so stage marks are keyed by path
+    images = []
+    for i in range(args.batch):
+        path = work / f"img_{i:03d}.jpg"
+        shutil.copy(args.image, path)
+        images.append(str(path))
+
+    # Clips, manifest and clip numbers stay in the scratch directory
+    client = TimedClient("mock-access", "mock-secret", api_domain=args.url, outputs_folder=outputs)
+    client.polling = scaled_polling(args.time_scale)
+    client.preprocess = not args.no_preprocess
+    poller = TimedPoller(client)
+
+    # Preparation runs in the engine's process pool; time it there too
+    prepare_s = 0.0
+    if client.preprocess:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.submit(int).result()  # worker startup outside the timing
+            start = time.perf_counter()
+            pool.submit(preprocess_image, args.image).result()
+            prepare_s = time.perf_counter() - start
+
+    stats_url = f"{args.url}/mock/stats"
+    before = requests.get(stats_url, timeout=10).json()["data"]
+    baseline_rss = max_rss_mb()
+
+    jobs = [BatchJob(image_path=path, clip_number=i + 1, prompt="bench")
+            for i, path in enumerate(images)]
+    started_at = time.time()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        BatchEngine(client, max_concurrency=args.concurrency, poller=poller).run(jobs)
+    wall = time.time() - started_at
+
+    after = requests.get(stats_url, timeout=10).json()["data"]
+    delta = {key: after[key] - before[key] for key in before if key != "active"}
+
+    done = [job for job in jobs if job.status == "succeed"]
+    stages = {"queue": [], "submit": [], "render": [], "poll_lag": [], "download": []}
+    latencies = []
+    for job in done:
+        marks = client.marks.get(job.image_path, {})
+        dl = client.marks.get(str(job.output_path), {})
+        seen = poller.seen.get(job.task_id, {})
+        latencies.append(job.finished_at - started_at)
+        stages["queue"].append(marks["submit_start"] - started_at)
+        stages["submit"].append(marks["submit_end"] - marks["submit_start"])
+        stages["render"].append(seen["done_at"] - marks["submit_end"])
+        stages["poll_lag"].append(seen["seen_at"] - seen["done_at"])
+        stages["download"].append(dl["download_end"] - dl["download_start"])
+
+    requests_made = delta["submit"] + delta["status"] + delta["list"] + delta["download"]
+    clips = max(1, len(done))
+    print(json.dumps({
+        "image": args.size,
+        "image_mb": round(os.path.getsize(args.image) / (1024 * 1024), 2),
+        "batch": args.batch,
+        "concurrency": args.concurrency,
+        "preprocess": client.preprocess,
+        "time_scale": args.time_scale,
+        "succeeded": len(done),
+        "wall_seconds": round(wall, 2),
+        "clips_per_hour": round(len(done) / wall * 3600, 1),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "stages_mean_s": dict(
+            {"prepare": round(prepare_s, 3)},
+            **{name: round(mean(values), 3) for name, values in stages.items()}
+        ),
+        "requests_per_clip": round(requests_made / clips, 2),
+        "requests": delta,
+        "bytes_uploaded_per_clip": delta["bytes_uploaded"] // clips,
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+        "peak_worker_rss_mb": round(max_rss_mb(resource.RUSAGE_CHILDREN), 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput y latencia del pipeline contra el servidor simulado")
+    parser.add_argument("--sizes", default="1080x1920,3000x4000,6000x8000",
+                        help="Tamaños de imagen sintética (ANCHOxALTO, separados por coma)")
+    parser.add_argument("--batches", default="3,12", help="Tamaños de lote (separados por coma)")
+    parser.add_argument("--concurrency", type=int, default=3, help="Tareas simultáneas (y cuota del servidor)")
+    parser.add_argument("--render-time", default="uniform:120:300", help="Distribución de render (segundos reales)")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Escala de render y polling")
+    parser.add_argument("--no-preprocess", action="store_true", help="Subir las imágenes sin ajustar")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_pipeline.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    parser.add_argument("--batch", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    config = MockConfig(
+        render_time=args.render_time,
+        time_scale=args.time_scale,
+        concurrency_quota=args.concurrency,
+        seed=args.seed
+    )
+
+    results = []
+    with MockKlingServer(config) as server, tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes.split(","):
+            width, height = (int(v) for v in size.lower().split("x"))
+            image_path = os.path.join(tmp, f"source_{size}.jpg")
+            synthetic_image(image_path, width, height)
+
+            for batch in (int(b) for b in args.batches.split(",")):
+                workdir = tempfile.mkdtemp(dir=tmp)
+                command = [
+                    sys.executable, __file__, "--child",
+                    "--url", server.url,
+                    "--image", image_path,
+                    "--size", size,
+                    "--batch", str(batch),
+                    "--workdir", workdir,
+                    "--concurrency", str(args.concurrency),
+                    "--time-scale", str(args.time_scale)
+                ]
+                if args.no_preprocess:
+                    command.append("--no-preprocess")
+
+                print(f"[BENCH] {size} x {batch} clips...", flush=True)
+                results.append(json.loads(subprocess.check_output(command)))
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'Imagen':<12}{'Lote':>6}{'Clips/h':>10}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'Req/clip':>10}{'KB/clip':>10}{'RSS':>9}")
+    for r in results:
+        print(f"{r['image']:<12}{r['batch']:>6}{r['clips_per_hour']:>10.0f}"
+              f"{r['latency_p50']:>7.2f}s{r['latency_p95']:>7.2f}s{r['latency_p99']:>7.2f}s"
+              f"{r['requests_per_clip']:>10.2f}{r['bytes_uploaded_per_clip'] / 1024:>10.0f}"
+              f"{r['peak_rss_mb']:>7.1f}MB")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "render_time": args.render_time,
+            "time_scale": args.time_scale,
+            "concurrency": args.concurrency,
+            "preprocess": not args.no_preprocess,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\n[OK] Resultados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark: Memoria por Envío Concurrente
+========================================
+
+Compara el pico de RSS por envío de image2video concurrente:
+  - legacy:    bytes -> base64 -> str -> json=payload (código original)
+  - streaming: StreamingJSONBody con la imagen mapeada en memoria
+
+Cada variante corre en un subproceso propio (ru_maxrss es por proceso)
+contra un servidor local que descarta el cuerpo. Los envíos arrancan a
+la vez y el servidor lee despacio, así todos coinciden en memoria.
+
+Uso:
+  python benchmarks/bench_submit_memory.py
+  python benchmarks/bench_submit_memory.py --size-mb 16 --concurrency 8 --output mem.json
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kling_body import StreamingJSONBody  # noqa: E402
+
+
+PAYLOAD = {
+    "model_name": "kling-v2-1",
+    "image": "",
+    "prompt": "subtle realistic movement",
+    "negative_prompt": "blurry, low quality, distorted, artifacts",
+    "cfg_scale": 0.5,
+    "mode": "pro",
+    "duration": 10,
+    "aspect_ratio": "9:16"
+}
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """Lee y descarta el cuerpo, despacio, y responde con un task_id"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        # Hold the request briefly so concurrent submissions overlap
+        time.sleep(0.5)
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+
+        body = b'{"code":0,"data":{"task_id":"bench"}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def submit_legacy(session: requests.Session, url: str, image_path: str) -> None:
+    with open(image_path, 'rb') as f:
+        image_data = base64.b64encode(f.read()).decode('utf-8')
+    payload = dict(PAYLOAD, image=image_data)
+    session.post(url, json=payload, timeout=120)
+
+
+def submit_streaming(session: requests.Session, url: str, image_path: str) -> None:
+    body = StreamingJSONBody(PAYLOAD, image_path)
+    session.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=120)
+
+
+def run_child(variant: str, url: str, image_path: str, concurrency: int) -> None:
+    """Corre una variante y escribe su resultado JSON en stdout"""
+    submit = submit_legacy if variant == "legacy" else submit_streaming
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        with requests.Session() as session:
+            barrier.wait()
+            submit(session, url, image_path)
+
+    # Warm up imports/connection machinery outside the measurement
+    with requests.Session() as session:
+        session.get(url.replace("/submit", "/health"), timeout=5)
+    baseline = max_rss_mb()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    peak = max_rss_mb()
+    print(json.dumps({
+        "variant": variant,
+        "concurrency": concurrency,
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+        "rss_per_submission_mb": round((peak - baseline) / concurrency, 2),
+        "seconds": round(elapsed, 2)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pico de RSS por envío concurrente")
+    parser.add_argument("--size-mb", type=float, default=8, help="Tamaño de la imagen sintética")
+    parser.add_argument("--concurrency", type=int, default=8, help="Envíos simultáneos")
+    parser.add_argument("--output", help="Archivo JSON con los resultados")
+    parser.add_argument("--child", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.url, args.image, args.concurrency)
+        return
+
+    class Handler(SinkHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/submit"
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Incompressible bytes: same size profile as a large photo
+        image_path = os.path.join(tmp, "synthetic.png")
+        with open(image_path, 'wb') as f:
+            f.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+
+        for variant in ("legacy", "streaming"):
+            output = subprocess.check_output([
+                sys.executable, __file__,
+                "--child", variant,
+                "--url", url,
+                "--image", image_path,
+                "--concurrency", str(args.concurrency)
+            ])
+            result = json.loads(output)
+            result["image_mb"] = args.size_mb
+            results.append(result)
+
+    server.shutdown()
+
+    print(f"\n{'Variante':<12}{'RSS pico':>12}{'RSS/envío':>14}{'Tiempo':>10}")
+    for r in results:
+        print(f"{r['variant']:<12}{r['peak_rss_mb']:>10.1f}MB{r['rss_per_submission_mb']:>12.2f}MB{r['seconds']:>9.2f}s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\n[OK] Resultados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,14 +13,27 @@ Obtener keys: https://app.klingai.com/global/dev/api-key
 
 Uso:
   python generar_automatico.py
+  python generar_automatico.py --reanudar   # continúa un lote interrumpido
+  python generar_automatico.py --sin-cache  # fuerza generar aunque exista en caché
+
+Para lotes sin interacción (cron, scripts) ver generar_lote.py.
 
 Selecciona:
   - 1 imagen específica
-  - 6 imágenes (reel 60s)
+  - 6 imágenes (reel 60s, unido con ffmpeg en outputs/reel_XX-YY.mp4)
   - Todas las imágenes
 
 Output: ./outputs/clip_XX.mp4
 
+Los clips se generan en paralelo hasta KLING_MAX_CONCURRENCY tareas
+simultáneas (por defecto 3, la cuota de tu cuenta).
+
+Con KLING_METRICS_FILE=outputs/metrics.prom se exportan al terminar
+los tiempos por etapa (ver kling_metrics.py).
+
+Con KLING_WEBHOOK=1 (o KLING_CALLBACK_URL) el fin de cada render llega
+por callback en lugar de polling (ver kling_webhook.py).
+
 Configuración de videos:
   - Modelo: Kling v2.1 Pro (Image2Video)
   - Aspect Ratio: 9:16 (Instagram Reels)
@@ -38,44 +51,54 @@ Date: October 2025
 import os
 import sys
 from pathlib import Path
-from PIL import Image
 from dotenv import load_dotenv
 from kling_api_correcto import KlingAPICorrect
+from kling_batch import BatchJob
+from kling_cache import ResultCache
+from kling_catalog import ImageCatalog
+from kling_jobs import JobStore
+from kling_metrics import configure_logging
+from kling_reel import ReelAssembler
+from kling_validation import ClipValidator
+from kling_webhook import CallbackReceiver
+from generar_lote import MOVEMENTS, MOVEMENT_OPTIONS, get_next_clip_number, reserve_clip_numbers, run_batch
 
 
 def list_images():
-    """Lista imágenes disponibles"""
+    """Lista imágenes disponibles (desde el catálogo, ver kling_catalog.py)"""
     images_folder = Path("images")
     if not images_folder.exists():
         print("ERROR: Carpeta 'images' no encontrada!")
         return []
 
-    images = list(images_folder.glob("*.png")) + list(images_folder.glob("*.jpg"))
-    images.sort(key=lambda x: x.name)
+    # Only new or modified files are read; the rest comes from the index
+    catalog = ImageCatalog(images_folder)
+    catalog.refresh()
+    images = catalog.list()
+    catalog.close()
 
     return images
 
 
-def get_next_clip_number():
-    """Obtiene siguiente número de clip disponible"""
-    outputs_folder = Path(__file__).parent / "outputs"
-    outputs_folder.mkdir(exist_ok=True)
+def reanudar(client, store, max_concurrency):
+    """Reanuda los trabajos sin terminar de una ejecución anterior"""
+    jobs = store.load_unfinished()
+
+    if not jobs:
+        print("\n[OK] No hay trabajos pendientes")
+        return
 
-    existing = list(outputs_folder.glob("clip_*.mp4"))
-    if not existing:
-        return 1
+    print(f"\n{'='*70}")
+    print(f"REANUDANDO {len(jobs)} TRABAJO(S)")
+    print(f"{'='*70}")
+    for job in jobs:
+        task = job.task_id or "sin enviar"
+        print(f"  Clip {job.clip_number:02d} - {Path(job.image_path).name} - {job.status} ({task})")
 
-    # Extraer números de los clips existentes
-    numbers = []
-    for clip in existing:
-        try:
-            num = int(clip.stem.split('_')[1])
-            numbers.append(num)
-        except (IndexError, ValueError):
-            continue
+    run_batch(client, jobs, store, max_concurrency, metrics_path=os.getenv("KLING_METRICS_FILE"))
 
-    # Retornar el número más alto + 1
-    return max(numbers) + 1 if numbers else 1
+    successful = len([j for j in jobs if j.status == "succeed"])
+    print(f"\n[OK] Reanudados: {successful}/{len(jobs)} completados")
 
 
 def main():
@@ -91,6 +114,9 @@ def main():
     # Load credentials from .env
     load_dotenv()
 
+    # Engine progress shares the console with the menus
+    configure_logging(stream=sys.stdout)
+
     access_key = os.getenv("KLING_ACCESS_KEY")
     secret_key = os.getenv("KLING_SECRET_KEY")
 
@@ -110,7 +136,33 @@ def main():
     # Initialize client
     client = KlingAPICorrect(access_key, secret_key)
     print(f"[OK] Cliente API inicializado")
-    print(f"[OK] Domain: api-singapore.klingai.com")
+    print(f"[OK] Domain: {client.api_domain}")
+
+    # Identical image + prompt + params are served from outputs/.cache
+    if "--sin-cache" not in sys.argv:
+        client.cache = ResultCache()
+
+    # Probe every download (KLING_VALIDATE=0 to skip)
+    client.validator = ClipValidator.from_env()
+
+    # Completion by callback with KLING_WEBHOOK=1 or KLING_CALLBACK_URL
+    client.webhook = CallbackReceiver.from_env()
+    if client.webhook is not None:
+        client.webhook.start()
+        print(f"[OK] Callbacks en: {client.webhook.url.split('?')[0]}")
+
+    # Durable job state: survives crashes, enables --reanudar
+    store = JobStore()
+    max_concurrency = int(os.getenv("KLING_MAX_CONCURRENCY", "3"))
+
+    if "--reanudar" in sys.argv:
+        reanudar(client, store, max_concurrency)
+        return
+
+    unfinished = store.load_unfinished()
+    if unfinished:
+        print(f"\n[!] Hay {len(unfinished)} trabajo(s) sin terminar de una ejecución anterior")
+        print("    Ejecuta: python generar_automatico.py --reanudar")
 
     # List images
     images = list_images()
@@ -121,11 +173,9 @@ def main():
     print(f"\n[OK] Encontradas {len(images)} imagenes\n")
 
     # Show images
-    for i, img_path in enumerate(images, 1):
-        img = Image.open(img_path)
-        w, h = img.size
-        size_mb = img_path.stat().st_size / (1024 * 1024)
-        print(f"{i:2d}. {img_path.name:<15} - {w}x{h} - {size_mb:.2f}MB")
+    for i, info in enumerate(images, 1):
+        size_mb = info.size / (1024 * 1024)
+        print(f"{i:2d}. {info.name:<15} - {info.width}x{info.height} - {size_mb:.2f}MB")
 
     print("\n" + "-"*70)
     print("OPCIONES:")
@@ -170,25 +220,13 @@ def main():
 
     movement_option = input("\nSelecciona movimiento (1-9, Enter=Static): ").strip() or "1"
 
-    movements = {
-        "1": "static camera, gentle subtle movement, preserve composition, natural breathing effect",
-        "2": "slow subtle zoom in, gentle approach, reveal details, smooth natural movement",
-        "3": "slow subtle zoom out, gentle pullback, reveal context, smooth expansive view",
-        "4": "slow subtle tilt up, gentle vertical rise, reveal upper elements, natural upward flow",
-        "5": "slow subtle tilt down, gentle vertical descent, reveal lower elements, natural downward flow",
-        "6": "",
-        "7": "subtle aerial movement forward, gentle floating effect, smooth forward glide, natural aerial perspective",
-        "8": "subtle aerial rise, gentle vertical lift, smooth elevation, natural ascending movement",
-        "9": "subtle orbital movement, gentle circular rotation, smooth panoramic reveal, natural rotating perspective"
-    }
-
     if movement_option == "6":
         custom = input("Prompt personalizado: ").strip()
     else:
-        custom = movements.get(movement_option, movements["1"])
+        custom = MOVEMENTS[MOVEMENT_OPTIONS.get(movement_option, "static")]
 
     # Confirm
-    next_clip = get_next_clip_number()
+    next_clip = get_next_clip_number(store, client.manifest)
     last_clip = next_clip + len(selected_images) - 1
 
     print(f"\n{'='*70}")
@@ -197,7 +235,9 @@ def main():
     print(f"Se generarán: {len(selected_images)} video(s)")
     print(f"Clips: {next_clip:02d} - {last_clip:02d}")
     print(f"Movimiento: {custom}")
-    print(f"Tiempo estimado: ~{len(selected_images) * 10} minutos")
+    rounds = -(-len(selected_images) // max_concurrency)
+    print(f"Concurrencia: {max_concurrency}")
+    print(f"Tiempo estimado: ~{rounds * 10} minutos")
 
     confirm = input("\n¿Continuar? (s/N): ").strip().lower()
     if confirm != 's':
@@ -207,34 +247,29 @@ def main():
     # Generate videos
     print(f"\n{'='*70}")
     print("GENERACIÓN AUTOMÁTICA INICIADA")
+    print(f"Concurrencia: {max_concurrency} tareas simultáneas")
     print(f"{'='*70}")
 
-    successful = 0
-    failed = 0
-
-    for i, image_path in enumerate(selected_images):
-        clip_number = next_clip + i
-
-        print(f"\n[{i+1}/{len(selected_images)}] Procesando {Path(image_path).name}...")
+    # Reserved now: another run or worker may have taken numbers meanwhile
+    next_clip = reserve_clip_numbers(len(selected_images), store, client.manifest)
+    jobs = [
+        BatchJob(image_path=info.path, clip_number=next_clip + i, prompt=custom)
+        for i, info in enumerate(selected_images)
+    ]
 
-        result = client.generate_video_complete(
-            str(image_path),
-            clip_number,
-            custom
-        )
+    # Option 2 is a reel: clips are stitched as they land, in image order
+    reel = None
+    if option == "2":
+        last_clip = next_clip + len(jobs) - 1
+        reel = ReelAssembler(Path(__file__).parent / "outputs" / f"reel_{next_clip:02d}-{last_clip:02d}.mp4",
+                             [job.clip_number for job in jobs])
 
-        if result:
-            successful += 1
-            print(f"\n[OK] Clip {clip_number:02d} completado!")
-        else:
-            failed += 1
-            print(f"\n[X] Clip {clip_number:02d} fallo")
+    run_batch(client, jobs, store, max_concurrency, metrics_path=os.getenv("KLING_METRICS_FILE"),
+              on_complete=reel.on_complete if reel else None)
+    reel_path = reel.finish() if reel else None
 
-        # Delay entre videos
-        if i < len(selected_images) - 1:
-            print("\nEsperando 15 segundos antes del siguiente...")
-            import time
-            time.sleep(15)
+    successful = len([j for j in jobs if j.status == "succeed"])
+    failed = len(jobs) - successful
 
     # Summary
     print(f"\n{'='*70}")
@@ -244,6 +279,8 @@ def main():
     print(f"Fallidos:  {failed}")
     print(f"Total:     {len(selected_images)}")
     print(f"\nVideos guardados en: ./outputs")
+    if reel_path:
+        print(f"Reel: {reel_path}")
     print("\n[OK] LISTOS PARA CAPCUT!")
 
 
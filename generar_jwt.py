@@ -14,9 +14,9 @@ Date: October 2025
 """
 
 import time
-import jwt
 from dotenv import load_dotenv
 import os
+from kling_auth import TokenProvider
 
 
 def generar_jwt():
@@ -35,19 +35,9 @@ def generar_jwt():
         print("KLING_SECRET_KEY=tu_secret_key")
         return None
     
-    # Generate JWT token según documentación oficial
-    headers = {
-        "alg": "HS256",
-        "typ": "JWT"
-    }
-    
-    payload = {
-        "iss": access_key,
-        "exp": int(time.time()) + 1800,  # Válido por 30 minutos
-        "nbf": int(time.time()) - 5       # Empieza 5s antes
-    }
-    
-    token = jwt.encode(payload, secret_key, headers=headers)
+    # Same signing logic as the API client
+    provider = TokenProvider(access_key, secret_key)
+    token = provider.get_token()
     
     return token
 
@@ -0,0 +1,489 @@
+"""
+Generador por Lotes (sin interacción) - Kling AI
+================================================
+
+Genera videos a partir de un manifiesto JSONL, sin preguntas: apto para
+cron, CI o para encadenar con otras herramientas por pipes.
+
+Cada línea del manifiesto es un trabajo:
+  {"image": "images/01.jpg", "movement": "zoom_in"}
+  {"image": "02.png", "prompt": "slow pan left", "mode": "std", "duration": 5}
+  {"image": "03.jpg", "movement": "aerial_orbit", "aspect_ratio": "16:9", "priority": 10}
+  {"image": "04.jpg", "mode": "std", "duration": 5, "deadline": 30}
+
+Campos:
+  image         Path de la imagen (o nombre dentro de images/) - obligatorio
+  movement      Nombre de MOVEMENTS o número del menú ("1"-"9")
+  prompt        Prompt personalizado (tiene prioridad sobre movement)
+  mode          "std" o "pro" (por defecto "pro")
+  duration      5 o 10 (por defecto 10)
+  aspect_ratio  "9:16", "16:9" o "1:1" (por defecto "9:16")
+  priority      Entero; los mayores se envían primero (por defecto 0);
+                desde 10 cuenta como vista previa (ver kling_scheduler)
+  deadline      Minutos desde ahora, o fecha ISO ("2025-10-20T08:00");
+                pasa adelante si corre riesgo de no llegar
+  id            Identificador libre que se devuelve en el resultado
+
+Por cada trabajo se escribe una línea JSON apenas termina:
+  {"id": ..., "line": 1, "image": ..., "clip_number": 7, "status": "succeed",
+   "task_id": ..., "output": "outputs/clip_07.mp4", "error": null, "seconds": 312.4}
+
+Las líneas inválidas producen un resultado con status "invalid" y el
+resto del lote sigue. Los mensajes de progreso van a stderr
+(KLING_LOG_JSON=1 para una línea JSON por evento).
+
+Uso:
+  python generar_lote.py manifiesto.jsonl
+  cat manifiesto.jsonl | python generar_lote.py - > resultados.jsonl
+  python generar_lote.py manifiesto.jsonl --output resultados.jsonl --concurrencia 5
+  python generar_lote.py manifiesto.jsonl --metricas outputs/metrics.prom
+  python generar_lote.py manifiesto.jsonl --reel outputs/reel.mp4
+  python generar_lote.py manifiesto.jsonl --encolar   # lo ejecutan los kling_worker.py
+  KLING_CALLBACK_URL=https://mi-tunel.example.com python generar_lote.py manifiesto.jsonl --webhook
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from kling_api_correcto import KlingAPICorrect
+from kling_batch import BatchEngine, BatchJob
+from kling_cache import ResultCache
+from kling_jobs import JobStore, LeaseKeeper, default_worker_id
+from kling_manifest import OutputManifest
+from kling_metrics import configure_logging
+from kling_preprocess import ASPECT_RATIOS
+from kling_reel import ReelAssembler
+from kling_validation import ClipValidator
+from kling_webhook import CallbackReceiver
+
+logger = logging.getLogger(__name__)
+
+
+MOVEMENTS = {
+    "static": "static camera, gentle subtle movement, preserve composition, natural breathing effect",
+    "zoom_in": "slow subtle zoom in, gentle approach, reveal details, smooth natural movement",
+    "zoom_out": "slow subtle zoom out, gentle pullback, reveal context, smooth expansive view",
+    "tilt_up": "slow subtle tilt up, gentle vertical rise, reveal upper elements, natural upward flow",
+    "tilt_down": "slow subtle tilt down, gentle vertical descent, reveal lower elements, natural downward flow",
+    "aerial_forward": "subtle aerial movement forward, gentle floating effect, smooth forward glide, natural aerial perspective",
+    "aerial_rise": "subtle aerial rise, gentle vertical lift, smooth elevation, natural ascending movement",
+    "aerial_orbit": "subtle orbital movement, gentle circular rotation, smooth panoramic reveal, natural rotating perspective"
+}
+
+# Interactive menu numbers ("6" is the custom prompt)
+MOVEMENT_OPTIONS = {
+    "1": "static",
+    "2": "zoom_in",
+    "3": "zoom_out",
+    "4": "tilt_up",
+    "5": "tilt_down",
+    "7": "aerial_forward",
+    "8": "aerial_rise",
+    "9": "aerial_orbit"
+}
+
+MODES = ("std", "pro")
+DURATIONS = (5, 10)
+
+
+def _open_manifest(manifest: Optional[OutputManifest]):
+    """El manifiesto dado (queda abierto) o el de outputs/ por defecto"""
+    if manifest is not None:
+        return contextlib.nullcontext(manifest)
+    return contextlib.closing(OutputManifest())
+
+
+def get_next_clip_number(store: Optional[JobStore] = None, manifest: Optional[OutputManifest] = None) -> int:
+    """
+    Siguiente número de clip libre, sin reservarlo (ver kling_manifest)
+
+    Args:
+        store: Registro de trabajos (sus números también cuentan como usados)
+        manifest: Manifiesto de la carpeta de salida (client.manifest)
+    """
+    with _open_manifest(manifest) as manifest:
+        last = manifest.last_clip_number()
+
+    # Numbers of jobs registered before the manifest existed are taken too
+    reserved = store.max_clip_number() if store else 0
+    return max(last, reserved) + 1
+
+
+def reserve_clip_numbers(
+    count: int,
+    store: Optional[JobStore] = None,
+    manifest: Optional[OutputManifest] = None
+) -> int:
+    """
+    Reserva `count` números de clip consecutivos
+
+    La reserva es atómica en el manifiesto de salidas: dos procesos que
+    encolan a la vez (o un worker y un lote) nunca reciben el mismo número.
+
+    Args:
+        count: Cantidad de clips
+        store: Registro de trabajos (sus números también cuentan como usados)
+        manifest: Manifiesto de la carpeta de salida (client.manifest); los
+            números se reservan donde se registran los clips
+
+    Returns:
+        El primer número reservado
+    """
+    floor = store.max_clip_number() if store else 0
+    with _open_manifest(manifest) as manifest:
+        return manifest.allocate_clip_numbers(count, floor=floor)
+
+
+def resolve_movement(movement: str) -> str:
+    """
+    Prompt de un movimiento por nombre o número de menú
+
+    Args:
+        movement: "zoom_in", "2", ...
+
+    Returns:
+        Prompt del movimiento
+
+    Raises:
+        ValueError: Si el movimiento no existe
+    """
+    name = MOVEMENT_OPTIONS.get(movement, movement)
+    if name not in MOVEMENTS:
+        raise ValueError(f"movimiento desconocido: {movement!r}")
+    return MOVEMENTS[name]
+
+
+def parse_deadline(value, now: Optional[float] = None) -> Optional[float]:
+    """
+    Deadline del manifiesto como epoch
+
+    Args:
+        value: Minutos desde ahora (número) o fecha ISO 8601 (hora local)
+        now: Momento de referencia (por defecto ahora)
+
+    Raises:
+        ValueError: Si el valor no es un número ni una fecha válida
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (now or time.time()) + value * 60
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    raise ValueError(f"deadline inválido: {value!r}")
+
+
+def parse_job(spec: Dict, clip_number: int) -> BatchJob:
+    """
+    Valida una línea del manifiesto y arma el trabajo
+
+    Args:
+        spec: Objeto JSON de la línea
+        clip_number: Número de clip a asignar
+
+    Returns:
+        Trabajo listo para el motor
+
+    Raises:
+        ValueError: Si falta un campo o tiene un valor inválido
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("cada línea debe ser un objeto JSON")
+
+    image = spec.get("image")
+    if not image:
+        raise ValueError("falta el campo 'image'")
+    image_path = Path(image)
+    if not image_path.exists() and (Path("images") / image).exists():
+        image_path = Path("images") / image
+    if not image_path.is_file():
+        raise ValueError(f"imagen no encontrada: {image}")
+
+    if spec.get("prompt"):
+        prompt = str(spec["prompt"])
+    else:
+        prompt = resolve_movement(str(spec.get("movement", "static")))
+
+    mode = spec.get("mode", "pro")
+    if mode not in MODES:
+        raise ValueError(f"mode inválido: {mode!r}")
+
+    try:
+        duration = int(spec.get("duration", 10))
+        priority = int(spec.get("priority", 0))
+    except (TypeError, ValueError):
+        raise ValueError("duration y priority deben ser enteros")
+    if duration not in DURATIONS:
+        raise ValueError(f"duration inválida: {duration}")
+
+    aspect_ratio = spec.get("aspect_ratio", "9:16")
+    if aspect_ratio not in ASPECT_RATIOS:
+        raise ValueError(f"aspect_ratio inválido: {aspect_ratio!r}")
+
+    try:
+        deadline = parse_deadline(spec.get("deadline"))
+    except ValueError:
+        raise ValueError(f"deadline inválido: {spec.get('deadline')!r}")
+
+    return BatchJob(
+        image_path=str(image_path),
+        clip_number=clip_number,
+        prompt=prompt,
+        mode=mode,
+        duration=duration,
+        aspect_ratio=aspect_ratio,
+        priority=priority,
+        deadline=deadline
+    )
+
+
+def read_manifest(lines: Iterable[str], next_clip: int) -> Tuple[List[Tuple[Dict, BatchJob]], List[Dict]]:
+    """
+    Lee un manifiesto JSONL
+
+    Args:
+        lines: Líneas del manifiesto
+        next_clip: Primer número de clip libre
+
+    Returns:
+        ([(meta, trabajo)], [resultados inválidos]); meta lleva id y línea
+    """
+    entries = []
+    invalid = []
+
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        meta = {"id": None, "line": line_no}
+        try:
+            spec = json.loads(line)
+            if isinstance(spec, dict):
+                meta["id"] = spec.get("id")
+            job = parse_job(spec, next_clip)
+        except ValueError as e:  # json.JSONDecodeError included
+            invalid.append(dict(meta, image=None, clip_number=None, status="invalid",
+                                task_id=None, output=None, error=str(e), seconds=None))
+            continue
+
+        entries.append((meta, job))
+        next_clip += 1
+
+    return entries, invalid
+
+
+def job_result(meta: Dict, job: BatchJob, started_at: float) -> Dict:
+    """Registro de resultado de un trabajo terminado"""
+    finished_at = job.finished_at or time.time()
+    return {
+        "id": meta["id"],
+        "line": meta["line"],
+        "image": job.image_path,
+        "clip_number": job.clip_number,
+        "status": job.status,
+        "task_id": job.task_id,
+        "output": str(job.output_path) if job.output_path else None,
+        "error": job.error,
+        "seconds": round(finished_at - started_at, 1)
+    }
+
+
+def run_batch(
+    client: KlingAPICorrect,
+    jobs: List[BatchJob],
+    store: Optional[JobStore] = None,
+    max_concurrency: int = 3,
+    on_complete: Optional[Callable[[BatchJob], None]] = None,
+    metrics_path: Optional[str] = None,
+    reserved_slots: int = 0
+) -> List[BatchJob]:
+    """
+    Ejecuta un lote en el motor
+
+    Args:
+        client: Cliente de la API
+        jobs: Trabajos a generar
+        store: Registro persistente (habilita --reanudar)
+        max_concurrency: Tareas simultáneas
+        on_complete: Llamado con cada trabajo apenas termina
+        metrics_path: Archivo donde exportar las métricas al terminar
+            (.prom -> Prometheus, otro -> JSON)
+        reserved_slots: Lugares solo para vistas previas y deadlines en riesgo
+
+    Returns:
+        Los trabajos ejecutados, con su estado final (sin los que ya
+        tenía otro proceso)
+    """
+    leases = None
+    if store is not None:
+        # Lease every job so kling_worker processes leave them alone
+        leases = LeaseKeeper(store, default_worker_id()).start()
+        acquired = set(store.acquire(leases.owner, [job.job_id for job in jobs if job.job_id is not None]))
+        mine = []
+        for job in jobs:
+            if job.job_id is None:
+                store.add(job, owner=leases.owner)
+            elif job.job_id not in acquired:
+                logger.warning(f"[!] Clip {job.clip_number:02d} lo está procesando otro proceso; se omite")
+                continue
+            leases.track(job.job_id)
+            mine.append(job)
+        jobs = mine
+
+    def complete(job: BatchJob) -> None:
+        if leases is not None:
+            leases.release(job.job_id)
+        if on_complete is not None:
+            on_complete(job)
+
+    engine = BatchEngine(client, max_concurrency=max_concurrency, store=store, on_complete=complete,
+                         reserved_slots=reserved_slots, owner=leases.owner if leases else None)
+    if leases is not None:
+        leases.on_lost = engine.drop
+    try:
+        return engine.run(jobs)
+    finally:
+        if leases is not None:
+            leases.stop()
+        if metrics_path:
+            client.metrics.write(metrics_path)
+            logger.info(f"[OK] Métricas en: {metrics_path}")
+
+
+def create_client(use_cache: bool = True, webhook: bool = False) -> Optional[KlingAPICorrect]:
+    """
+    Cliente con las credenciales del .env (None si faltan)
+
+    Args:
+        use_cache: Reutilizar clips cacheados
+        webhook: Completar por callback aunque KLING_WEBHOOK no esté activo
+    """
+    load_dotenv()
+
+    access_key = os.getenv("KLING_ACCESS_KEY")
+    secret_key = os.getenv("KLING_SECRET_KEY")
+    if not access_key or not secret_key:
+        return None
+
+    client = KlingAPICorrect(access_key, secret_key)
+    if use_cache:
+        # Identical image + prompt + params are served from outputs/.cache
+        client.cache = ResultCache()
+
+    # Probe every download; broken clips are fetched again or regenerated
+    client.validator = ClipValidator.from_env()
+
+    # Completion by callback when enabled (see kling_webhook)
+    client.webhook = CallbackReceiver.from_env(force=webhook)
+    if client.webhook is not None:
+        client.webhook.start()
+    return client
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Función principal; devuelve el código de salida"""
+    parser = argparse.ArgumentParser(description="Generación de videos desde un manifiesto JSONL")
+    parser.add_argument("manifest", help="Manifiesto JSONL ('-' para stdin)")
+    parser.add_argument("--output", "-o", help="Archivo de resultados JSONL (por defecto stdout)")
+    parser.add_argument("--concurrencia", type=int,
+                        default=int(os.getenv("KLING_MAX_CONCURRENCY", "3")),
+                        help="Tareas simultáneas (por defecto KLING_MAX_CONCURRENCY o 3)")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar clips cacheados")
+    parser.add_argument("--store", help="Archivo SQLite de trabajos (por defecto outputs/jobs.sqlite)")
+    parser.add_argument("--reservar", type=int, default=0,
+                        help="Lugares de render reservados para vistas previas (priority >= 10)")
+    parser.add_argument("--webhook", action="store_true",
+                        help="Esperar los callbacks de Kling en lugar de consultar (ver KLING_CALLBACK_URL)")
+    parser.add_argument("--metricas", default=os.getenv("KLING_METRICS_FILE"),
+                        help="Exportar métricas al terminar (.prom o .json; por defecto KLING_METRICS_FILE)")
+    parser.add_argument("--reel", help="Unir los clips exitosos, en el orden del manifiesto, en este .mp4")
+    parser.add_argument("--encolar", action="store_true",
+                        help="Solo registrar los trabajos en el store para kling_worker.py")
+    args = parser.parse_args(argv)
+
+    client = create_client(use_cache=not args.sin_cache, webhook=args.webhook)
+    configure_logging()
+    if client is None:
+        print("ERROR: Credenciales no configuradas en .env (KLING_ACCESS_KEY / KLING_SECRET_KEY)",
+              file=sys.stderr)
+        return 2
+
+    store = JobStore(args.store)
+
+    if args.manifest == "-":
+        lines = sys.stdin.readlines()
+    else:
+        lines = Path(args.manifest).read_text(encoding='utf-8').splitlines()
+
+    entries, invalid = read_manifest(lines, 0)
+
+    # Numbers are reserved in the store, so concurrent runs never collide
+    first_clip = reserve_clip_numbers(len(entries), store, client.manifest)
+    for i, (_, job) in enumerate(entries):
+        job.clip_number = first_clip + i
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    write_lock = threading.Lock()
+
+    def emit(record: Dict) -> None:
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    for record in invalid:
+        emit(record)
+
+    meta_by_job = {id(job): meta for meta, job in entries}
+    jobs = [job for _, job in entries]
+    started_at = time.time()
+
+    try:
+        if args.encolar:
+            # Left without a lease: any kling_worker.py may take them
+            for meta, job in entries:
+                store.add(job)
+                emit(job_result(meta, job, started_at))
+            return 1 if invalid else 0
+
+        # Clips are stitched while the rest of the batch renders
+        reel = ReelAssembler(args.reel, [job.clip_number for job in jobs]) if args.reel else None
+
+        def complete(job: BatchJob) -> None:
+            emit(job_result(meta_by_job[id(job)], job, started_at))
+            if reel is not None:
+                reel.on_complete(job)
+
+        # Progress output must not interleave with the JSONL stream
+        with contextlib.redirect_stdout(sys.stderr):
+            run_batch(client, jobs, store, args.concurrencia, on_complete=complete,
+                      metrics_path=args.metricas, reserved_slots=args.reservar)
+            if reel is not None:
+                reel.finish()
+    finally:
+        store.close()
+        if client.webhook is not None:
+            client.webhook.stop()
+        if out is not sys.stdout:
+            out.close()
+
+    failed = len(invalid) + len([j for j in jobs if j.status != "succeed"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
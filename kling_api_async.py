@@ -0,0 +1,600 @@
+"""
+Kling AI API Client - Asíncrono
+===============================
+
+Versión asyncio de KlingAPICorrect, con la misma superficie:
+  - image_to_video()          -> envía la tarea
+  - check_task_status()       -> consulta el estado
+  - list_tasks()              -> lista paginada de tareas
+  - wait_for_completion()     -> espera sin bloquear el event loop
+  - download_video()          -> descarga en streaming, reanudable
+  - generate_video_complete() -> proceso completo
+
+Todas las llamadas comparten una única sesión aiohttp con pool de
+conexiones, así un solo proceso puede mantener cientos de tareas en
+vuelo sin un thread por trabajo.
+
+Uso:
+  async with KlingAPIAsync(access_key, secret_key) as client:
+      results = await asyncio.gather(*[
+          client.generate_video_complete(path, n, prompt)
+          for n, path in enumerate(images, 1)
+      ])
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from kling_api_correcto import BASE_PROMPT, KlingClientBase, extract_video_url, response_code
+from kling_body import StreamingJSONBody
+from kling_download import CHUNK_SIZE, discard, finalize, parse_content_range, part_path_for
+from kling_manifest import CACHE
+from kling_metrics import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class KlingAPIAsync(KlingClientBase):
+    """
+    Cliente asíncrono para Kling AI
+    """
+
+    # Wait between tries for a free render slot (see RateLimiter.acquire_slot)
+    SLOT_POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        max_connections: int = 100,
+        max_concurrency: Optional[int] = None,
+        route_cache: Optional[str] = None,
+        api_domain: Optional[str] = None,
+        outputs_folder: Optional[str] = None
+    ):
+        """
+        Inicializar cliente
+
+        Args:
+            access_key: AccessKey de Kling AI
+            secret_key: SecretKey de Kling AI
+            max_connections: Tamaño del pool de conexiones HTTP
+            max_concurrency: Límite de generate_video_complete simultáneos
+                (None = sin límite)
+            route_cache: Archivo JSON donde persistir el endpoint de estado aprendido
+            api_domain: URL base de la API (por defecto KLING_API_DOMAIN o la oficial)
+            outputs_folder: Carpeta de clips y manifiesto (por defecto outputs/)
+        """
+        super().__init__(access_key, secret_key, route_cache, api_domain, outputs_folder)
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "KlingAPIAsync":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Sesión HTTP compartida (se crea al primer uso)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        """Cierra la sesión y el pool de conexiones"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _throttle(self, kind: str) -> None:
+        """Espera el turno de self.limiter sin bloquear el event loop"""
+        delay = self.limiter.reserve(kind)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _acquire_slot(self) -> None:
+        """limiter.acquire_slot() sin bloquear el event loop ni ocupar un thread"""
+        while not self.limiter.acquire_slot(timeout=0):
+            await asyncio.sleep(self.SLOT_POLL_SECONDS)
+
+    async def image_to_video(
+        self,
+        image_path: str,
+        prompt: str = BASE_PROMPT,
+        duration: int = 10,
+        mode: str = "pro",
+        aspect_ratio: str = "9:16",
+        image_bytes: Optional[bytes] = None
+    ) -> Optional[str]:
+        """
+        Genera video desde imagen
+
+        Args:
+            image_path: Path a la imagen
+            prompt: Prompt para generación
+            duration: Duración en segundos
+            mode: "std" o "pro"
+            aspect_ratio: "9:16" para Instagram Reels
+            image_bytes: Imagen ya preprocesada (evita leer image_path)
+
+        Returns:
+            Task ID si exitoso, None si falla
+        """
+        log = {"image": Path(image_path).name, "mode": mode, "duration": duration}
+        logger.info(f"Generando video desde: {Path(image_path).name} ({mode}, {duration}s, {aspect_ratio})",
+                    extra=dict(log, aspect_ratio=aspect_ratio))
+
+        # Preprocessing runs off the event loop
+        loop = asyncio.get_running_loop()
+        if image_bytes is None and self.preprocess:
+            try:
+                image_bytes = await loop.run_in_executor(None, self.load_image, image_path, aspect_ratio)
+            except Exception as e:
+                logger.error(f"ERROR: No se pudo leer la imagen: {e}", extra=log)
+                return None
+        image_source = image_bytes if image_bytes is not None else str(image_path)
+
+        url = f"{self.api_domain}/v1/videos/image2video"
+        payload = self.build_payload("", prompt, duration, mode, aspect_ratio)
+
+        try:
+            for attempt in range(self.SUBMIT_RETRIES + 1):
+                await self._throttle("submit")
+
+                # Base64 is encoded chunk by chunk; fixed length, not chunked
+                body = StreamingJSONBody(payload, image_source)
+                headers = self.get_headers()
+                headers["Content-Length"] = str(len(body))
+
+                start = time.perf_counter()
+                try:
+                    async with self.session.post(
+                        url,
+                        headers=headers,
+                        data=_iterate_async(body),
+                        timeout=aiohttp.ClientTimeout(total=60)
+                    ) as response:
+                        self.observe_response(response.status, response.headers)
+                        text = await response.text()
+                except Exception:
+                    self.record_submit(0, time.perf_counter() - start, len(body), False)
+                    raise
+
+                throttled = self.limiter.observe("submit", response.status, response.headers, response_code(text))
+                self.record_submit(response.status, time.perf_counter() - start, len(body), throttled)
+                if not throttled:
+                    break
+                logger.warning(f"[!] Límite de la API (status {response.status}), "
+                               f"reintento {attempt + 1}/{self.SUBMIT_RETRIES}",
+                               extra=dict(log, status=response.status, attempt=attempt + 1))
+
+            if response.status != 200:
+                logger.error(f"ERROR: Submit rechazado - Status {response.status}: {text[:500]}",
+                             extra=dict(log, status=response.status))
+                return None
+
+            result = json.loads(text)
+            task_id = result.get("data", {}).get("task_id")
+
+            if task_id:
+                logger.info(f"[OK] Task ID: {task_id}", extra=dict(log, task_id=task_id))
+                return task_id
+
+            logger.error(f"ERROR: No se obtuvo task_id: {text[:500]}", extra=log)
+            return None
+
+        except Exception as e:
+            logger.error(f"ERROR: {str(e)}", extra=log)
+            return None
+
+    async def check_task_status(self, task_id: str, task_type: str = "image2video") -> Dict:
+        """
+        Verifica estado de la tarea (un solo request una vez aprendida la ruta)
+
+        Args:
+            task_id: ID de la tarea
+            task_type: Tipo de tarea (clave de la ruta aprendida)
+
+        Returns:
+            Dictionary con estado y resultado; {"throttled": True} si la
+            consulta fue limitada (429 / 1302 / 1303) y la tarea sigue
+        """
+        headers = self.get_headers()
+        learned = self.routes.is_learned(task_type)
+
+        for template in self.routes.candidates(task_type):
+            url = f"{self.api_domain}{template.format(task_id=task_id)}"
+            await self._throttle("status")
+            self.metrics.inc("kling_status_requests_total", endpoint="task")
+
+            try:
+                async with self.session.get(
+                    url,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    self.observe_response(response.status, response.headers)
+                    text = await response.text()
+                    code = response_code(text)
+                    if self.limiter.observe("status", response.status, response.headers, code):
+                        # Throttled, not failed: the limiter paused status polls
+                        return {"throttled": True, "code": code}
+
+                    if response.status == 200:
+                        self.routes.record(task_type, template)
+                        return json.loads(text)
+                    elif response.status == 404 and not learned:
+                        continue
+                    else:
+                        return {"error": f"Status {response.status}: {text}"}
+
+            except Exception as e:
+                return {"error": f"Request failed: {str(e)}"}
+
+        return {"error": f"No valid endpoint found for task {task_id}"}
+
+    async def list_tasks(self, page_num: int = 1, page_size: int = 500) -> Dict:
+        """
+        Lista tareas image2video de la cuenta (más recientes primero)
+
+        Args:
+            page_num: Página, empezando en 1
+            page_size: Tareas por página (máx 500)
+
+        Returns:
+            Dictionary con "data": lista de tareas, o "error"
+        """
+        url = f"{self.api_domain}/v1/videos/image2video"
+        params = {"pageNum": page_num, "pageSize": page_size}
+        await self._throttle("status")
+        self.metrics.inc("kling_status_requests_total", endpoint="list")
+
+        try:
+            async with self.session.get(
+                url,
+                headers=self.get_headers(),
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                self.observe_response(response.status, response.headers)
+                self.limiter.observe("status", response.status, response.headers)
+
+                if response.status == 200:
+                    return await response.json(content_type=None)
+                text = await response.text()
+                return {"error": f"Status {response.status}: {text}"}
+
+        except Exception as e:
+            return {"error": f"Request failed: {str(e)}"}
+
+    async def wait_for_completion(
+        self,
+        task_id: str,
+        max_wait_minutes: int = 15,
+        mode: str = "pro",
+        duration: int = 10
+    ) -> Optional[str]:
+        """
+        Espera a que el video se complete (calendario de self.polling,
+        o el callback de self.webhook si está configurado)
+
+        Args:
+            task_id: ID de la tarea
+            max_wait_minutes: Tiempo máximo de espera en minutos
+            mode: "std" o "pro" (para estimar el tiempo de render)
+            duration: Duración del clip en segundos
+
+        Returns:
+            URL del video si exitoso, None si falla
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + max_wait_minutes * 60
+        polls = 0
+        queue_seconds = None
+        log = {"task_id": task_id}
+
+        while loop.time() < deadline:
+            if self.webhook is not None:
+                # Resolved from the receiver's thread; no executor thread is held
+                timeout = min(self.webhook.safety_interval, deadline - loop.time())
+                future = self.webhook.watch(task_id, loop)
+                await asyncio.wait({future}, timeout=max(0, timeout))
+                self.webhook.unwatch(task_id, future)
+                results = self.webhook.drain(task_id)
+                self.metrics.inc("kling_callbacks_total", len(results))
+            else:
+                delay = self.polling.next_delay(loop.time() - start, mode, duration)
+                await asyncio.sleep(max(0, min(delay, deadline - loop.time())))
+                results = []
+
+            if not results:
+                results = [await self.check_task_status(task_id)]
+                polls += 1
+
+            for result in results:
+                elapsed = loop.time() - start
+
+                if result.get("throttled"):
+                    # The task keeps rendering; the next poll waits out the limiter's pause
+                    logger.info(f"Consulta de estado limitada: {task_id}; se sigue esperando", extra=log)
+                    continue
+
+                if "error" in result:
+                    if elapsed < self.REGISTRATION_GRACE_SECONDS:
+                        # Task may not be registered yet
+                        continue
+                    logger.error(f"Error verificando estado de {task_id}: {result['error']}", extra=log)
+                    return None
+
+                status = result.get("data", {}).get("task_status")
+
+                if status == "processing" and queue_seconds is None:
+                    queue_seconds = elapsed
+
+                if status == "succeed":
+                    video_url = extract_video_url(result)
+                    if video_url:
+                        self.record_completion(status, elapsed, polls, mode, duration, queue_seconds)
+                        logger.info(f"[OK] Generacion completada: {task_id} ({elapsed:.0f}s, {polls} consultas)",
+                                    extra=dict(log, seconds=round(elapsed, 1), polls=polls))
+                        return video_url
+                    logger.error(f"ERROR: No se encontró URL del video para {task_id}", extra=log)
+                    return None
+
+                elif status == "failed":
+                    self.record_completion(status, elapsed, polls, mode, duration, queue_seconds)
+                    logger.error(f"ERROR: Generación falló: {task_id}", extra=log)
+                    return None
+
+        self.metrics.inc("kling_tasks_total", result="timeout")
+        logger.error(f"ERROR: Timeout esperando generación de {task_id}", extra=log)
+        return None
+
+    async def download_video(
+        self,
+        video_url: str,
+        output_path: str,
+        expected_sha256: Optional[str] = None,
+        max_resumes: int = 5,
+        chunk_size: int = CHUNK_SIZE
+    ) -> bool:
+        """
+        Descarga video en streaming, reanudable y con escritura atómica
+
+        Misma lógica que kling_download.stream_download: bloques a un
+        archivo .part, reanudación con HTTP Range y rename al verificar.
+
+        Args:
+            video_url: URL del video
+            output_path: Path donde guardar
+            expected_sha256: Checksum esperado (opcional)
+            max_resumes: Reintentos de reanudación tras un corte
+            chunk_size: Tamaño de cada bloque en bytes
+
+        Returns:
+            True si exitoso
+        """
+        part_path = part_path_for(output_path)
+        expected_size = None
+        await self._throttle("download")
+        t0 = time.perf_counter()
+
+        for attempt in range(max_resumes + 1):
+            if attempt:
+                self.metrics.inc("kling_retries_total", kind="download")
+
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                async with self.session.get(
+                    video_url,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=None, sock_read=300)
+                ) as response:
+                    if response.status == 429:
+                        # The limiter slows the download bucket; wait our turn and retry
+                        self.limiter.observe("download", response.status, response.headers)
+                        await self._throttle("download")
+                        continue
+
+                    if response.status == 416:
+                        _, expected_size = parse_content_range(response.headers.get("Content-Range"))
+                        if expected_size is not None and offset == expected_size:
+                            break
+                        part_path.unlink()
+                        continue
+
+                    if response.status == 206:
+                        range_start, expected_size = parse_content_range(response.headers.get("Content-Range"))
+                        if range_start != offset:
+                            part_path.unlink()
+                            continue
+                        mode = 'ab'
+                    elif response.status == 200:
+                        expected_size = response.content_length
+                        mode = 'wb'
+                    else:
+                        logger.error(f"ERROR: Download failed - Status {response.status}")
+                        return False
+
+                    with open(part_path, mode) as f:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            f.write(chunk)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.warning(f"Conexión interrumpida (intento {attempt + 1}): {str(e)}")
+                continue
+
+            if expected_size is None or part_path.stat().st_size >= expected_size:
+                break
+        else:
+            logger.error("ERROR: Se agotaron los reintentos de descarga")
+            return False
+
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(
+            None, finalize, part_path, output_path, expected_size, expected_sha256
+        )
+        if not digest:
+            return False
+
+        seconds = time.perf_counter() - t0
+        size = Path(output_path).stat().st_size
+        self.record_download(seconds, size)
+        logger.info(f"[OK] Video descargado: {size / (1024 * 1024):.2f}MB en {seconds:.1f}s -> {output_path}",
+                    extra={"output": str(output_path), "bytes": size, "seconds": round(seconds, 2)})
+        return True
+
+    async def generate_video_complete(
+        self,
+        image_path: str,
+        clip_number: int,
+        custom_prompt: str = "",
+        mode: str = "pro",
+        duration: int = 10,
+        aspect_ratio: str = "9:16"
+    ) -> Optional[Path]:
+        """
+        Proceso completo: generar y descargar video
+
+        Args:
+            image_path: Path a imagen
+            clip_number: Número de clip
+            custom_prompt: Personalización del prompt
+            mode: "std" (rápido, vista previa) o "pro"
+            duration: 5 o 10 segundos
+            aspect_ratio: Relación de aspecto
+
+        Returns:
+            Path del video generado o None
+        """
+        params = (image_path, clip_number, custom_prompt, mode, duration, aspect_ratio)
+        if not self.max_concurrency:
+            return await self._generate(*params)
+
+        # Created lazily so it binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            return await self._generate(*params)
+
+    async def _generate(
+        self,
+        image_path: str,
+        clip_number: int,
+        custom_prompt: str,
+        mode: str,
+        duration: int,
+        aspect_ratio: str
+    ) -> Optional[Path]:
+        full_prompt = self.build_prompt(custom_prompt)
+        output_file = self.outputs_folder / f"clip_{clip_number:02d}.mp4"
+        loop = asyncio.get_running_loop()
+
+        # Same image + params already generated? (hash and copy run off the loop)
+        key = None
+        if self.cache is not None:
+            try:
+                key = await loop.run_in_executor(
+                    None, self.result_cache_key, image_path, full_prompt, duration, mode, aspect_ratio
+                )
+            except OSError as e:
+                logger.error(f"ERROR: No se pudo leer la imagen: {e}", extra={"clip": clip_number})
+                return None
+            entry = await loop.run_in_executor(None, self.cache.get, key, output_file)
+            if entry:
+                self.metrics.inc("kling_tasks_total", result="cached")
+                logger.info(f"[CACHE] Clip reutilizado (task {entry['task_id']})",
+                            extra={"clip": clip_number, "task_id": entry["task_id"]})
+                self.record_output(clip_number, image_path, full_prompt, output_file, mode, duration,
+                                   aspect_ratio, entry["task_id"], source=CACHE)
+                return output_file
+
+        # One of the account's render slots for the whole submit + wait
+        await self._acquire_slot()
+        try:
+            task_id = await self.image_to_video(
+                image_path=image_path,
+                prompt=full_prompt,
+                duration=duration,
+                mode=mode,
+                aspect_ratio=aspect_ratio
+            )
+
+            if not task_id:
+                return None
+            submitted_at = time.time()
+
+            video_url = await self.wait_for_completion(task_id, mode=mode, duration=duration)
+        finally:
+            self.limiter.release_slot()
+
+        if not video_url:
+            return None
+
+        if not await self.download_video(video_url, str(output_file)):
+            return None
+        report = await loop.run_in_executor(None, self.check_clip, output_file, duration, aspect_ratio)
+        if self.needs_redownload(report):
+            # Truncated or corrupt file: the URL is still valid, fetch it once more
+            discard(output_file)
+            logger.warning(f"[!] Clip {clip_number:02d} dañado; se vuelve a descargar",
+                           extra={"clip": clip_number, "task_id": task_id})
+            if not await self.download_video(video_url, str(output_file)):
+                return None
+            report = await loop.run_in_executor(None, self.check_clip, output_file, duration, aspect_ratio)
+        if report is not None and not report["ok"]:
+            # A broken file must never be picked up (reel, cache, editing)
+            discard(output_file)
+            return None
+        if key:
+            await loop.run_in_executor(None, self.cache.put, key, output_file, task_id)
+        self.record_output(clip_number, image_path, full_prompt, output_file, mode, duration,
+                           aspect_ratio, task_id, submitted_at=submitted_at)
+        return output_file
+
+
+async def _iterate_async(body: StreamingJSONBody):
+    for chunk in body:
+        yield chunk
+
+
+async def _main():
+    load_dotenv()
+    configure_logging(stream=sys.stdout)
+
+    access_key = os.getenv("KLING_ACCESS_KEY")
+    secret_key = os.getenv("KLING_SECRET_KEY")
+
+    if not access_key or not secret_key:
+        print("ERROR: Faltan credenciales en .env")
+        return
+
+    async with KlingAPIAsync(access_key, secret_key) as client:
+        jwt_token = client.generate_jwt_token()
+        print(f"\nJWT Token generado: {jwt_token[:50]}...")
+        print("[OK] Cliente asíncrono inicializado correctamente")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
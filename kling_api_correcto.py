@@ -7,10 +7,11 @@ Basado en: DOCUMENTACION_KLING.md
 
 API:
   Domain: https://api-singapore.klingai.com
+          (KLING_API_DOMAIN lo reemplaza, p.ej. por kling_mock_server)
   Auth: JWT tokens (AccessKey + SecretKey)
   Feature: Image to Video
   
-JWT Generation:
+JWT Generation (kling_auth.TokenProvider, cacheado 30 min):
   import jwt
   headers = {"alg": "HS256", "typ": "JWT"}
   payload = {"iss": access_key, "exp": time+1800, "nbf": time-5}
@@ -26,58 +27,166 @@ Date: October 2025
 """
 
 import time
-import jwt
-import requests
 import json
+import logging
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 import os
+import sys
 from datetime import datetime
+from kling_auth import TokenProvider
+from kling_body import StreamingJSONBody
+from kling_cache import cache_key, image_sha256
+from kling_download import discard, stream_download
+from kling_manifest import CACHE, RENDER, OutputManifest
+from kling_metrics import Metrics, configure_logging
+from kling_polling import AdaptivePolling, PollingStrategy
+from kling_preprocess import preprocess_image
+from kling_ratelimit import RateLimiter
+from kling_routes import TaskRouteResolver
+from kling_transport import HTTPTransport
+from kling_validation import CONTAINER
 
 
-class KlingAPICorrect:
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_DOMAIN = "https://api-singapore.klingai.com"
+
+MODEL_NAME = "kling-v2-1"
+
+BASE_PROMPT = "subtle realistic movement, preserve original image composition, natural cinematography, authentic lighting, cinematic realism, 4K detail, faithful to source image"
+
+
+def response_code(text: str) -> Optional[int]:
+    """Código de negocio Kling ("code") de un cuerpo JSON, si lo hay"""
+    try:
+        return json.loads(text).get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+def extract_video_url(result: Dict) -> Optional[str]:
     """
-    Cliente API correcto para Kling AI
-    Basado en documentación oficial
+    Extrae la URL del primer video de una respuesta de estado
+    
+    Args:
+        result: Respuesta JSON de check_task_status
+        
+    Returns:
+        URL del video o None si no está disponible
     """
+    task_result = result.get("data", {}).get("task_result", {})
+    videos = task_result.get("videos", [])
     
-    def __init__(self, access_key: str, secret_key: str):
+    if videos:
+        return videos[0].get("url")
+    return None
+
+
+class KlingClientBase:
+    """
+    Lógica común a los clientes síncrono y asíncrono:
+    credenciales, JWT, prompts, payload y configuración de clips
+    """
+    
+    # Errors during this window after submit mean "not registered yet"
+    REGISTRATION_GRACE_SECONDS = 60
+    
+    # Throttled submits (429/1302/1303) are retried, never accepted twice
+    SUBMIT_RETRIES = 5
+    
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        route_cache: Optional[str] = None,
+        api_domain: Optional[str] = None,
+        outputs_folder: Optional[str] = None
+    ):
         """
         Inicializar cliente
         
         Args:
             access_key: AccessKey de Kling AI
             secret_key: SecretKey de Kling AI
+            route_cache: Archivo JSON donde persistir el endpoint de estado aprendido
+            api_domain: URL base de la API (por defecto KLING_API_DOMAIN o
+                la oficial); p.ej. un kling_mock_server local
+            outputs_folder: Carpeta de clips y de su manifiesto (por
+                defecto outputs/ junto al script)
         """
         self.access_key = access_key
         self.secret_key = secret_key
-        self.api_domain = "https://api-singapore.klingai.com"
+        self.api_domain = (api_domain or os.getenv("KLING_API_DOMAIN") or DEFAULT_API_DOMAIN).rstrip("/")
+        self.token_provider = TokenProvider(access_key, secret_key)
+        self.routes = TaskRouteResolver(cache_path=route_cache)
+        self.polling: PollingStrategy = AdaptivePolling()
+        
+        # Request pacing and in-flight cap shared by every call (see kling_ratelimit)
+        self.limiter = RateLimiter(max_in_flight=int(os.getenv("KLING_MAX_CONCURRENCY", "3")))
+        
+        # Per-stage timers and counters (see kling_metrics)
+        self.metrics = Metrics()
+        
+        # Right-size images before upload (see kling_preprocess)
+        self.preprocess = True
+        
+        # Optional kling_cache.ResultCache: reuse identical generations
+        self.cache = None
         
-        # Output folder (relative to script location)
-        self.outputs_folder = Path(__file__).parent / "outputs"
-        self.outputs_folder.mkdir(exist_ok=True)
+        # Optional kling_webhook.CallbackReceiver: completion by callback,
+        # polling only as a slow safety net
+        self.webhook = None
+        
+        # Optional kling_validation.ClipValidator: probe every download
+        self.validator = None
+        
+        # (path, mtime_ns, size) -> SHA-256, so each image is hashed once
+        self._image_hashes: Dict[Tuple[str, int, int], str] = {}
+        
+        # Output folder (relative to script location) and its manifest
+        self.manifest: Optional[OutputManifest] = None
+        self.outputs_folder = outputs_folder or Path(__file__).parent / "outputs"
+    
+    @property
+    def outputs_folder(self) -> Path:
+        """Carpeta de los clips generados"""
+        return self._outputs_folder
+    
+    @outputs_folder.setter
+    def outputs_folder(self, folder) -> None:
+        # Every finished clip and the clip-number counter live with the clips
+        # (see kling_manifest), so moving the folder moves the manifest too
+        self._outputs_folder = Path(folder)
+        self._outputs_folder.mkdir(parents=True, exist_ok=True)
+        if self.manifest is not None:
+            self.manifest.close()
+        self.manifest = OutputManifest(self._outputs_folder / "manifest.sqlite")
     
     def generate_jwt_token(self) -> str:
         """
-        Genera JWT token según documentación oficial
+        Devuelve JWT token según documentación oficial
+        
+        El token se firma una vez y se reutiliza hasta poco antes de
+        expirar (ver kling_auth.TokenProvider).
         
         Returns:
             JWT token string
         """
-        headers = {
-            "alg": "HS256",
-            "typ": "JWT"
-        }
-        
-        payload = {
-            "iss": self.access_key,
-            "exp": int(time.time()) + 1800,  # 30 minutos
-            "nbf": int(time.time()) - 5      # Empieza 5s antes
-        }
+        return self.token_provider.get_token()
+    
+    def observe_response(self, status_code: int, headers) -> None:
+        """
+        Alimenta al proveedor de tokens con cada respuesta de la API
         
-        token = jwt.encode(payload, self.secret_key, headers=headers)
-        return token
+        Args:
+            status_code: Status HTTP
+            headers: Headers de la respuesta
+        """
+        self.token_provider.observe_server_date(headers.get("Date"))
+        if status_code == 401:
+            self.token_provider.invalidate()
     
     def get_headers(self) -> Dict[str, str]:
         """
@@ -93,13 +202,285 @@ class KlingAPICorrect:
             "Content-Type": "application/json"
         }
     
+    def build_prompt(self, custom_prompt: str = "") -> str:
+        """
+        Combina el prompt personalizado con el prompt base
+        
+        Args:
+            custom_prompt: Movimiento o personalización (opcional)
+            
+        Returns:
+            Prompt completo
+        """
+        if custom_prompt:
+            return f"{custom_prompt}, {BASE_PROMPT}"
+        return BASE_PROMPT
+    
+    def load_image(self, image_path: str, aspect_ratio: str = "9:16") -> bytes:
+        """
+        Bytes de la imagen a enviar
+        
+        Con self.preprocess activo se recorta al aspect_ratio, se reduce a
+        la resolución útil del modelo y se re-codifica como JPEG; si no,
+        se envía el archivo tal cual.
+        
+        Args:
+            image_path: Path a la imagen
+            aspect_ratio: Relación de aspecto del video
+            
+        Returns:
+            Bytes de la imagen
+        """
+        with self.metrics.timer("kling_image_prepare_seconds"):
+            if self.preprocess:
+                return preprocess_image(image_path, aspect_ratio)
+            
+            with open(image_path, 'rb') as f:
+                return f.read()
+    
+    def record_submit(self, status_code: int, seconds: float, body_bytes: int, throttled: bool) -> None:
+        """
+        Métricas de un intento de submit
+        
+        Args:
+            status_code: Status HTTP (0 si no hubo respuesta)
+            seconds: RTT del intento
+            body_bytes: Tamaño del cuerpo enviado
+            throttled: La API pidió frenar (se reintenta)
+        """
+        if throttled:
+            result = "throttled"
+            self.metrics.inc("kling_retries_total", kind="submit")
+        elif status_code == 200:
+            result = "accepted"
+        else:
+            result = "rejected" if status_code else "error"
+        self.metrics.observe("kling_submit_seconds", seconds, result=result)
+        self.metrics.inc("kling_submits_total", result=result)
+        self.metrics.inc("kling_upload_bytes_total", body_bytes)
+    
+    def record_completion(
+        self,
+        status: str,
+        elapsed: float,
+        polls: int,
+        mode: str,
+        duration: int,
+        queue_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Métricas de una tarea que salió del render
+        
+        Args:
+            status: "succeed" o "failed"
+            elapsed: Segundos desde el submit
+            polls: Consultas de estado que llevó
+            mode: "std" o "pro"
+            duration: Duración del clip
+            queue_seconds: Submit -> primer "processing", si se vio
+        """
+        if status == "succeed":
+            self.polling.record_completion(elapsed, polls, mode, duration)
+            self.metrics.observe("kling_render_seconds", elapsed, mode=mode, duration=duration)
+        if queue_seconds is not None:
+            self.metrics.observe("kling_queue_seconds", queue_seconds)
+        self.metrics.observe("kling_polls_per_task", polls)
+        self.metrics.inc("kling_tasks_total", result=status)
+    
+    def record_download(self, seconds: float, size: int) -> None:
+        """Métricas de una descarga completa"""
+        self.metrics.observe("kling_download_seconds", seconds)
+        self.metrics.inc("kling_download_bytes_total", size)
+        if seconds > 0:
+            self.metrics.observe("kling_download_throughput_bytes", size / seconds)
+    
+    def check_clip(self, output_path, duration: int, aspect_ratio: str) -> Optional[Dict]:
+        """
+        Valida un clip descargado con self.validator (si hay)
+        
+        Args:
+            output_path: Clip descargado
+            duration: Duración pedida
+            aspect_ratio: Relación de aspecto pedida
+            
+        Returns:
+            Reporte de kling_validation, o None sin validador
+        """
+        if self.validator is None:
+            return None
+        report = self.validator.validate(output_path, duration, aspect_ratio)
+        self.record_validation(report, "ok" if report["ok"] else "failed")
+        if not report["ok"]:
+            logger.error(f"[X] Clip inválido {Path(output_path).name}: {'; '.join(report['problems'])}",
+                         extra={"output": str(output_path), "problems": report["problems"]})
+        return report
+    
+    @staticmethod
+    def needs_redownload(report: Optional[Dict]) -> bool:
+        """Archivo dañado en la descarga (no en el render): conviene bajarlo otra vez"""
+        return report is not None and not report["ok"] and report["kind"] == CONTAINER
+    
+    def record_validation(self, report: Dict, result: str) -> None:
+        """Métricas de una validación (result: ok / redownload / regenerate / failed)"""
+        self.metrics.observe("kling_validation_seconds", report["seconds"])
+        self.metrics.inc("kling_validations_total", result=result)
+    
+    def build_payload(
+        self,
+        image_data: str,
+        prompt: str,
+        duration: int,
+        mode: str,
+        aspect_ratio: str
+    ) -> Dict:
+        """
+        Construye el payload de image2video
+        
+        Args:
+            image_data: Imagen en base64
+            prompt: Prompt completo
+            duration: Duración en segundos
+            mode: "std" o "pro"
+            aspect_ratio: Relación de aspecto
+            
+        Returns:
+            Dictionary listo para enviar como JSON
+        """
+        payload = {
+            "model_name": MODEL_NAME,
+            "image": image_data,
+            "prompt": prompt,
+            "negative_prompt": "blurry, low quality, distorted, artifacts",
+            "cfg_scale": 0.5,
+            "mode": mode,
+            "duration": duration,
+            "aspect_ratio": aspect_ratio
+        }
+        if self.webhook is not None:
+            payload["callback_url"] = self.webhook.url
+        return payload
+    
+    def result_cache_key(
+        self,
+        image_path: str,
+        prompt: str,
+        duration: int,
+        mode: str,
+        aspect_ratio: str
+    ) -> str:
+        """
+        Clave de caché: hash de la imagen + parámetros de generación
+        
+        Args:
+            image_path: Path a la imagen original
+            prompt: Prompt completo
+            duration: Duración en segundos
+            mode: "std" o "pro"
+            aspect_ratio: Relación de aspecto
+            
+        Returns:
+            Clave hexadecimal
+        """
+        payload = self.build_payload("", prompt, duration, mode, aspect_ratio)
+        return cache_key(self.image_hash(image_path), payload)
+    
+    def image_hash(self, image_path: str, known: Optional[str] = None) -> str:
+        """
+        SHA-256 de la imagen, calculado una vez mientras el archivo no cambie
+        
+        Args:
+            image_path: Path a la imagen original
+            known: Hash ya calculado (p.ej. del catálogo) para no releerla
+            
+        Returns:
+            Hash hexadecimal
+        """
+        stat = os.stat(image_path)
+        key = (str(image_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._image_hashes.get(key)
+        if digest is None:
+            digest = known or image_sha256(image_path)
+            self._image_hashes[key] = digest
+        return digest
+    
+    def record_output(
+        self,
+        clip_number: int,
+        image_path: str,
+        prompt: str,
+        output_path,
+        mode: str,
+        duration: int,
+        aspect_ratio: str,
+        task_id: Optional[str],
+        source: str = RENDER,
+        submitted_at: Optional[float] = None,
+        processing_at: Optional[float] = None
+    ) -> None:
+        """
+        Registra un clip terminado en el manifiesto de salidas
+        
+        Args:
+            clip_number: Número de clip
+            image_path: Imagen original
+            prompt: Prompt completo enviado
+            output_path: Clip generado
+            mode: "std" o "pro"
+            duration: Duración en segundos
+            aspect_ratio: Relación de aspecto
+            task_id: Tarea que lo generó
+            source: "render" o "cache"
+            submitted_at: Envío de la tarea (epoch)
+            processing_at: Inicio del render (epoch)
+        """
+        try:
+            image_hash = self.image_hash(image_path)
+        except OSError:
+            image_hash = None
+        self.manifest.record(
+            clip_number, image_path, prompt, output_path, mode, duration, aspect_ratio,
+            task_id=task_id, image_sha256=image_hash, model=MODEL_NAME, source=source,
+            submitted_at=submitted_at, processing_at=processing_at
+        )
+
+
+class KlingAPICorrect(KlingClientBase):
+    """
+    Cliente API correcto para Kling AI
+    Basado en documentación oficial
+    """
+    
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        transport: Optional[HTTPTransport] = None,
+        route_cache: Optional[str] = None,
+        api_domain: Optional[str] = None,
+        outputs_folder: Optional[str] = None
+    ):
+        """
+        Inicializar cliente
+        
+        Args:
+            access_key: AccessKey de Kling AI
+            secret_key: SecretKey de Kling AI
+            transport: Transporte HTTP compartido (se crea uno por defecto)
+            route_cache: Archivo JSON donde persistir el endpoint de estado aprendido
+            api_domain: URL base de la API (por defecto KLING_API_DOMAIN o la oficial)
+            outputs_folder: Carpeta de clips y manifiesto (por defecto outputs/)
+        """
+        super().__init__(access_key, secret_key, route_cache, api_domain, outputs_folder)
+        self.transport = transport or HTTPTransport()
+    
     def image_to_video(
         self,
         image_path: str,
-        prompt: str = "subtle realistic movement, preserve original image composition, natural cinematography, authentic lighting, cinematic realism, 4K detail, faithful to source image",
+        prompt: str = BASE_PROMPT,
         duration: int = 10,
         mode: str = "pro",
-        aspect_ratio: str = "9:16"
+        aspect_ratio: str = "9:16",
+        image_bytes: Optional[bytes] = None
     ) -> Optional[str]:
         """
         Genera video desde imagen usando API oficial
@@ -110,213 +491,285 @@ class KlingAPICorrect:
             duration: Duración en segundos (10 por defecto)
             mode: "std" o "pro" (professional tiene mejor calidad)
             aspect_ratio: "9:16" para Instagram Reels
+            image_bytes: Imagen ya preprocesada (evita leer image_path)
             
         Returns:
             Task ID si exitoso, None si falla
         """
+        log = {"image": Path(image_path).name, "mode": mode, "duration": duration}
+        logger.info(
+            f"Generando video desde: {Path(image_path).name} ({mode}, {duration}s, {aspect_ratio})",
+            extra=dict(log, aspect_ratio=aspect_ratio)
+        )
+        logger.debug(f"Prompt: {prompt}", extra=log)
         
-        print(f"\nGenerando video desde: {Path(image_path).name}")
-        print(f"Prompt: {prompt}")
-        print(f"Duración: {duration}s")
-        print(f"Modo: {mode}")
-        print(f"Aspect Ratio: {aspect_ratio}")
-        
-        # Read and encode image
-        with open(image_path, 'rb') as f:
-            import base64
-            image_data = base64.b64encode(f.read()).decode('utf-8')
+        # Right-sized bytes, or the raw file (memory-mapped while sending)
+        if image_bytes is None and self.preprocess:
+            try:
+                image_bytes = self.load_image(image_path, aspect_ratio)
+            except Exception as e:
+                logger.error(f"ERROR: No se pudo leer la imagen: {e}", extra=log)
+                return None
+        image_source = image_bytes if image_bytes is not None else str(image_path)
         
         # Prepare request
         url = f"{self.api_domain}/v1/videos/image2video"
-        headers = self.get_headers()
-        
-        payload = {
-            "model_name": "kling-v2-1",
-            "image": image_data,
-            "prompt": prompt,
-            "negative_prompt": "blurry, low quality, distorted, artifacts",
-            "cfg_scale": 0.5,
-            "mode": mode,
-            "duration": duration,
-            "aspect_ratio": aspect_ratio
-        }
-        
-        print(f"\nEnviando request a: {url}")
+        payload = self.build_payload("", prompt, duration, mode, aspect_ratio)
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            
-            print(f"Status: {response.status_code}")
-            print(f"Response: {response.text[:500]}")
-            
-            if response.status_code == 200:
-                result = response.json()
+            for attempt in range(self.SUBMIT_RETRIES + 1):
+                self.limiter.wait("submit")
                 
-                # Extract task ID
-                task_id = result.get("data", {}).get("task_id")
+                # Base64 is encoded chunk by chunk straight into the socket
+                body = StreamingJSONBody(payload, image_source)
+                start = time.perf_counter()
+                try:
+                    response = self.transport.post(url, headers=self.get_headers(), data=body, timeout=60)
+                except Exception:
+                    self.record_submit(0, time.perf_counter() - start, len(body), False)
+                    raise
+                self.observe_response(response.status_code, response.headers)
                 
-                if task_id:
-                    print(f"\n[OK] Video en generacion!")
-                    print(f"Task ID: {task_id}")
-                    return task_id
-                else:
-                    print(f"ERROR: No se obtuvo task_id")
-                    print(f"Response: {json.dumps(result, indent=2)}")
-                    return None
-            else:
-                print(f"ERROR: Status {response.status_code}")
-                print(f"Response: {response.text}")
+                throttled = self.limiter.observe(
+                    "submit", response.status_code, response.headers, response_code(response.text)
+                )
+                self.record_submit(response.status_code, time.perf_counter() - start, len(body), throttled)
+                logger.debug(
+                    f"Submit {response.status_code} en {time.perf_counter() - start:.2f}s "
+                    f"({len(body) / 1024:.0f}KB): {response.text[:500]}",
+                    extra=dict(log, status=response.status_code, upload_bytes=len(body))
+                )
+                if not throttled:
+                    break
+                logger.warning(
+                    f"[!] Límite de la API (status {response.status_code}), "
+                    f"reintento {attempt + 1}/{self.SUBMIT_RETRIES}",
+                    extra=dict(log, status=response.status_code, attempt=attempt + 1)
+                )
+            
+            if response.status_code != 200:
+                logger.error(f"ERROR: Submit rechazado - Status {response.status_code}: {response.text[:500]}",
+                             extra=dict(log, status=response.status_code))
                 return None
+            
+            result = response.json()
+            task_id = result.get("data", {}).get("task_id")
+            
+            if task_id:
+                logger.info(f"[OK] Video en generacion - Task ID: {task_id}", extra=dict(log, task_id=task_id))
+                return task_id
+            
+            logger.error(f"ERROR: No se obtuvo task_id: {json.dumps(result)[:500]}", extra=log)
+            return None
                 
         except Exception as e:
-            print(f"ERROR: {str(e)}")
+            logger.error(f"ERROR: {str(e)}", extra=log)
             return None
     
-    def check_task_status(self, task_id: str) -> Dict:
+    def check_task_status(self, task_id: str, task_type: str = "image2video") -> Dict:
         """
         Verifica estado de la tarea
         
+        La primera consulta prueba los endpoints candidatos; el que responde
+        queda memorizado y las siguientes cuestan un solo request.
+        
         Args:
             task_id: ID de la tarea
+            task_type: Tipo de tarea (clave de la ruta aprendida)
             
         Returns:
-            Dictionary con estado y resultado
+            Dictionary con estado y resultado; {"throttled": True} si la
+            consulta fue limitada (429 / 1302 / 1303) y la tarea sigue
         """
-        # Try different endpoints to find the correct one
-        endpoints = [
-            f"/v1/videos/image2video/{task_id}",
-            f"/v1/tasks/{task_id}",
-            f"/v1/videos/{task_id}"
-        ]
-        
         headers = self.get_headers()
+        learned = self.routes.is_learned(task_type)
         
-        for endpoint in endpoints:
-            url = f"{self.api_domain}{endpoint}"
+        for template in self.routes.candidates(task_type):
+            url = f"{self.api_domain}{template.format(task_id=task_id)}"
+            self.limiter.wait("status")
+            self.metrics.inc("kling_status_requests_total", endpoint="task")
             
             try:
-                response = requests.get(url, headers=headers, timeout=30)
-                
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 404:
-                    continue  # Try next endpoint
-                else:
-                    return {"error": f"Status {response.status_code}: {response.text}"}
-                    
+                response = self.transport.get(url, headers=headers, timeout=30)
             except Exception as e:
-                continue
+                return {"error": f"Request failed: {str(e)}"}
+            
+            self.observe_response(response.status_code, response.headers)
+            code = response_code(response.text)
+            if self.limiter.observe("status", response.status_code, response.headers, code):
+                # Throttled, not failed: the limiter paused status polls
+                return {"throttled": True, "code": code}
+            
+            if response.status_code == 200:
+                self.routes.record(task_type, template)
+                return response.json()
+            elif response.status_code == 404 and not learned:
+                continue  # Try next endpoint
+            else:
+                return {"error": f"Status {response.status_code}: {response.text}"}
         
         # If all failed, return error
         return {"error": f"No valid endpoint found for task {task_id}"}
     
-    def wait_for_completion(self, task_id: str, max_wait_minutes: int = 15) -> Optional[str]:
+    def list_tasks(self, page_num: int = 1, page_size: int = 500) -> Dict:
+        """
+        Lista tareas image2video de la cuenta (más recientes primero)
+        
+        Args:
+            page_num: Página, empezando en 1
+            page_size: Tareas por página (máx 500)
+            
+        Returns:
+            Dictionary con "data": lista de tareas, o "error"
+        """
+        url = f"{self.api_domain}/v1/videos/image2video"
+        params = {"pageNum": page_num, "pageSize": page_size}
+        self.limiter.wait("status")
+        self.metrics.inc("kling_status_requests_total", endpoint="list")
+        
+        try:
+            response = self.transport.get(url, headers=self.get_headers(), params=params, timeout=30)
+        except Exception as e:
+            return {"error": f"Request failed: {str(e)}"}
+        
+        self.observe_response(response.status_code, response.headers)
+        self.limiter.observe("status", response.status_code, response.headers)
+        
+        if response.status_code == 200:
+            return response.json()
+        return {"error": f"Status {response.status_code}: {response.text}"}
+    
+    def wait_for_completion(
+        self,
+        task_id: str,
+        max_wait_minutes: int = 15,
+        mode: str = "pro",
+        duration: int = 10
+    ) -> Optional[str]:
         """
         Espera a que el video se complete
         
+        El intervalo entre consultas lo decide self.polling (por defecto
+        AdaptivePolling: pocas consultas al principio, más cerca del
+        tiempo de render esperado para este modo y duración). Con
+        self.webhook la espera termina al llegar el callback y solo se
+        consulta cada webhook.safety_interval segundos.
+        
         Args:
             task_id: ID de la tarea
             max_wait_minutes: Tiempo máximo de espera en minutos
+            mode: "std" o "pro" (para estimar el tiempo de render)
+            duration: Duración del clip en segundos
             
         Returns:
             URL del video si exitoso, None si falla
         """
-        max_attempts = max_wait_minutes * 6  # Check every 10 seconds
-        attempt = 0
-        
-        print(f"\nEsperando generación (máx {max_wait_minutes} min)...")
-        print(f"Task ID: {task_id}")
-        
-        while attempt < max_attempts:
-            result = self.check_task_status(task_id)
+        start = time.time()
+        deadline = start + max_wait_minutes * 60
+        polls = 0
+        queue_seconds = None
+        log = {"task_id": task_id}
+        
+        logger.info(f"Esperando generación de {task_id} (máx {max_wait_minutes} min)...", extra=log)
+        
+        while time.time() < deadline:
+            if self.webhook is not None:
+                # Callbacks resolve the wait; a slow poll covers lost ones
+                results = self.webhook.wait(task_id, min(self.webhook.safety_interval, deadline - time.time()))
+                self.metrics.inc("kling_callbacks_total", len(results))
+            else:
+                delay = self.polling.next_delay(time.time() - start, mode, duration)
+                time.sleep(max(0, min(delay, deadline - time.time())))
+                results = []
+            
+            if not results:
+                results = [self.check_task_status(task_id)]
+                polls += 1
             
-            if "error" in result:
-                if attempt == 0:
-                    # First attempt failed, might need to wait for task to be processed
-                    print(f"Esperando que la tarea se registre...")
-                    time.sleep(30)
-                    attempt += 1
+            for result in results:
+                elapsed = time.time() - start
+                
+                if result.get("throttled"):
+                    # The task keeps rendering; the next poll waits out the limiter's pause
+                    logger.info("Consulta de estado limitada; se sigue esperando", extra=log)
                     continue
-                else:
-                    print(f"Error verificando estado: {result['error']}")
+                
+                if "error" in result:
+                    if elapsed < self.REGISTRATION_GRACE_SECONDS:
+                        # New tasks can take a moment to become visible
+                        logger.info("Esperando que la tarea se registre...", extra=log)
+                        continue
+                    logger.error(f"Error verificando estado: {result['error']}", extra=log)
                     return None
-            
-            # Extract status from response
-            code = result.get("code")
-            data = result.get("data", {})
-            status = data.get("task_status")
-            
-            print(f"Response code: {code}, Status: {status}")
-            
-            if status == "succeed":
-                # Extract video URL
-                task_result = data.get("task_result", {})
-                videos = task_result.get("videos", [])
                 
-                if videos and len(videos) > 0:
-                    video_url = videos[0].get("url")
+                status = result.get("data", {}).get("task_status")
+                
+                if status == "processing" and queue_seconds is None:
+                    queue_seconds = elapsed
+                
+                if status == "succeed":
+                    video_url = extract_video_url(result)
                     
                     if video_url:
-                        print(f"\n[OK] Generacion completada!")
-                        print(f"Video URL: {video_url[:50]}...")
+                        self.record_completion(status, elapsed, polls, mode, duration, queue_seconds)
+                        logger.info(f"[OK] Generacion completada en {elapsed:.0f}s ({polls} consultas)",
+                                    extra=dict(log, seconds=round(elapsed, 1), polls=polls))
                         return video_url
+                    
+                    logger.error(f"ERROR: No se encontró URL del video en la respuesta: {json.dumps(result)[:500]}",
+                                 extra=log)
+                    return None
                 
-                print("ERROR: No se encontró URL del video en la respuesta")
-                print(f"Respuesta completa: {json.dumps(result, indent=2)}")
-                return None
-            
-            elif status == "failed":
-                print(f"ERROR: Generación falló")
-                print(f"Resultado: {json.dumps(result, indent=2)}")
-                return None
-            
-            else:
-                # Still processing (submitted, processing, etc.)
-                attempt += 1
-                elapsed = attempt * 10
-                print(f"Status: {status} - {elapsed}s transcurridos...")
-                time.sleep(10)
+                elif status == "failed":
+                    self.record_completion(status, elapsed, polls, mode, duration, queue_seconds)
+                    msg = result.get("data", {}).get("task_status_msg", "")
+                    logger.error(f"ERROR: Generación falló: {msg}", extra=dict(log, reason=msg))
+                    return None
+                
+                else:
+                    # Still processing (submitted, processing, etc.)
+                    logger.info(f"Status: {status} - {elapsed:.0f}s transcurridos...",
+                                extra=dict(log, status=status, seconds=round(elapsed, 1)))
         
-        print("ERROR: Timeout esperando generación")
+        self.metrics.inc("kling_tasks_total", result="timeout")
+        logger.error(f"ERROR: Timeout esperando generación de {task_id}", extra=log)
         return None
     
-    def download_video(self, video_url: str, output_path: str) -> bool:
+    def download_video(self, video_url: str, output_path: str, expected_sha256: Optional[str] = None) -> bool:
         """
-        Descarga video
+        Descarga video en streaming, reanudable y con escritura atómica
         
         Args:
             video_url: URL del video
             output_path: Path donde guardar
+            expected_sha256: Checksum esperado (opcional)
             
         Returns:
             True si exitoso
         """
-        try:
-            print(f"\nDescargando video...")
-            response = requests.get(video_url, timeout=300)
-            
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                
-                size_mb = Path(output_path).stat().st_size / (1024 * 1024)
-                print(f"[OK] Video descargado: {size_mb:.2f}MB")
-                print(f"[OK] Guardado en: {output_path}")
-                
-                return True
-            else:
-                print(f"ERROR: Download failed - Status {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"ERROR descargando: {str(e)}")
+        self.limiter.wait("download")
+        start = time.perf_counter()
+        
+        if not stream_download(self.transport, video_url, output_path, expected_sha256,
+                               metrics=self.metrics, limiter=self.limiter):
             return False
+        
+        seconds = time.perf_counter() - start
+        size = Path(output_path).stat().st_size
+        self.record_download(seconds, size)
+        logger.info(f"[OK] Video descargado: {size / (1024 * 1024):.2f}MB en {seconds:.1f}s -> {output_path}",
+                    extra={"output": str(output_path), "bytes": size, "seconds": round(seconds, 2)})
+        
+        return True
     
     def generate_video_complete(
         self,
         image_path: str,
         clip_number: int,
-        custom_prompt: str = ""
+        custom_prompt: str = "",
+        mode: str = "pro",
+        duration: int = 10,
+        aspect_ratio: str = "9:16"
     ) -> Optional[Path]:
         """
         Proceso completo: generar y descargar video
@@ -325,67 +778,81 @@ class KlingAPICorrect:
             image_path: Path a imagen
             clip_number: Número de clip
             custom_prompt: Personalización del prompt
+            mode: "std" (rápido, vista previa) o "pro"
+            duration: 5 o 10 segundos
+            aspect_ratio: Relación de aspecto
             
         Returns:
             Path del video generado o None
         """
-        # Build prompt
-        base_prompt = "subtle realistic movement, preserve original image composition, natural cinematography, authentic lighting, cinematic realism, 4K detail, faithful to source image"
-        if custom_prompt:
-            full_prompt = f"{custom_prompt}, {base_prompt}"
-        else:
-            full_prompt = base_prompt
+        full_prompt = self.build_prompt(custom_prompt)
         
         # Output file
         output_file = self.outputs_folder / f"clip_{clip_number:02d}.mp4"
         
-        print(f"\n{'='*70}")
-        print(f"GENERANDO CLIP {clip_number:02d}")
-        print(f"{'='*70}")
-        
-        # Generate
-        task_id = self.image_to_video(
-            image_path=image_path,
-            prompt=full_prompt,
-            duration=10,
-            mode="pro",
-            aspect_ratio="9:16"
-        )
-        
-        if not task_id:
-            return None
+        logger.info(f"\n{'='*70}\nGENERANDO CLIP {clip_number:02d}\n{'='*70}", extra={"clip": clip_number})
         
-        # Wait for completion
-        video_url = self.wait_for_completion(task_id)
+        # Same image + params already generated?
+        key = None
+        if self.cache is not None:
+            try:
+                key = self.result_cache_key(image_path, full_prompt, duration, mode, aspect_ratio)
+            except OSError as e:
+                logger.error(f"ERROR: No se pudo leer la imagen: {e}", extra={"clip": clip_number})
+                return None
+            entry = self.cache.get(key, output_file)
+            if entry:
+                self.metrics.inc("kling_tasks_total", result="cached")
+                logger.info(f"[CACHE] Clip reutilizado (task {entry['task_id']})",
+                            extra={"clip": clip_number, "task_id": entry["task_id"]})
+                self.record_output(clip_number, image_path, full_prompt, output_file, mode, duration,
+                                   aspect_ratio, entry["task_id"], source=CACHE)
+                return output_file
+        
+        # One of the account's render slots for the whole submit + wait
+        self.limiter.acquire_slot()
+        try:
+            task_id = self.image_to_video(
+                image_path=image_path,
+                prompt=full_prompt,
+                duration=duration,
+                mode=mode,
+                aspect_ratio=aspect_ratio
+            )
+            
+            if not task_id:
+                return None
+            submitted_at = time.time()
+            
+            # Wait for completion
+            video_url = self.wait_for_completion(task_id, mode=mode, duration=duration)
+        finally:
+            self.limiter.release_slot()
         
         if not video_url:
             return None
         
         # Download
-        if self.download_video(video_url, str(output_file)):
-            # Save config
-            self._save_config(clip_number, Path(image_path).name, full_prompt, task_id)
-            return output_file
-        else:
+        if not self.download_video(video_url, str(output_file)):
             return None
-    
-    def _save_config(self, clip_number, image_name, prompt, task_id):
-        """Guarda configuración del clip"""
-        config_file = self.outputs_folder / f"clip_{clip_number:02d}_config.txt"
-        
-        with open(config_file, 'w', encoding='utf-8') as f:
-            f.write(f"Clip {clip_number:02d}\n")
-            f.write("="*70 + "\n\n")
-            f.write(f"Imagen: {image_name}\n")
-            f.write(f"Task ID: {task_id}\n")
-            f.write(f"Prompt: {prompt}\n\n")
-            f.write(f"CONFIGURACIÓN:\n")
-            f.write(f"  - API: api-singapore.klingai.com (oficial)\n")
-            f.write(f"  - Modelo: Kling v2.1 Image2Video\n")
-            f.write(f"  - Aspect Ratio: 9:16\n")
-            f.write(f"  - Resolución: 1080p\n")
-            f.write(f"  - Duración: 5 segundos\n")
-            f.write(f"  - Estilo: Premium Cinematic\n")
+        report = self.check_clip(output_file, duration, aspect_ratio)
+        if self.needs_redownload(report):
+            # Truncated or corrupt file: the URL is still valid, fetch it once more
+            discard(output_file)
+            logger.warning(f"[!] Clip {clip_number:02d} dañado; se vuelve a descargar",
+                           extra={"clip": clip_number, "task_id": task_id})
+            if not self.download_video(video_url, str(output_file)):
+                return None
+            report = self.check_clip(output_file, duration, aspect_ratio)
+        if report is not None and not report["ok"]:
+            # A broken file must never be picked up (reel, cache, editing)
+            discard(output_file)
+            return None
+        if key:
+            self.cache.put(key, output_file, task_id)
+        self.record_output(clip_number, image_path, full_prompt, output_file, mode, duration,
+                           aspect_ratio, task_id, submitted_at=submitted_at)
+        return output_file
 
 
 def main():
@@ -396,6 +863,7 @@ def main():
     print("="*70 + "\n")
     
     load_dotenv()
+    configure_logging(stream=sys.stdout)
     
     access_key = os.getenv("KLING_ACCESS_KEY")
     secret_key = os.getenv("KLING_SECRET_KEY")
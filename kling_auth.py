@@ -0,0 +1,142 @@
+"""
+Proveedor de JWT - Kling AI
+===========================
+
+Firma y cachea el JWT de la API de Kling AI.
+
+El token es válido 30 minutos, así que no tiene sentido firmar uno nuevo
+en cada request. TokenProvider:
+  - Reutiliza el token firmado hasta poco antes de su "exp"
+  - Es seguro entre threads (y entre tareas asyncio del mismo proceso)
+  - Corrige el desfase de reloj con el header Date del servidor, para
+    que "nbf"/"exp" sean válidos según el reloj de Kling y no el local
+
+Uso:
+  provider = TokenProvider(access_key, secret_key)
+  token = provider.get_token()
+  provider.observe_server_date(response.headers.get("Date"))
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import jwt
+
+
+class TokenProvider:
+    """
+    JWT cacheado con renovación previa a la expiración
+    """
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        ttl: int = 1800,
+        refresh_margin: int = 120,
+        not_before_leeway: int = 5,
+        skew_tolerance: float = 2.0
+    ):
+        """
+        Inicializar proveedor
+
+        Args:
+            access_key: AccessKey de Kling AI
+            secret_key: SecretKey de Kling AI
+            ttl: Validez del token en segundos (30 minutos)
+            refresh_margin: Segundos antes de "exp" en que se renueva
+            not_before_leeway: Segundos que "nbf" se adelanta al momento actual
+            skew_tolerance: Desfase mínimo (s) que invalida el token cacheado
+        """
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.not_before_leeway = not_before_leeway
+        self.skew_tolerance = skew_tolerance
+
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0
+        self._skew = 0.0  # server clock - local clock, seconds
+
+    @property
+    def skew(self) -> float:
+        """Desfase estimado del reloj local respecto al servidor"""
+        return self._skew
+
+    @property
+    def expires_at(self) -> int:
+        """Timestamp (reloj del servidor) en que expira el token actual"""
+        return self._expires_at
+
+    def now(self) -> float:
+        """Hora actual según el reloj del servidor"""
+        return time.time() + self._skew
+
+    def get_token(self) -> str:
+        """
+        Devuelve un token válido, firmando uno nuevo solo si hace falta
+
+        Returns:
+            JWT token string
+        """
+        with self._lock:
+            now = self.now()
+            if self._token is None or now >= self._expires_at - self.refresh_margin:
+                self._token, self._expires_at = self._sign(now)
+            return self._token
+
+    def invalidate(self) -> None:
+        """Descarta el token cacheado (p. ej. tras un 401)"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+    def observe_server_date(self, date_header: Optional[str]) -> None:
+        """
+        Actualiza el desfase de reloj con el header Date de una respuesta
+
+        Args:
+            date_header: Valor del header HTTP Date (RFC 7231)
+        """
+        if not date_header:
+            return
+
+        try:
+            server_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return
+
+        skew = server_time - time.time()
+
+        # Date has one-second resolution; ignore jitter below the tolerance
+        if abs(skew - self._skew) < self.skew_tolerance:
+            return
+
+        with self._lock:
+            self._skew = skew
+            # Re-sign so nbf/exp follow the corrected clock
+            self._token = None
+            self._expires_at = 0
+
+    def _sign(self, now: float):
+        headers = {
+            "alg": "HS256",
+            "typ": "JWT"
+        }
+
+        expires_at = int(now) + self.ttl
+        payload = {
+            "iss": self.access_key,
+            "exp": expires_at,
+            "nbf": int(now) - self.not_before_leeway
+        }
+
+        token = jwt.encode(payload, self.secret_key, headers=headers)
+        return token, expires_at
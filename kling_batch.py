@@ -0,0 +1,757 @@
+"""
+Motor de Lotes - Kling AI
+=========================
+
+Genera varios videos en paralelo respetando la concurrencia de la cuenta.
+
+En lugar de procesar cada imagen de forma serial (enviar, esperar,
+descargar, dormir), el motor:
+  - Prepara las próximas imágenes en un pool de procesos, una vez por
+    imagen y relación de aspecto (las variantes de un barrido la comparten)
+  - Envía hasta N tareas a la vez (N = cuota de concurrencia), en el
+    orden de kling_scheduler: prioridad, deadline y clase de costo
+  - Consulta el estado de las tareas en vuelo según un calendario
+    adaptativo, con un solo request al listado (ver kling_polling)
+  - Con client.webhook, despierta con cada callback de Kling y deja
+    el polling como red de seguridad lenta (ver kling_webhook)
+  - Descarga cada clip en cuanto termina, en segundo plano
+  - Con client.validator, valida cada descarga en un pool propio y
+    vuelve a descargar o regenera los clips rotos (ver kling_validation)
+  - Envía la siguiente imagen apenas se libera un hueco
+  - Opcionalmente persiste cada paso en un JobStore (ver kling_jobs)
+
+Uso:
+  from kling_batch import BatchEngine, BatchJob
+
+  engine = BatchEngine(client, max_concurrency=3)
+  jobs = [BatchJob(image_path="images/01.jpg", clip_number=1, prompt="...")]
+  engine.run(jobs)
+
+  # Como servicio: vistas previas por delante de un lote en curso
+  engine = BatchEngine(client, reserved_slots=1).start()
+  for job in jobs:
+      engine.submit(job)
+  preview = engine.preview("images/01.jpg", clip_number=99, timeout=600)
+  engine.stop()
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from kling_api_correcto import KlingAPICorrect, extract_video_url
+from kling_download import discard
+from kling_manifest import CACHE, RENDER
+from kling_polling import BatchStatusPoller, PollingStrategy
+from kling_preprocess import preprocess_image
+from kling_scheduler import JobScheduler, cost_class
+from kling_validation import CONTAINER
+
+
+logger = logging.getLogger(__name__)
+
+# Error of a job handed over to another worker (its lease expired)
+LEASE_LOST = "lease lost"
+
+
+def _timed_preprocess(image_path: str, aspect_ratio: str):
+    """preprocess_image en el worker, con su duración (bytes, segundos)"""
+    start = time.perf_counter()
+    data = preprocess_image(image_path, aspect_ratio)
+    return data, time.perf_counter() - start
+
+
+@dataclass
+class BatchJob:
+    """Un clip dentro de un lote"""
+
+    image_path: str
+    clip_number: int
+    prompt: str = ""
+    mode: str = "pro"
+    duration: int = 10
+    aspect_ratio: str = "9:16"
+    priority: int = 0
+    deadline: Optional[float] = None  # epoch seconds
+    task_id: Optional[str] = None
+    status: str = "pending"  # pending, submitted, downloading, succeed, failed
+    video_url: Optional[str] = None
+    output_path: Optional[Path] = None
+    error: Optional[str] = None
+    queued_at: Optional[float] = None
+    submitted_at: Optional[float] = None
+    processing_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    polls: int = 0
+    next_poll_at: float = 0.0
+    job_id: Optional[int] = None
+    redownloads: int = 0
+    regenerations: int = 0
+
+
+class BatchEngine:
+    """
+    Ejecuta un lote de clips con concurrencia acotada
+    """
+
+    # Polls due within this window are merged into the current cycle
+    COALESCE_SECONDS = 5
+
+    def __init__(
+        self,
+        client: KlingAPICorrect,
+        max_concurrency: int = 3,
+        download_workers: int = 4,
+        max_wait_minutes: int = 15,
+        poller: Optional[BatchStatusPoller] = None,
+        polling: Optional[PollingStrategy] = None,
+        preprocess_workers: Optional[int] = None,
+        store=None,
+        on_complete: Optional[Callable[[BatchJob], None]] = None,
+        reserved_slots: int = 0,
+        scheduler: Optional[JobScheduler] = None,
+        owner: Optional[str] = None
+    ):
+        """
+        Inicializar motor
+
+        Args:
+            client: Cliente de la API
+            max_concurrency: Tareas en render simultáneas (cuota de la cuenta)
+            download_workers: Descargas simultáneas
+            max_wait_minutes: Tiempo máximo de render por tarea
+            poller: Consulta de estado en lote (se crea una por defecto)
+            polling: Calendario de consultas (por defecto el del cliente)
+            preprocess_workers: Procesos para preparar imágenes (None = núcleos)
+            store: kling_jobs.JobStore donde persistir cada cambio de estado
+            on_complete: Llamado con cada trabajo que termina (puede ser
+                desde un thread de descarga)
+            reserved_slots: Lugares de render que solo usan las vistas
+                previas y los deadlines en riesgo
+            scheduler: Orden de envío (por defecto JobScheduler)
+            owner: Dueño de los leases en el store; un trabajo cuyo lease
+                tomó otro proceso deja de atenderse (ver drop())
+        """
+        self.client = client
+        self.max_concurrency = max(1, max_concurrency)
+        self.download_workers = max(1, download_workers)
+        self.max_wait_seconds = max_wait_minutes * 60
+        self.poller = poller or BatchStatusPoller(client)
+        self.polling = polling or client.polling
+        self.preprocess_workers = preprocess_workers
+        self.store = store
+        self.on_complete = on_complete
+        self.reserved_slots = min(max(0, reserved_slots), self.max_concurrency - 1)
+        self.scheduler = scheduler or JobScheduler(self.polling)
+        self.owner = owner
+
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._finished = threading.Condition()
+        self._attaching: List[BatchJob] = []  # re-attached through submit()
+        self._post: Set[int] = set()  # id() of jobs downloading or validating
+        self._lost: Set[int] = set()  # job_id of jobs another worker took over
+
+    def run(self, jobs: List[BatchJob], serve: bool = False) -> List[BatchJob]:
+        """
+        Procesa todos los trabajos del lote
+
+        También reanuda trabajos cargados de un JobStore: los que ya
+        tienen task_id se vuelven a consultar en lugar de reenviarse.
+
+        Args:
+            jobs: Trabajos a generar o reanudar
+            serve: Seguir esperando trabajos de submit() hasta stop()
+
+        Returns:
+            La misma lista, con estado y output de cada trabajo
+        """
+        scheduler = self.scheduler
+        in_flight = {}  # task_id -> BatchJob
+        limiter = self.client.limiter
+        webhook = self.client.webhook
+        seen = webhook.seq if webhook is not None else 0
+        if webhook is not None:
+            # New jobs must wake an engine sleeping on callbacks
+            scheduler.on_wake = webhook.wake
+
+        for job in jobs:
+            if self.store is not None and job.job_id is None:
+                self.store.add(job, owner=self.owner)
+            self._admit(job, in_flight)
+
+        downloads = {}  # Future -> job, until the download is collected
+        prepared = {}  # (image_path, aspect_ratio) -> Future with preprocessed image bytes
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as pool, \
+                ProcessPoolExecutor(max_workers=self.preprocess_workers) as prep_pool:
+            while scheduler or in_flight or self._attaching or self._post or (serve and not self._stopping):
+                pushed = scheduler.seq
+                self._collect(downloads)
+                with self._finished:
+                    attaching, self._attaching = self._attaching, []
+                for job in attaching:
+                    self._admit(job, in_flight)
+
+                # Taken over by another worker: it polls and downloads them now
+                for task_id, job in list(in_flight.items()):
+                    if self._is_lost(job):
+                        del in_flight[task_id]
+                        limiter.release_slot()
+                        self._abandon(job)
+
+                self._prefetch(prepared, prep_pool)
+
+                # Fill free slots; the last reserved_slots only take previews
+                while scheduler and len(in_flight) < self.max_concurrency:
+                    bulk_allowed = len(in_flight) < self.max_concurrency - self.reserved_slots
+
+                    # Account-wide cap; block briefly only when nothing is polling
+                    if not limiter.acquire_slot(timeout=0 if in_flight else 1.0):
+                        break
+
+                    job = scheduler.pop(bulk_allowed)
+                    if job is None:
+                        limiter.release_slot()
+                        break
+
+                    if self._is_lost(job):
+                        limiter.release_slot()
+                        self._abandon(job)
+                        continue
+
+                    if self._from_cache(job):
+                        limiter.release_slot()
+                        continue
+
+                    # Variants of one image share its prepared bytes
+                    future = prepared.get((job.image_path, job.aspect_ratio))
+                    try:
+                        image_bytes = self._prepared_bytes(future)
+                    except Exception as e:
+                        # An unreadable image fails its own job, not the batch
+                        limiter.release_slot()
+                        self._reject(job, f"image unreadable: {e}")
+                        continue
+
+                    if self._submit(job, image_bytes):
+                        in_flight[job.task_id] = job
+                    else:
+                        limiter.release_slot()
+
+                if not in_flight:
+                    if not scheduler:
+                        # Idle service: sleep until submit() or stop()
+                        scheduler.wait(pushed, 1.0)
+                    continue
+
+                # Sleep until the earliest task is due (or a callback or new job arrives)
+                wake_at = min(job.next_poll_at for job in in_flight.values())
+                if webhook is not None:
+                    seen = webhook.wait_any(seen, max(0, wake_at - time.time()))
+                    for task_id in list(in_flight):
+                        for result in webhook.drain(task_id):
+                            self.client.metrics.inc("kling_callbacks_total")
+                            if task_id in in_flight:
+                                self._apply(in_flight[task_id], result, in_flight, downloads, pool)
+                else:
+                    scheduler.wait(pushed, max(0, wake_at - time.time()))
+
+                # Tasks due shortly ride along on the same query
+                horizon = time.time() + self.COALESCE_SECONDS
+                due = [task_id for task_id, job in in_flight.items() if job.next_poll_at <= horizon]
+
+                # One list query covers every due task
+                results = self.poller.poll(due)
+                for task_id, result in results.items():
+                    job = in_flight[task_id]
+                    job.polls += 1
+                    self._apply(job, result, in_flight, downloads, pool)
+
+                if jobs:
+                    self._print_progress(jobs)
+
+        # The pool has drained; nothing is left running
+        self._collect(downloads)
+        self._report()
+        return jobs
+
+    def _admit(self, job: BatchJob, in_flight: Dict) -> None:
+        """Encola un trabajo pendiente o re-engancha uno que ya está en render"""
+        if job.status in ("submitted", "downloading") and job.task_id:
+            # Re-attach: poll again (a fresh URL for interrupted downloads)
+            self.client.limiter.claim_slot()
+            job.status = "submitted"
+            job.submitted_at = job.submitted_at or time.time()
+            self._schedule_poll(job)
+            in_flight[job.task_id] = job
+        elif job.status == "pending":
+            self.scheduler.push(job)
+
+    def _report(self) -> None:
+        limiter = self.client.limiter
+        webhook = self.client.webhook
+        report = self.polling.report()
+        logger.info(f"[LOTE] Requests de estado: {self.poller.requests_made} "
+                    f"({self.poller.list_requests} listado, {self.poller.single_requests} individuales)")
+        logger.info(f"[LOTE] Consultas por tarea: {report['polls']} "
+                    f"(calendario fijo de 10s: {report['baseline_polls']}, ahorradas: {report['saved']})")
+        if webhook is not None:
+            logger.info(f"[LOTE] Callbacks recibidos: {webhook.stats['received']} "
+                        f"(rechazados: {webhook.stats['rejected']})")
+        for entry in self.client.metrics.snapshot()["summaries"].get("kling_schedule_wait_seconds", []):
+            labels = entry["labels"]
+            logger.info(f"[LOTE] Espera en cola {labels['lane']} {labels['cost_class']}: "
+                        f"{entry['count']} trabajos, p50 {entry['p50']:.0f}s, p95 {entry['p95']:.0f}s",
+                        extra={"queue_wait": entry})
+        throttled = sum(limiter.report()["throttled"].values())
+        if throttled:
+            logger.info(f"[LOTE] Respuestas de límite de la API (429/1302/1303): {throttled}")
+        if self.client.cache is not None:
+            cache = self.client.cache.report()
+            logger.info(f"[LOTE] Caché: {cache['hits']} aciertos, {cache['misses']} fallos")
+
+    # --- leases ---
+
+    def drop(self, job_ids) -> None:
+        """
+        Deja de atender trabajos cuyo lease tomó otro proceso
+
+        Los pendientes no se envían; los que están en render dejan de
+        consultarse (el nuevo dueño los re-engancha por task_id). Se puede
+        llamar desde cualquier thread (p.ej. LeaseKeeper.on_lost).
+        """
+        with self._finished:
+            self._lost.update(job_ids)
+        self.scheduler.wake()
+
+    def _is_lost(self, job: BatchJob) -> bool:
+        with self._finished:
+            return job.job_id is not None and job.job_id in self._lost
+
+    def _abandon(self, job: BatchJob) -> None:
+        """Saca del motor un trabajo que ahora es de otro proceso (sin escribir el store)"""
+        job.error = LEASE_LOST
+        job.finished_at = time.time()
+        logger.warning(f"[!] Clip {job.clip_number:02d} lo tomó otro proceso; se deja de atender",
+                       extra=self._log(job))
+        if self.on_complete is not None:
+            self.on_complete(job)
+        with self._finished:
+            self._post.discard(id(job))
+            self._finished.notify_all()
+
+    # --- service mode ---
+
+    def start(self) -> "BatchEngine":
+        """Corre el motor en un thread de fondo, recibiendo trabajos con submit()"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self.run, args=([], True), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        """Termina lo encolado y lo que está en render, y detiene el motor"""
+        self._stopping = True
+        self.scheduler.wake()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def submit(self, job: BatchJob) -> BatchJob:
+        """
+        Encola un trabajo (thread-safe, también con el motor corriendo)
+
+        Un trabajo con task_id (submitted/downloading) se re-engancha en
+        lugar de reenviarse.
+        """
+        if self.store is not None and job.job_id is None:
+            self.store.add(job, owner=self.owner)
+        if job.status == "pending":
+            self.scheduler.push(job)
+        else:
+            with self._finished:
+                self._attaching.append(job)
+            self.scheduler.wake()
+        return job
+
+    def wait(self, job: BatchJob, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta que el trabajo termine; False si venció el timeout"""
+        with self._finished:
+            return self._finished.wait_for(lambda: job.finished_at is not None, timeout)
+
+    def preview(
+        self,
+        image_path: str,
+        clip_number: int,
+        prompt: str = "",
+        aspect_ratio: str = "9:16",
+        timeout: Optional[float] = None
+    ) -> BatchJob:
+        """
+        Vista previa rápida (std, 5s) por delante del lote en curso
+
+        Args:
+            image_path: Imagen de entrada
+            clip_number: Número del clip de salida
+            prompt: Personalización del prompt
+            aspect_ratio: Relación de aspecto
+            timeout: Segundos máximos de espera
+
+        Returns:
+            El trabajo (status "succeed" con output_path si terminó)
+        """
+        job = self.submit(BatchJob(
+            image_path=image_path,
+            clip_number=clip_number,
+            prompt=prompt,
+            mode="std",
+            duration=5,
+            aspect_ratio=aspect_ratio,
+            priority=self.scheduler.preview_priority
+        ))
+        self.wait(job, timeout)
+        return job
+
+    def _prefetch(self, prepared: Dict, prep_pool: ProcessPoolExecutor) -> None:
+        """Prepara en paralelo las imágenes de los próximos envíos"""
+        if not self.client.preprocess:
+            return
+
+        # Bounded lookahead keeps memory flat on large batches; jobs that
+        # share an image and aspect ratio (a sweep) share one preprocess
+        wanted = {(job.image_path, job.aspect_ratio) for job in self.scheduler.peek(self.max_concurrency * 2)}
+        for key in [key for key in prepared if key not in wanted]:
+            del prepared[key]
+        for key in wanted:
+            if key not in prepared:
+                prepared[key] = prep_pool.submit(_timed_preprocess, *key)
+                prepared[key].add_done_callback(self._observe_prepare)
+
+    def _observe_prepare(self, future) -> None:
+        # Once per preprocess, however many jobs reuse its bytes
+        if not future.cancelled() and future.exception() is None:
+            self.client.metrics.observe("kling_image_prepare_seconds", future.result()[1])
+
+    def _prepared_bytes(self, future) -> Optional[bytes]:
+        """Bytes preparados en el pool (None si no se prepararon)"""
+        if future is None:
+            return None
+        return future.result()[0]
+
+    def _cache_key(self, job: BatchJob) -> str:
+        return self.client.result_cache_key(
+            job.image_path,
+            self.client.build_prompt(job.prompt),
+            job.duration,
+            job.mode,
+            job.aspect_ratio
+        )
+
+    def _from_cache(self, job: BatchJob) -> bool:
+        """Completa el trabajo desde la caché de resultados si es posible"""
+        if self.client.cache is None:
+            return False
+
+        output_file = self.client.outputs_folder / f"clip_{job.clip_number:02d}.mp4"
+        try:
+            key = self._cache_key(job)
+        except OSError:
+            # Missing image: the submit reports it
+            return False
+        entry = self.client.cache.get(key, output_file)
+        if not entry:
+            return False
+
+        job.task_id = entry["task_id"]
+        job.output_path = output_file
+        job.status = "succeed"
+        self._manifest(job, CACHE)
+        self._finish(job)
+        self.client.metrics.inc("kling_tasks_total", result="cached")
+        logger.info(f"[CACHE] Clip {job.clip_number:02d} reutilizado - {Path(job.image_path).name}",
+                    extra=self._log(job))
+        return True
+
+    def _reject(self, job: BatchJob, error: str) -> None:
+        """Termina como fallido un trabajo que no se puede enviar"""
+        job.status = "failed"
+        job.error = error
+        logger.error(f"[X] Clip {job.clip_number:02d} - {Path(job.image_path).name}: {error}",
+                     extra=self._log(job))
+        self._finish(job)
+
+    def _submit(self, job: BatchJob, image_bytes: Optional[bytes] = None) -> bool:
+        """Envía la tarea; True si quedó en vuelo"""
+        logger.info(f"[ENVIO] Clip {job.clip_number:02d} - {Path(job.image_path).name}", extra=self._log(job))
+
+        task_id = self.client.image_to_video(
+            image_path=job.image_path,
+            prompt=self.client.build_prompt(job.prompt),
+            duration=job.duration,
+            mode=job.mode,
+            aspect_ratio=job.aspect_ratio,
+            image_bytes=image_bytes
+        )
+
+        if not task_id:
+            job.status = "failed"
+            job.error = "submit failed"
+            self._finish(job)
+            return False
+
+        job.task_id = task_id
+        job.status = "submitted"
+        job.submitted_at = time.time()
+        lane = "preview" if self.scheduler.is_preview(job) else "bulk"
+        self.client.metrics.observe("kling_schedule_wait_seconds", job.submitted_at - job.queued_at,
+                                    lane=lane, cost_class=cost_class(job.mode, job.duration))
+        # Persist the paid task_id before anything else can fail
+        self._record(job)
+        self._schedule_poll(job)
+        return True
+
+    def _log(self, job: BatchJob) -> Dict:
+        """Campos estructurados de un trabajo para el logging"""
+        return {"clip": job.clip_number, "task_id": job.task_id, "image": Path(job.image_path).name}
+
+    def _record(self, job: BatchJob, detail: Optional[str] = None) -> bool:
+        """Persiste el trabajo; False si su lease ya es de otro proceso"""
+        if self.store is None or self._is_lost(job):
+            return self.store is None
+        if self.store.update(job, detail, owner=self.owner):
+            return True
+        with self._finished:
+            self._lost.add(job.job_id)
+        logger.warning(f"[!] Clip {job.clip_number:02d}: el lease pasó a otro proceso; no se escribe su estado",
+                       extra=self._log(job))
+        return False
+
+    def _finish(self, job: BatchJob) -> None:
+        """El trabajo sale del lote (terminado, fallido o descarga pendiente)"""
+        job.finished_at = time.time()
+        self._record(job)
+        if job.deadline and job.finished_at > job.deadline:
+            self.client.metrics.inc("kling_deadlines_missed_total")
+            logger.warning(f"[!] Clip {job.clip_number:02d} terminó {job.finished_at - job.deadline:.0f}s "
+                           f"después de su deadline", extra=self._log(job))
+        if self.on_complete is not None:
+            self.on_complete(job)
+        with self._finished:
+            self._post.discard(id(job))
+            self._finished.notify_all()
+
+    def _schedule_poll(self, job: BatchJob) -> None:
+        elapsed = time.time() - job.submitted_at
+        delay = self.polling.next_delay(elapsed, job.mode, job.duration)
+        if self.client.webhook is not None:
+            # Callbacks drive completion; polling is only the safety net
+            delay = max(delay, self.client.webhook.safety_interval)
+        job.next_poll_at = time.time() + delay
+
+    def _apply(self, job: BatchJob, result: Dict, in_flight: Dict, downloads: Dict, pool) -> None:
+        """Aplica un resultado (consulta o callback) a un trabajo en vuelo"""
+        if self._handle_status(job, result):
+            del in_flight[job.task_id]
+            self.client.limiter.release_slot()
+            if self.client.webhook is not None:
+                self.client.webhook.discard(job.task_id)
+            if job.status == "downloading" and self._is_lost(job):
+                # The new owner fetches the clip with a fresh URL
+                self._abandon(job)
+            elif job.status == "downloading":
+                with self._finished:
+                    self._post.add(id(job))
+                downloads[pool.submit(self._download, job)] = job
+        else:
+            self._schedule_poll(job)
+
+    def _handle_status(self, job: BatchJob, result: Dict) -> bool:
+        """Aplica una respuesta de estado; True si la tarea salió del render"""
+        elapsed = time.time() - job.submitted_at
+
+        if "error" in result:
+            # Newly created tasks may not be visible yet; keep waiting
+            if elapsed < self.max_wait_seconds:
+                return False
+            job.status = "failed"
+            job.error = result["error"]
+        else:
+            status = result.get("data", {}).get("task_status")
+
+            if status == "processing" and job.processing_at is None:
+                job.processing_at = time.time()
+
+            if status in ("succeed", "failed"):
+                queue = job.processing_at - job.submitted_at if job.processing_at else None
+                self.client.record_completion(status, elapsed, job.polls, job.mode, job.duration, queue)
+
+            if status == "succeed":
+                job.video_url = extract_video_url(result)
+                if job.video_url:
+                    job.status = "downloading"
+                else:
+                    job.status = "failed"
+                    job.error = "no video url in response"
+            elif status == "failed":
+                job.status = "failed"
+                job.error = result.get("data", {}).get("task_status_msg", "generation failed")
+            elif elapsed < self.max_wait_seconds:
+                return False
+            else:
+                job.status = "failed"
+                job.error = "timeout"
+                self.client.metrics.inc("kling_tasks_total", result="timeout")
+
+        if job.status == "failed":
+            logger.error(f"[X] Clip {job.clip_number:02d} fallo: {job.error}",
+                         extra=dict(self._log(job), error=job.error))
+            self._finish(job)
+        else:
+            self._record(job)
+        return True
+
+    def _collect(self, downloads: Dict) -> None:
+        """Saca las descargas terminadas; un error solo afecta a su trabajo"""
+        for future in [future for future in downloads if future.done()]:
+            job = downloads.pop(future)
+            error = future.exception()
+            if error is None:
+                continue
+
+            # e.g. a sqlite error in the manifest, cache or store
+            logger.error(f"[X] Clip {job.clip_number:02d} error al descargar: {error}",
+                         exc_info=error, extra=self._log(job))
+            if job.status not in ("succeed", "failed"):
+                # The render is paid for: stay "downloading" so a resume retries it
+                job.error = f"download error: {error}"
+            try:
+                self._finish(job)
+            except Exception:
+                logger.exception(f"ERROR registrando clip {job.clip_number:02d}", extra=self._log(job))
+                with self._finished:
+                    self._post.discard(id(job))
+                    self._finished.notify_all()
+
+    def _download(self, job: BatchJob) -> None:
+        """Descarga el clip terminado y lo pasa a validar"""
+        output_file = self.client.outputs_folder / f"clip_{job.clip_number:02d}.mp4"
+
+        if not self.client.download_video(job.video_url, str(output_file)):
+            # The render is paid for: stay "downloading" so a resume retries it
+            job.error = "download failed"
+            logger.error(f"[X] Clip {job.clip_number:02d} fallo en descarga (se reintenta al reanudar)",
+                         extra=self._log(job))
+            self._finish(job)
+            return
+
+        job.output_path = output_file
+        if self.client.validator is None:
+            self._complete(job)
+            return
+
+        # Checked in the validator's pool; this thread moves on to the next download
+        future = self.client.validator.submit(output_file, job.duration, job.aspect_ratio)
+        future.add_done_callback(lambda f: self._validated(job, f))
+
+    def _complete(self, job: BatchJob, cache: bool = True) -> None:
+        """
+        Clip descargado (y válido): lo registra en el manifiesto y termina
+
+        Args:
+            job: Trabajo
+            cache: False si el clip no se validó (no se reutiliza)
+        """
+        self._manifest(job, RENDER)
+        if cache and self.client.cache is not None:
+            self.client.cache.put(self._cache_key(job), job.output_path, job.task_id)
+        job.status = "succeed"
+        logger.info(f"[OK] Clip {job.clip_number:02d} completado!", extra=self._log(job))
+        self._finish(job)
+
+    def _manifest(self, job: BatchJob, source: str) -> None:
+        self.client.record_output(
+            job.clip_number, job.image_path, self.client.build_prompt(job.prompt), job.output_path,
+            job.mode, job.duration, job.aspect_ratio, job.task_id, source=source,
+            submitted_at=job.submitted_at, processing_at=job.processing_at
+        )
+
+    def _validated(self, job: BatchJob, future) -> None:
+        """Aplica el resultado de validar un clip: terminar, re-descargar o regenerar"""
+        try:
+            report = future.result()
+        except Exception as e:
+            # A validator bug must not strand a paid clip, but an unchecked one is never reused
+            logger.exception(f"ERROR validando clip {job.clip_number:02d}; se acepta sin validar",
+                             extra=self._log(job))
+            self._record(job, f"validation error: {e}")
+            self._complete(job, cache=False)
+            return
+
+        if self.store is not None:
+            self.store.record_validation(job.job_id, report)
+        if report["ok"]:
+            self.client.record_validation(report, "ok")
+            self._complete(job)
+            return
+
+        problems = "; ".join(report["problems"])
+        if report["kind"] == CONTAINER and not job.redownloads:
+            action = "redownload"
+        elif job.regenerations < self.client.validator.max_regenerations:
+            action = "regenerate"
+        else:
+            action = "failed"
+        self.client.record_validation(report, action)
+
+        if action == "failed":
+            job.status = "failed"
+            job.error = f"invalid clip: {problems}"
+            logger.error(f"[X] Clip {job.clip_number:02d} inválido: {problems}",
+                         extra=dict(self._log(job), problems=report["problems"]))
+            self._finish(job)
+            return
+
+        # A broken file must never be picked up (reel, cache, editing)
+        if job.output_path is not None:
+            discard(job.output_path)
+        job.output_path = None
+
+        if action == "redownload":
+            # Re-attach: a fresh URL is fetched and the clip downloaded again
+            job.redownloads += 1
+            logger.warning(f"[!] Clip {job.clip_number:02d} dañado ({problems}); se vuelve a descargar",
+                           extra=dict(self._log(job), problems=report["problems"]))
+            self._record(job, f"redownload: {problems}")
+            with self._finished:
+                self._attaching.append(job)
+                self._post.discard(id(job))
+            self.scheduler.wake()
+        else:
+            logger.warning(f"[!] Clip {job.clip_number:02d} inválido ({problems}); se regenera",
+                           extra=dict(self._log(job), problems=report["problems"]))
+            job.regenerations += 1
+            job.task_id = None
+            job.video_url = None
+            job.status = "pending"
+            job.submitted_at = None
+            job.processing_at = None
+            job.queued_at = None
+            job.polls = 0
+            self._record(job, f"regenerate: {problems}")
+            self.scheduler.push(job)
+            with self._finished:
+                self._post.discard(id(job))
+
+    def _print_progress(self, jobs: List[BatchJob]) -> None:
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        logger.info(f"[LOTE] {summary}", extra={"counts": counts})
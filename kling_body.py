@@ -0,0 +1,102 @@
+"""
+Cuerpo JSON en Streaming - Kling AI
+===================================
+
+Construir el submit de image2video de la forma habitual deja hasta
+cuatro copias de la imagen en memoria por envío: los bytes, el base64
+en bytes, el str decodificado y el JSON serializado completo.
+
+StreamingJSONBody genera el mismo JSON por partes:
+  - El sobre JSON (todos los campos menos "image") se serializa una vez
+  - La imagen se codifica en base64 por bloques, directamente desde el
+    archivo mapeado en memoria (mmap) o desde los bytes ya preparados
+  - Cada bloque va al socket y se descarta
+
+El tamaño total se conoce de antemano, así que requests envía un
+Content-Length normal (no chunked) y el servidor recibe exactamente el
+mismo JSON que con json=payload.
+
+Uso:
+  body = StreamingJSONBody(payload_sin_imagen, "images/01.jpg")
+  transport.post(url, headers=headers, data=body)
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import base64
+import json
+import mmap
+from typing import Dict, Iterator, Union
+
+
+# Multiple of 3 so each block encodes without "=" padding mid-stream
+CHUNK_SIZE = 3 * 256 * 1024
+
+_PLACEHOLDER = "__KLING_IMAGE_BASE64__"
+
+
+class StreamingJSONBody:
+    """
+    Cuerpo JSON iterable con la imagen en base64 codificada por bloques
+    """
+
+    def __init__(
+        self,
+        payload: Dict,
+        image_source: Union[str, bytes, memoryview],
+        field: str = "image",
+        chunk_size: int = CHUNK_SIZE
+    ):
+        """
+        Inicializar cuerpo
+
+        Args:
+            payload: Campos del JSON; el valor de `field` se ignora
+            image_source: Path al archivo (se mapea con mmap) o bytes
+            field: Campo del JSON que lleva la imagen
+            chunk_size: Bytes crudos por bloque (múltiplo de 3)
+        """
+        if chunk_size % 3:
+            raise ValueError("chunk_size debe ser múltiplo de 3")
+
+        envelope = dict(payload)
+        envelope[field] = _PLACEHOLDER
+        prefix, suffix = json.dumps(envelope).split(json.dumps(_PLACEHOLDER))
+
+        self.prefix = (prefix + '"').encode('utf-8')
+        self.suffix = ('"' + suffix).encode('utf-8')
+        self.image_source = image_source
+        self.chunk_size = chunk_size
+
+        if isinstance(image_source, str):
+            with open(image_source, 'rb') as f:
+                f.seek(0, 2)
+                raw_size = f.tell()
+        else:
+            raw_size = len(image_source)
+
+        self.encoded_size = 4 * ((raw_size + 2) // 3)
+
+    def __len__(self) -> int:
+        return len(self.prefix) + self.encoded_size + len(self.suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.prefix
+
+        if isinstance(self.image_source, str):
+            with open(self.image_source, 'rb') as f:
+                if self.encoded_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        yield from self._encode(memoryview(mapped))
+        else:
+            yield from self._encode(memoryview(self.image_source))
+
+        yield self.suffix
+
+    def _encode(self, view: memoryview) -> Iterator[bytes]:
+        try:
+            for start in range(0, len(view), self.chunk_size):
+                yield base64.b64encode(view[start:start + self.chunk_size])
+        finally:
+            view.release()
@@ -0,0 +1,217 @@
+"""
+Caché de Resultados - Kling AI
+==============================
+
+Caché local direccionada por contenido para no pagar dos veces el mismo
+clip.
+
+La clave es el SHA-256 de los bytes de la imagen más los parámetros de
+generación (model_name, prompt, negative_prompt, cfg_scale, mode,
+duration, aspect_ratio). Si un clip con la misma clave ya se generó,
+se devuelve al instante desde outputs/.cache/ en lugar de enviar otra
+tarea.
+
+  - Búsqueda O(1) por clave primaria en un índice SQLite
+  - Tamaño máximo configurable con desalojo LRU (último acceso)
+  - Contadores de aciertos/fallos para el reporte
+
+Uso:
+  client.cache = ResultCache(max_bytes=5 * 1024**3)
+  client.generate_video_complete("images/01.jpg", 1, "slow zoom in")
+  print(client.cache.report())
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    task_id TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+"""
+
+# Generation params that change the result
+KEY_FIELDS = (
+    "model_name", "prompt", "negative_prompt", "cfg_scale",
+    "mode", "duration", "aspect_ratio"
+)
+
+
+def image_sha256(image_path: str) -> str:
+    """SHA-256 de los bytes de la imagen original"""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(image_hash: str, payload: Dict) -> str:
+    """
+    Clave de caché para una imagen y un payload de image2video
+
+    Args:
+        image_hash: SHA-256 de la imagen
+        payload: Payload (se usan solo KEY_FIELDS)
+
+    Returns:
+        Clave hexadecimal
+    """
+    params = {field: payload.get(field) for field in KEY_FIELDS}
+    material = image_hash + json.dumps(params, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Clips generados indexados por contenido, con tope de tamaño LRU
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Inicializar caché
+
+        Args:
+            cache_dir: Carpeta de la caché (por defecto outputs/.cache)
+            max_bytes: Tamaño máximo total antes de desalojar
+        """
+        if cache_dir is None:
+            cache_dir = Path(__file__).parent / "outputs" / ".cache"
+        self.cache_dir = Path(cache_dir)
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _blob(self, key: str) -> Path:
+        return self.blobs_dir / f"{key}.mp4"
+
+    def get(self, key: str, output_path) -> Optional[Dict]:
+        """
+        Materializa un clip cacheado en output_path
+
+        Args:
+            key: Clave de caché
+            output_path: Destino del clip
+
+        Returns:
+            {"task_id", "size"} de la entrada si hubo acierto, None si no
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT task_id, size FROM entries WHERE key = ?", (key,)).fetchone()
+            blob = self._blob(key)
+
+            if row is None or not blob.exists():
+                if row is not None:
+                    # Blob removed behind our back
+                    with self._conn:
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key)
+                )
+            self.hits += 1
+
+        _link_or_copy(blob, Path(output_path))
+        return {"task_id": row[0], "size": row[1]}
+
+    def contains(self, key: str) -> bool:
+        """Hay un clip para la clave (sin contarlo como acierto ni tocar el LRU)"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and self._blob(key).exists()
+
+    def put(self, key: str, clip_path, task_id: Optional[str] = None) -> None:
+        """
+        Guarda un clip recién descargado
+
+        Args:
+            key: Clave de caché
+            clip_path: Clip generado
+            task_id: Tarea que lo generó
+        """
+        blob = self._blob(key)
+        if not blob.exists():
+            _link_or_copy(Path(clip_path), blob)
+
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, task_id, size, created_at, last_access, hits)"
+                    " VALUES (?, ?, ?, ?, ?, 0)",
+                    (key, task_id, blob.stat().st_size, now, now)
+                )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        with self._conn:
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                try:
+                    self._blob(key).unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def report(self) -> Dict[str, int]:
+        """Aciertos, fallos, entradas y bytes ocupados"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hard link si es posible (mismo disco), copia si no; reemplazo atómico"""
+    tmp = dest.with_name(dest.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
@@ -0,0 +1,350 @@
+"""
+Catálogo de Imágenes - Kling AI
+===============================
+
+Índice persistente (SQLite) de las imágenes de images/, para no abrir
+cada foto en cada ejecución.
+
+  - Cada imagen se indexa por path + mtime + tamaño; refresh() solo lee
+    las nuevas o modificadas y borra las que ya no están
+  - De cada una guarda dimensiones (ya con la rotación EXIF aplicada,
+    como las ve kling_preprocess), formato, bytes y SHA-256
+  - Dimensiones y formato salen de la cabecera (PIL abre sin decodificar
+    los píxeles); el hash se calcula en un pool de threads
+  - Filtros por orientación, relación de aspecto y etiquetas
+
+Con el catálogo al día, listar miles de imágenes es un scandir y una
+consulta: milisegundos.
+
+Uso:
+  catalog = ImageCatalog()
+  catalog.refresh()
+  for info in catalog.list(orientation="portrait", aspect_ratio="9:16"):
+      print(info.name, info.width, info.height)
+  catalog.tag("images/01.jpg", "playa")
+
+  python kling_catalog.py                          # refresca y lista
+  python kling_catalog.py --orientacion landscape --tag playa
+  python kling_catalog.py --etiquetar playa images/01.jpg images/02.jpg
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+from kling_cache import image_sha256
+from kling_preprocess import ASPECT_RATIOS
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Width/height ratios this close to 1 count as square
+SQUARE_TOLERANCE = 0.02
+
+# EXIF orientations that rotate the picture by 90 degrees
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+EXIF_ORIENTATION = 0x0112
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    orientation TEXT,
+    ratio REAL,
+    sha256 TEXT,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_orientation ON images(orientation);
+CREATE INDEX IF NOT EXISTS idx_images_ratio ON images(ratio);
+CREATE INDEX IF NOT EXISTS idx_images_sha256 ON images(sha256);
+
+CREATE TABLE IF NOT EXISTS tags (
+    path TEXT NOT NULL REFERENCES images(path) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (path, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON tags(tag);
+"""
+
+
+@dataclass
+class ImageInfo:
+    """Una imagen del catálogo"""
+
+    path: str
+    width: int
+    height: int
+    format: str
+    size: int
+    sha256: str
+    orientation: str
+    tags: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+def orientation_of(width: int, height: int) -> str:
+    """"portrait", "landscape" o "square" """
+    if abs(width / height - 1) <= SQUARE_TOLERANCE:
+        return "square"
+    return "portrait" if height > width else "landscape"
+
+
+def read_header(path) -> Tuple[int, int, str]:
+    """
+    Dimensiones y formato sin decodificar la imagen
+
+    Returns:
+        (ancho, alto, formato), con la rotación EXIF aplicada
+
+    Raises:
+        OSError: Si el archivo no es una imagen legible
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+        if img.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+            width, height = height, width
+        return width, height, img.format or Path(path).suffix.lstrip(".").upper()
+
+
+class ImageCatalog:
+    """
+    Índice incremental de una carpeta de imágenes
+    """
+
+    def __init__(self, images_dir="images", db_path: Optional[str] = None, hash_workers: int = 4):
+        """
+        Inicializar catálogo
+
+        Args:
+            images_dir: Carpeta de imágenes
+            db_path: Archivo SQLite (por defecto outputs/catalog.sqlite)
+            hash_workers: Threads para leer y hashear imágenes nuevas
+        """
+        self.images_dir = Path(images_dir)
+        if db_path is None:
+            db_path = Path(__file__).parent / "outputs" / "catalog.sqlite"
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.hash_workers = hash_workers
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Sincroniza el índice con la carpeta
+
+        Returns:
+            {"added", "updated", "removed", "unchanged", "errors"}
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "errors": 0}
+        if not self.images_dir.is_dir():
+            return counts
+
+        folder = str(self.images_dir.resolve())
+        prefix = folder + os.sep
+        on_disk = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    on_disk[prefix + entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in self._conn.execute(
+                    "SELECT path, mtime_ns, size FROM images WHERE path >= ? AND path < ?", _folder_range(folder)
+                )
+            }
+
+        changed = [path for path, key in on_disk.items() if known.get(path) != key]
+        removed = [path for path in known if path not in on_disk]
+        counts["unchanged"] = len(on_disk) - len(changed)
+
+        # Header reads and hashing only for new or modified files
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as pool:
+            rows = list(pool.map(lambda path: self._index(path, on_disk[path]), changed))
+
+        # Upsert, not REPLACE: a replaced row would cascade-delete its tags
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in removed])
+            self._conn.executemany(
+                "INSERT INTO images (path, mtime_ns, size, width, height, format, orientation, ratio,"
+                " sha256, error, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size,"
+                " width = excluded.width, height = excluded.height, format = excluded.format,"
+                " orientation = excluded.orientation, ratio = excluded.ratio, sha256 = excluded.sha256,"
+                " error = excluded.error, indexed_at = excluded.indexed_at",
+                rows
+            )
+
+        for path, row in zip(changed, rows):
+            counts["updated" if path in known else "added"] += 1
+            if row[9]:
+                counts["errors"] += 1
+        counts["removed"] = len(removed)
+        return counts
+
+    def _index(self, path: str, key: Tuple[int, int]) -> Tuple:
+        mtime_ns, size = key
+        try:
+            width, height, fmt = read_header(path)
+            sha256 = image_sha256(path)
+        except (OSError, UnidentifiedImageError) as e:
+            return (path, mtime_ns, size, None, None, None, None, None, None, str(e), time.time())
+        return (path, mtime_ns, size, width, height, fmt, orientation_of(width, height),
+                width / height, sha256, None, time.time())
+
+    def list(
+        self,
+        orientation: Optional[str] = None,
+        aspect_ratio: Optional[str] = None,
+        tag: Optional[str] = None,
+        tolerance: float = 0.05
+    ) -> List[ImageInfo]:
+        """
+        Imágenes legibles del catálogo, por nombre
+
+        Args:
+            orientation: "portrait", "landscape" o "square"
+            aspect_ratio: "9:16", "16:9", "1:1" o "W:H"; ancho/alto dentro
+                de `tolerance` (relativa)
+            tag: Solo las que tienen esta etiqueta
+            tolerance: Diferencia relativa aceptada en la relación de aspecto
+
+        Returns:
+            Lista de ImageInfo
+        """
+        where = "path >= ? AND path < ? AND error IS NULL"
+        params: list = list(_folder_range(str(self.images_dir.resolve())))
+
+        if orientation:
+            where += " AND orientation = ?"
+            params.append(orientation)
+        if aspect_ratio:
+            w, h = ASPECT_RATIOS.get(aspect_ratio) or map(float, aspect_ratio.split(":"))
+            target = w / h
+            where += " AND ratio BETWEEN ? AND ?"
+            params += [target * (1 - tolerance), target * (1 + tolerance)]
+        if tag:
+            where += " AND path IN (SELECT path FROM tags WHERE tag = ?)"
+            params.append(tag)
+
+        with self._lock:
+            # Plain tuples: sqlite3.Row costs more than the query itself here
+            cursor = self._conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(
+                "SELECT path, width, height, format, size, sha256, orientation FROM images"
+                f" WHERE {where} ORDER BY path", params
+            ).fetchall()
+            # Only the tags of the selected rows (primary key lookups), not the whole table
+            tags: Dict[str, List[str]] = {}
+            for path, name in cursor.execute(
+                f"SELECT path, tag FROM tags WHERE path IN (SELECT path FROM images WHERE {where})"
+                " ORDER BY tag", params
+            ):
+                tags.setdefault(path, []).append(name)
+
+        # Same folder, so path order is name order
+        return [
+            ImageInfo(path, width, height, fmt, size, sha256, orientation, tags.get(path, []))
+            for path, width, height, fmt, size, sha256, orientation in rows
+        ]
+
+    def errors(self) -> List[Tuple[str, str]]:
+        """Archivos que no se pudieron leer: [(path, error)]"""
+        with self._lock:
+            return [(row["path"], row["error"])
+                    for row in self._conn.execute("SELECT path, error FROM images WHERE error IS NOT NULL")]
+
+    def tag(self, path, *tags: str) -> None:
+        """Agrega etiquetas a una imagen ya indexada"""
+        key = str(Path(path).resolve())
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO tags (path, tag) VALUES (?, ?)",
+                                   [(key, tag) for tag in tags])
+
+    def untag(self, path, *tags: str) -> None:
+        """Quita etiquetas de una imagen"""
+        key = str(Path(path).resolve())
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM tags WHERE path = ? AND tag = ?",
+                                   [(key, tag) for tag in tags])
+
+
+def _folder_range(folder: str) -> Tuple[str, str]:
+    """Rango de claves con los paths directamente bajo `folder` (usa el índice)"""
+    return folder + os.sep, folder + chr(ord(os.sep) + 1)
+
+
+def main(argv=None) -> int:
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Catálogo de imágenes de images/")
+    parser.add_argument("--carpeta", default="images", help="Carpeta de imágenes")
+    parser.add_argument("--orientacion", choices=("portrait", "landscape", "square"))
+    parser.add_argument("--aspecto", help="Relación de aspecto, p.ej. 9:16")
+    parser.add_argument("--tag", help="Solo imágenes con esta etiqueta")
+    parser.add_argument("--etiquetar", metavar="TAG", help="Etiquetar las imágenes indicadas")
+    parser.add_argument("imagenes", nargs="*", help="Imágenes a etiquetar (con --etiquetar)")
+    args = parser.parse_args(argv)
+
+    catalog = ImageCatalog(args.carpeta)
+    start = time.perf_counter()
+    counts = catalog.refresh()
+    print(f"[OK] Catálogo al día en {(time.perf_counter() - start) * 1000:.0f}ms: "
+          f"{counts['added']} nuevas, {counts['updated']} modificadas, {counts['removed']} borradas, "
+          f"{counts['unchanged']} sin cambios", file=sys.stderr)
+
+    if args.etiquetar:
+        tagged = 0
+        for image in args.imagenes:
+            try:
+                catalog.tag(image, args.etiquetar)
+                tagged += 1
+            except sqlite3.IntegrityError:
+                print(f"[X] {image} no está en el catálogo", file=sys.stderr)
+        print(f"[OK] {tagged} imagen(es) etiquetadas '{args.etiquetar}'", file=sys.stderr)
+
+    for info in catalog.list(args.orientacion, args.aspecto, args.tag):
+        tags = f"  [{', '.join(info.tags)}]" if info.tags else ""
+        print(f"{info.name:<30} {info.width}x{info.height} {info.format:<5} "
+              f"{info.size / (1024 * 1024):6.2f}MB {info.orientation}{tags}")
+    for path, error in catalog.errors():
+        print(f"[X] {Path(path).name}: {error}", file=sys.stderr)
+
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Descarga de Videos - Kling AI
+=============================
+
+Descarga en streaming, reanudable y atómica.
+
+  - El MP4 se escribe por bloques en clip_XX.mp4.part (memoria constante)
+  - Si la conexión se corta, se reanuda con HTTP Range desde el byte
+    donde quedó, incluso en una ejecución posterior
+  - Al terminar se verifica el tamaño (Content-Length/Content-Range) y,
+    si se conoce, el SHA-256 esperado
+  - Solo entonces se renombra atómicamente a clip_XX.mp4, así un clip
+    truncado nunca cuenta como terminado
+
+Uso:
+  digest = stream_download(transport, video_url, "outputs/clip_01.mp4")
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def part_path_for(output_path) -> Path:
+    """Archivo temporal donde se escribe la descarga en curso"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + ".part")
+
+
+def discard(output_path) -> None:
+    """Borra un clip rechazado y su .part, así nada vuelve a tomarlo"""
+    for path in (Path(output_path), part_path_for(output_path)):
+        if path.exists():
+            path.unlink()
+
+
+def parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Interpreta un header Content-Range
+
+    Args:
+        value: p. ej. "bytes 100-999/1000" o "bytes */1000"
+
+    Returns:
+        (byte inicial, tamaño total); None donde no se conozca
+    """
+    if not value or not value.startswith("bytes "):
+        return None, None
+
+    span, _, total = value[6:].partition("/")
+    start = None
+    if span != "*":
+        try:
+            start = int(span.split("-")[0])
+        except ValueError:
+            pass
+
+    try:
+        total_size = int(total)
+    except ValueError:
+        total_size = None
+
+    return start, total_size
+
+
+def file_sha256(path) -> str:
+    """SHA-256 de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def finalize(part_path: Path, output_path, expected_size: Optional[int], expected_sha256: Optional[str]) -> Optional[str]:
+    """
+    Verifica la descarga y la mueve atómicamente a su nombre final
+
+    Args:
+        part_path: Archivo .part completo
+        output_path: Destino final
+        expected_size: Tamaño anunciado por el servidor (o None)
+        expected_sha256: Checksum esperado (o None)
+
+    Returns:
+        SHA-256 del archivo, o None si la verificación falla
+    """
+    size = part_path.stat().st_size
+
+    if expected_size is not None and size != expected_size:
+        logger.error(f"ERROR: Tamaño inesperado ({size} de {expected_size} bytes)")
+        part_path.unlink()
+        return None
+
+    if size == 0:
+        logger.error("ERROR: Descarga vacía")
+        part_path.unlink()
+        return None
+
+    digest = file_sha256(part_path)
+    if expected_sha256 and digest != expected_sha256.lower():
+        logger.error(f"ERROR: Checksum no coincide ({digest[:12]} != {expected_sha256[:12]})")
+        part_path.unlink()
+        return None
+
+    with open(part_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(part_path, output_path)
+    return digest
+
+
+def stream_download(
+    transport,
+    url: str,
+    output_path,
+    expected_sha256: Optional[str] = None,
+    max_resumes: int = 5,
+    chunk_size: int = CHUNK_SIZE,
+    timeout: float = 300,
+    metrics=None,
+    limiter=None
+) -> Optional[str]:
+    """
+    Descarga en streaming con reanudación por HTTP Range
+
+    Args:
+        transport: Transporte HTTP (get con stream=True)
+        url: URL del video
+        output_path: Destino final
+        expected_sha256: Checksum esperado (opcional)
+        max_resumes: Reintentos de reanudación tras un corte
+        chunk_size: Tamaño de bloque en bytes
+        timeout: Timeout de lectura en segundos
+        metrics: kling_metrics.Metrics donde contar los reintentos (opcional)
+        limiter: kling_ratelimit.RateLimiter que decide la espera tras un 429
+
+    Returns:
+        SHA-256 del archivo descargado, o None si falla
+    """
+    part_path = part_path_for(output_path)
+    expected_size = None
+
+    for attempt in range(max_resumes + 1):
+        if attempt and metrics is not None:
+            metrics.inc("kling_retries_total", kind="download")
+
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        try:
+            response = transport.get(url, headers=headers, stream=True, timeout=timeout)
+        except requests.RequestException as e:
+            logger.warning(f"ERROR descargando (intento {attempt + 1}): {str(e)}")
+            continue
+
+        with response:
+            if response.status_code == 429 and limiter is not None:
+                # The limiter slows the download bucket; wait our turn and retry
+                limiter.observe("download", response.status_code, response.headers)
+                limiter.wait("download")
+                continue
+
+            if response.status_code == 416:
+                # Nothing left to fetch: .part may already be complete
+                _, expected_size = parse_content_range(response.headers.get("Content-Range"))
+                if expected_size is not None and offset == expected_size:
+                    break
+                part_path.unlink()
+                continue
+
+            if response.status_code == 206:
+                start, expected_size = parse_content_range(response.headers.get("Content-Range"))
+                if start != offset:
+                    # Server resumed from elsewhere; start over
+                    part_path.unlink()
+                    continue
+                mode = 'ab'
+            elif response.status_code == 200:
+                # Full body (Range ignored or first attempt)
+                offset = 0
+                length = response.headers.get("Content-Length")
+                expected_size = int(length) if length and length.isdigit() else None
+                mode = 'wb'
+            else:
+                logger.error(f"ERROR: Download failed - Status {response.status_code}")
+                return None
+
+            try:
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+            except (requests.RequestException, OSError) as e:
+                logger.warning(f"Conexión interrumpida, reanudando desde {part_path.stat().st_size} bytes: {str(e)}")
+                continue
+
+        if expected_size is None or part_path.stat().st_size >= expected_size:
+            break
+    else:
+        logger.error("ERROR: Se agotaron los reintentos de descarga")
+        return None
+
+    return finalize(part_path, output_path, expected_size, expected_sha256)
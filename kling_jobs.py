@@ -0,0 +1,469 @@
+"""
+Registro Persistente de Trabajos - Kling AI
+===========================================
+
+Guarda en SQLite el estado de cada clip de un lote, para que un proceso
+caído o interrumpido pueda reanudar sin volver a pagar la generación.
+
+Por cada trabajo se registra: imagen, prompt, parámetros, número de
+clip, task_id, URL del video, archivo de salida, error y cada cambio de
+estado (tabla transitions). El task_id se guarda apenas el submit es
+aceptado, antes de empezar a esperar.
+
+Al reanudar:
+  - pending            -> se envía
+  - submitted          -> se vuelve a consultar el task_id existente
+  - downloading        -> se consulta (URL fresca) y se descarga
+  - succeed / failed   -> no se toca
+
+Varios procesos (o máquinas con el archivo compartido) pueden usar el
+mismo registro: cada trabajo en curso tiene un lease (dueño + vencimiento)
+que su proceso renueva; si el proceso muere, el lease vence y otro worker
+lo toma (ver kling_worker). Los números de clip se reservan en el
+manifiesto de salidas, dentro de una transacción (ver kling_manifest).
+
+Uso:
+  store = JobStore()
+  engine = BatchEngine(client, store=store)
+  engine.run(jobs)                     # primera ejecución
+  engine.run(store.load_unfinished())  # tras un corte
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from kling_batch import BatchJob
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    image_path TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    params TEXT NOT NULL,
+    clip_number INTEGER NOT NULL,
+    task_id TEXT,
+    state TEXT NOT NULL,
+    video_url TEXT,
+    output_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    submitted_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+CREATE INDEX IF NOT EXISTS idx_jobs_task_id ON jobs(task_id);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    state TEXT NOT NULL,
+    at REAL NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_job ON transitions(job_id);
+
+CREATE TABLE IF NOT EXISTS validations (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    ok INTEGER NOT NULL,
+    report TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_validations_job ON validations(job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_clip_number ON jobs(clip_number);
+"""
+
+# Added after the first release; created on open if missing
+LEASE_COLUMNS = (
+    ("lease_owner", "TEXT"),
+    ("lease_expires", "REAL")
+)
+
+# Seconds a claimed job stays reserved without a heartbeat
+LEASE_SECONDS = 120
+
+FINAL_STATES = ("succeed", "failed")
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    """ID único de este proceso: host-pid-sufijo"""
+    return f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(2)}"
+
+
+class JobStore:
+    """
+    Estado durable de los trabajos en SQLite
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Inicializar registro
+
+        Args:
+            db_path: Archivo SQLite (por defecto outputs/jobs.sqlite)
+        """
+        if db_path is None:
+            db_path = Path(__file__).parent / "outputs" / "jobs.sqlite"
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in LEASE_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(state, lease_expires)")
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, job: BatchJob, owner: Optional[str] = None, lease_seconds: float = LEASE_SECONDS) -> int:
+        """
+        Registra un trabajo nuevo y le asigna job_id
+
+        Args:
+            job: Trabajo a registrar
+            owner: Proceso que lo ejecuta (None = disponible para workers)
+            lease_seconds: Duración del lease de `owner`
+
+        Returns:
+            ID del trabajo
+        """
+        now = time.time()
+        expires = now + lease_seconds if owner else None
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (image_path, prompt, params, clip_number, task_id, state,"
+                " video_url, output_path, error, created_at, submitted_at, updated_at,"
+                " lease_owner, lease_expires)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.image_path, job.prompt, json.dumps(_params(job)), job.clip_number,
+                    job.task_id, job.status, job.video_url,
+                    str(job.output_path) if job.output_path else None,
+                    job.error, now, job.submitted_at, now, owner, expires
+                )
+            )
+            job.job_id = cursor.lastrowid
+            self._conn.execute(
+                "INSERT INTO transitions (job_id, state, at, detail) VALUES (?, ?, ?, ?)",
+                (job.job_id, job.status, now, None)
+            )
+        return job.job_id
+
+    def update(self, job: BatchJob, detail: Optional[str] = None, owner: Optional[str] = None) -> bool:
+        """
+        Persiste el estado actual de un trabajo
+
+        Args:
+            job: Trabajo (ya registrado)
+            detail: Nota para la tabla de transiciones
+            owner: Dueño del lease; si otro proceso tomó el trabajo no se
+                escribe nada
+
+        Returns:
+            False si `owner` perdió el lease (el estado es de otro worker)
+        """
+        now = time.time()
+        where, params = "id = ?", [job.job_id]
+        if owner is not None:
+            where += " AND lease_owner = ?"
+            params.append(owner)
+
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT state FROM jobs WHERE id = ?", (job.job_id,)).fetchone()
+            cursor = self._conn.execute(
+                "UPDATE jobs SET task_id = ?, state = ?, video_url = ?, output_path = ?,"
+                f" error = ?, submitted_at = ?, updated_at = ? WHERE {where}",
+                [
+                    job.task_id, job.status, job.video_url,
+                    str(job.output_path) if job.output_path else None,
+                    job.error, job.submitted_at, now
+                ] + params
+            )
+            if not cursor.rowcount:
+                return False
+            if row is None or row["state"] != job.status:
+                self._conn.execute(
+                    "INSERT INTO transitions (job_id, state, at, detail) VALUES (?, ?, ?, ?)",
+                    (job.job_id, job.status, now, detail or job.error)
+                )
+        return True
+
+    def get(self, job_id: int) -> Optional[BatchJob]:
+        """Trabajo por ID"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_job(row) if row else None
+
+    def load_unfinished(self) -> List[BatchJob]:
+        """
+        Trabajos que no llegaron a un estado final ni tienen un lease vigente
+
+        Returns:
+            Trabajos pending/submitted/downloading, en orden de creación
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE state NOT IN (?, ?)"
+                " AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY id",
+                FINAL_STATES + (time.time(),)
+            ).fetchall()
+        return [_to_job(row) for row in rows]
+
+    # --- leases (multi-process) ---
+
+    def _immediate(self):
+        """Transacción con lock de escritura desde el inicio"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def claim(self, owner: str, limit: int, lease_seconds: float = LEASE_SECONDS) -> List[BatchJob]:
+        """
+        Toma hasta `limit` trabajos libres (o con lease vencido)
+
+        Primero los que ya tienen task_id (un render pagado que quedó
+        huérfano), luego por prioridad y orden de creación.
+
+        Args:
+            owner: ID del worker
+            limit: Máximo de trabajos a tomar
+            lease_seconds: Duración del lease
+
+        Returns:
+            Trabajos tomados
+        """
+        now = time.time()
+        with self._lock, self._immediate():
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE state NOT IN (?, ?)"
+                " AND (lease_expires IS NULL OR lease_expires < ?)"
+                " ORDER BY task_id IS NULL, json_extract(params, '$.priority') DESC, id LIMIT ?",
+                FINAL_STATES + (now, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET lease_owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, now + lease_seconds, row["id"]) for row in rows]
+            )
+        return [_to_job(row) for row in rows]
+
+    def acquire(self, owner: str, job_ids: List[int], lease_seconds: float = LEASE_SECONDS) -> List[int]:
+        """
+        Toma trabajos concretos si nadie más los tiene
+
+        Returns:
+            IDs que quedaron a nombre de `owner`
+        """
+        now = time.time()
+        acquired = []
+        with self._lock, self._immediate():
+            for job_id in job_ids:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_owner = ?, lease_expires = ? WHERE id = ?"
+                    " AND (lease_expires IS NULL OR lease_expires < ? OR lease_owner = ?)",
+                    (owner, now + lease_seconds, job_id, now, owner)
+                )
+                if cursor.rowcount:
+                    acquired.append(job_id)
+        return acquired
+
+    def renew(self, owner: str, job_ids: List[int], lease_seconds: float = LEASE_SECONDS) -> List[int]:
+        """
+        Heartbeat: extiende los leases de `owner`
+
+        Returns:
+            IDs cuyo lease ya no es de `owner` (vencido y tomado por otro)
+        """
+        expires = time.time() + lease_seconds
+        lost = []
+        with self._lock, self._conn:
+            for job_id in job_ids:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                    (expires, job_id, owner)
+                )
+                if not cursor.rowcount:
+                    lost.append(job_id)
+        return lost
+
+    def release(self, owner: str, job_id: int, delay: float = 0) -> None:
+        """
+        Libera el lease de un trabajo
+
+        Args:
+            owner: Dueño actual
+            job_id: Trabajo
+            delay: Segundos antes de que otro worker pueda tomarlo
+                (p.ej. tras una descarga fallida)
+        """
+        expires = time.time() + delay if delay else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (expires, job_id, owner)
+            )
+
+    def max_clip_number(self) -> int:
+        """Mayor número de clip reservado (0 si no hay trabajos)"""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(clip_number) AS n FROM jobs").fetchone()
+        return row["n"] or 0
+
+    def record_validation(self, job_id: int, report: Dict) -> None:
+        """Guarda el resultado de validar un clip (ver kling_validation)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO validations (job_id, ok, report, at) VALUES (?, ?, ?, ?)",
+                (job_id, int(report["ok"]), json.dumps(report), time.time())
+            )
+
+    def validations(self, job_id: int) -> List[Dict]:
+        """Validaciones de un trabajo, la más reciente al final"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT report FROM validations WHERE job_id = ? ORDER BY at", (job_id,)
+            ).fetchall()
+        return [json.loads(row["report"]) for row in rows]
+
+    def history(self, job_id: int) -> List[sqlite3.Row]:
+        """Transiciones de estado de un trabajo"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT state, at, detail FROM transitions WHERE job_id = ? ORDER BY at",
+                (job_id,)
+            ).fetchall()
+
+
+class LeaseKeeper:
+    """
+    Heartbeat de los leases que tiene un proceso
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        owner: str,
+        lease_seconds: float = LEASE_SECONDS,
+        interval: Optional[float] = None
+    ):
+        """
+        Inicializar heartbeat
+
+        Args:
+            store: Registro compartido
+            owner: ID del proceso dueño de los leases
+            lease_seconds: Duración de cada renovación
+            interval: Segundos entre renovaciones (por defecto lease / 4)
+        """
+        self.store = store
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.interval = interval or lease_seconds / 4
+        self.lost: Set[int] = set()
+        self._ids: Set[int] = set()
+
+        # Called with the lost job_ids (e.g. BatchEngine.drop)
+        self.on_lost: Optional[Callable[[List[int]], None]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, job_id: int) -> None:
+        with self._lock:
+            self._ids.add(job_id)
+
+    def release(self, job_id: int, delay: float = 0) -> None:
+        """Deja de renovar el trabajo y libera su lease"""
+        with self._lock:
+            self._ids.discard(job_id)
+        self.store.release(self.owner, job_id, delay)
+
+    def renew(self) -> List[int]:
+        """Renueva ahora; devuelve los IDs cuyo lease se perdió"""
+        with self._lock:
+            ids = list(self._ids)
+        lost = self.store.renew(self.owner, ids, self.lease_seconds) if ids else []
+        if lost:
+            with self._lock:
+                self._ids.difference_update(lost)
+                self.lost.update(lost)
+            # Another worker now owns them; stop working on them here
+            logger.warning(f"[!] Leases perdidos (¿proceso pausado más de {self.lease_seconds:.0f}s?): {lost}",
+                           extra={"worker": self.owner, "job_ids": lost})
+            if self.on_lost is not None:
+                self.on_lost(lost)
+        return lost
+
+    def start(self) -> "LeaseKeeper":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el heartbeat y libera lo que quedó sin terminar"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+        # Nobody works on them after this; let --reanudar or a worker take them now
+        with self._lock:
+            ids, self._ids = list(self._ids), set()
+        for job_id in ids:
+            self.store.release(self.owner, job_id)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.renew()
+            except sqlite3.Error as e:
+                logger.error(f"ERROR renovando leases: {e}", extra={"worker": self.owner})
+
+
+def _params(job: BatchJob) -> dict:
+    return {
+        "mode": job.mode,
+        "duration": job.duration,
+        "aspect_ratio": job.aspect_ratio,
+        "priority": job.priority,
+        "deadline": job.deadline
+    }
+
+
+def _to_job(row: sqlite3.Row) -> BatchJob:
+    params = json.loads(row["params"])
+    return BatchJob(
+        image_path=row["image_path"],
+        clip_number=row["clip_number"],
+        prompt=row["prompt"],
+        mode=params.get("mode", "pro"),
+        duration=params.get("duration", 10),
+        aspect_ratio=params.get("aspect_ratio", "9:16"),
+        priority=params.get("priority", 0),
+        deadline=params.get("deadline"),
+        task_id=row["task_id"],
+        status=row["state"],
+        video_url=row["video_url"],
+        output_path=Path(row["output_path"]) if row["output_path"] else None,
+        error=row["error"],
+        submitted_at=row["submitted_at"],
+        job_id=row["id"]
+    )
@@ -0,0 +1,326 @@
+"""
+Manifiesto de Salidas - Kling AI
+================================
+
+Un único registro indexado (SQLite) de todos los clips generados, en
+lugar de un clip_XX_config.txt por clip y de recorrer outputs/ con glob
+para numerar.
+
+Por cada clip se agrega una fila (nunca se reescribe): número de clip,
+imagen (path, nombre, SHA-256 y tamaño), prompt completo, modelo, modo,
+duración, relación de aspecto, task_id, origen (render o caché),
+tiempos (envío, inicio del render, fin) y tamaño del archivo. Si un
+número se vuelve a escribir, la fila más reciente es la vigente.
+
+Numeración: un contador dentro de una transacción (BEGIN IMMEDIATE), así
+dos procesos nunca reciben el mismo número y reservar cuesta lo mismo
+con 10 clips que con 50.000. Al crear el manifiesto por primera vez, el
+contador arranca después del mayor clip_XX.mp4 existente (un único
+recorrido de outputs/).
+
+Las consultas usan índices: clip, imagen (path o nombre), hash de la
+imagen y task_id.
+
+Uso:
+  manifest = OutputManifest()
+  first = manifest.allocate_clip_numbers(6)
+  manifest.for_image("01.jpg")
+
+  python kling_manifest.py                   # últimos clips
+  python kling_manifest.py --imagen 01.jpg   # todos los clips de una imagen
+  python kling_manifest.py --clip 7 --json
+  python kling_manifest.py --siguiente       # próximo número libre
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clip_number INTEGER NOT NULL,
+    image_path TEXT NOT NULL,
+    image_name TEXT NOT NULL,
+    image_sha256 TEXT,
+    image_size INTEGER,
+    prompt TEXT NOT NULL,
+    model TEXT,
+    mode TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    aspect_ratio TEXT NOT NULL,
+    task_id TEXT,
+    source TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    output_size INTEGER,
+    submitted_at REAL,
+    processing_at REAL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clips_number ON clips(clip_number);
+CREATE INDEX IF NOT EXISTS idx_clips_image_path ON clips(image_path);
+CREATE INDEX IF NOT EXISTS idx_clips_image_name ON clips(image_name);
+CREATE INDEX IF NOT EXISTS idx_clips_sha256 ON clips(image_sha256);
+CREATE INDEX IF NOT EXISTS idx_clips_task_id ON clips(task_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Output source of a clip
+RENDER = "render"
+CACHE = "cache"
+
+
+def _existing_clips(outputs_folder: Path) -> int:
+    """Mayor número entre los clip_XX.mp4 de la carpeta (0 si no hay)"""
+    highest = 0
+    for clip in outputs_folder.glob("clip_*.mp4"):
+        try:
+            highest = max(highest, int(clip.stem.split('_')[1]))
+        except (IndexError, ValueError):
+            continue
+    return highest
+
+
+class OutputManifest:
+    """
+    Registro de clips generados y contador de números de clip
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Inicializar manifiesto
+
+        Args:
+            db_path: Archivo SQLite (por defecto outputs/manifest.sqlite);
+                su carpeta es la de los clips
+        """
+        if db_path is None:
+            db_path = Path(__file__).parent / "outputs" / "manifest.sqlite"
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        with self._lock, self._immediate():
+            if self._counter() is None:
+                # First open: continue after the clips already on disk
+                self._conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('clip', ?)",
+                    (_existing_clips(self.db_path.parent),)
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _immediate(self):
+        """Transacción con lock de escritura desde el inicio"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def _counter(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM counters WHERE name = 'clip'").fetchone()
+        return row["value"] if row else None
+
+    # --- numbering ---
+
+    def allocate_clip_numbers(self, count: int, floor: int = 0) -> int:
+        """
+        Reserva `count` números de clip consecutivos (atómico entre procesos)
+
+        Args:
+            count: Cantidad de números
+            floor: Número ya usado por otra fuente (p.ej. trabajos del JobStore)
+
+        Returns:
+            El primero de los números reservados
+        """
+        with self._lock, self._immediate():
+            first = max(self._counter() or 0, floor) + 1
+            self._conn.execute(
+                "UPDATE counters SET value = ? WHERE name = 'clip'",
+                (first + max(0, count) - 1,)
+            )
+        return first
+
+    def last_clip_number(self) -> int:
+        """Último número reservado (0 si todavía no hay ninguno)"""
+        with self._lock:
+            return self._counter() or 0
+
+    # --- records ---
+
+    def record(
+        self,
+        clip_number: int,
+        image_path: str,
+        prompt: str,
+        output_path,
+        mode: str,
+        duration: int,
+        aspect_ratio: str,
+        task_id: Optional[str] = None,
+        image_sha256: Optional[str] = None,
+        model: Optional[str] = None,
+        source: str = RENDER,
+        submitted_at: Optional[float] = None,
+        processing_at: Optional[float] = None,
+        finished_at: Optional[float] = None
+    ) -> int:
+        """
+        Agrega la fila de un clip terminado
+
+        Args:
+            clip_number: Número de clip
+            image_path: Imagen original
+            prompt: Prompt completo enviado
+            output_path: Clip generado
+            mode: "std" o "pro"
+            duration: Duración pedida (segundos)
+            aspect_ratio: Relación de aspecto
+            task_id: Tarea de Kling que lo generó
+            image_sha256: Hash de la imagen original
+            model: Modelo de Kling
+            source: "render" o "cache"
+            submitted_at: Envío de la tarea (epoch)
+            processing_at: Inicio del render (epoch)
+            finished_at: Fin (por defecto ahora)
+
+        Returns:
+            ID de la fila
+        """
+        image = Path(image_path)
+        output = Path(output_path)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO clips (clip_number, image_path, image_name, image_sha256, image_size,"
+                " prompt, model, mode, duration, aspect_ratio, task_id, source, output_path,"
+                " output_size, submitted_at, processing_at, finished_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    clip_number, str(image), image.name, image_sha256, _size(image),
+                    prompt, model, mode, duration, aspect_ratio, task_id, source, str(output),
+                    _size(output), submitted_at, processing_at, finished_at or time.time()
+                )
+            )
+        return cursor.lastrowid
+
+    def get(self, clip_number: int) -> Optional[Dict]:
+        """Fila vigente de un número de clip"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM clips WHERE clip_number = ? ORDER BY id DESC LIMIT 1", (clip_number,)
+            ).fetchone()
+        return _to_dict(row) if row else None
+
+    def for_image(self, image: str) -> List[Dict]:
+        """
+        Clips de una imagen, en orden de creación
+
+        Args:
+            image: Path de la imagen o solo su nombre ("01.jpg")
+        """
+        return self._select("image_path = ? OR image_name = ?", (image, image))
+
+    def for_hash(self, image_sha256: str) -> List[Dict]:
+        """Clips de una imagen por contenido (aunque haya cambiado de nombre)"""
+        return self._select("image_sha256 = ?", (image_sha256,))
+
+    def for_task(self, task_id: str) -> List[Dict]:
+        """Clips generados por una tarea de Kling"""
+        return self._select("task_id = ?", (task_id,))
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """Últimos clips registrados, el más reciente al final"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM clips ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_to_dict(row) for row in reversed(rows)]
+
+    def _select(self, where: str, params: tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM clips WHERE {where} ORDER BY id", params).fetchall()
+        return [_to_dict(row) for row in rows]
+
+
+def _size(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
+
+
+def _to_dict(row: sqlite3.Row) -> Dict:
+    record = dict(row)
+    if record["submitted_at"] and record["finished_at"]:
+        record["seconds"] = round(record["finished_at"] - record["submitted_at"], 1)
+    else:
+        record["seconds"] = None
+    return record
+
+
+def main(argv=None) -> int:
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Consultas al manifiesto de clips generados")
+    parser.add_argument("--db", help="Archivo SQLite (por defecto outputs/manifest.sqlite)")
+    parser.add_argument("--imagen", help="Clips de esta imagen (path o nombre)")
+    parser.add_argument("--clip", type=int, help="Un número de clip")
+    parser.add_argument("--task", help="Clips de este task_id")
+    parser.add_argument("--ultimos", type=int, default=20, help="Cantidad a listar sin filtros")
+    parser.add_argument("--siguiente", action="store_true", help="Mostrar el próximo número libre")
+    parser.add_argument("--json", action="store_true", help="Una línea JSON por clip")
+    args = parser.parse_args(argv)
+
+    manifest = OutputManifest(args.db)
+    try:
+        if args.siguiente:
+            print(manifest.last_clip_number() + 1)
+            return 0
+
+        if args.clip is not None:
+            record = manifest.get(args.clip)
+            records = [record] if record else []
+        elif args.imagen:
+            records = manifest.for_image(args.imagen)
+        elif args.task:
+            records = manifest.for_task(args.task)
+        else:
+            records = manifest.recent(args.ultimos)
+    finally:
+        manifest.close()
+
+    for record in records:
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+            continue
+        size = f"{record['output_size'] / 1024 / 1024:.1f}MB" if record["output_size"] else "?"
+        seconds = f"{record['seconds']:.0f}s" if record["seconds"] is not None else "-"
+        print(f"clip_{record['clip_number']:02d}  {record['image_name']}  {record['mode']} "
+              f"{record['duration']}s {record['aspect_ratio']}  {record['source']}  {seconds}  {size}"
+              f"  {record['task_id'] or ''}")
+
+    if not records:
+        print("Sin clips registrados", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Métricas y Logging - Kling AI
+=============================
+
+Instrumentación de bajo costo para saber dónde se va el tiempo en
+cientos de clips, y logging estructurado en lugar de prints.
+
+Métricas que registran los clientes y el motor de lotes:
+  kling_image_prepare_seconds       lectura + ajuste de la imagen
+  kling_upload_bytes_total          bytes de JSON enviados en submits
+  kling_submit_seconds{result}      RTT de cada intento de submit
+  kling_submits_total{result}       accepted / throttled / rejected / error
+  kling_queue_seconds               submit -> primer "processing"
+  kling_render_seconds{mode,duration}  submit -> "succeed"
+  kling_polls_per_task              consultas de estado por tarea
+  kling_status_requests_total{endpoint}  task / list
+  kling_callbacks_total             resultados recibidos por callback
+  kling_download_seconds            duración de cada descarga
+  kling_download_bytes_total        bytes descargados
+  kling_download_throughput_bytes   bytes/s por descarga
+  kling_retries_total{kind}         submit / download
+  kling_tasks_total{result}         succeed / failed / cached / timeout
+  kling_validations_total{result}   ok / redownload / regenerate / failed
+  kling_validation_seconds          probe + póster de cada clip
+  kling_schedule_wait_seconds{lane,cost_class}  cola local hasta el submit
+  kling_deadlines_missed_total      trabajos terminados tras su deadline
+
+Los contadores son sumas con lock; las duraciones se guardan como
+count/sum/min/max más una muestra acotada para percentiles.
+
+Exportación:
+  metrics.to_prometheus()       formato de texto de Prometheus
+  metrics.snapshot()            dict JSON-serializable
+  metrics.write("m.prom")       .prom -> Prometheus, otro -> JSON
+
+Logging:
+  configure_logging()                    mensajes simples (CLIs interactivos)
+  configure_logging(json_format=True)    una línea JSON por evento, con
+                                         los campos de extra= (task_id, clip...)
+
+Uso:
+  with client.metrics.timer("kling_image_prepare_seconds"):
+      data = preprocess_image(path)
+  client.metrics.inc("kling_retries_total", kind="submit")
+  client.metrics.write("outputs/metrics.prom")
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Samples kept per summary for percentiles
+RESERVOIR_SIZE = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "kling_image_prepare_seconds": "Image read and preprocessing time",
+    "kling_upload_bytes_total": "Submit request body bytes",
+    "kling_submit_seconds": "Submit round trip time per attempt",
+    "kling_submits_total": "Submit attempts by result",
+    "kling_queue_seconds": "Time from submit to first processing status",
+    "kling_render_seconds": "Time from submit to succeed",
+    "kling_polls_per_task": "Status polls per finished task",
+    "kling_status_requests_total": "Status requests by endpoint",
+    "kling_callbacks_total": "Task results received by callback",
+    "kling_download_seconds": "Download duration",
+    "kling_download_bytes_total": "Downloaded bytes",
+    "kling_download_throughput_bytes": "Download throughput in bytes per second",
+    "kling_retries_total": "Retried requests by kind",
+    "kling_tasks_total": "Finished tasks by result",
+    "kling_validations_total": "Clip validations by outcome",
+    "kling_validation_seconds": "Clip probe and poster extraction time",
+    "kling_schedule_wait_seconds": "Time from queued to submitted",
+    "kling_deadlines_missed_total": "Jobs finished after their deadline"
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Summary:
+    """count/sum/min/max y una muestra uniforme para percentiles"""
+
+    __slots__ = ("count", "sum", "min", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.samples: List[float] = []
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+        else:
+            # Reservoir sampling keeps a uniform sample of every value seen
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = value
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Metrics:
+    """
+    Registro thread-safe de contadores y duraciones
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Suma `value` al contador `name`"""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Registra una muestra (segundos, bytes/s, cantidad...)"""
+        key = _labels(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            if key not in series:
+                series[key] = _Summary()
+            series[key].add(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Mide el bloque con perf_counter y lo registra en `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict:
+        """
+        Estado actual como dict JSON-serializable
+
+        Returns:
+            {"counters": {name: [{labels, value}]},
+             "summaries": {name: [{labels, count, sum, min, max, mean, p50, p95, p99}]}}
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            summaries = {}
+            for name, series in self._summaries.items():
+                summaries[name] = []
+                for key, summary in series.items():
+                    entry = {
+                        "labels": dict(key),
+                        "count": summary.count,
+                        "sum": round(summary.sum, 6),
+                        "min": round(summary.min, 6),
+                        "max": round(summary.max, 6),
+                        "mean": round(summary.sum / summary.count, 6)
+                    }
+                    for q in QUANTILES:
+                        entry[f"p{int(q * 100)}"] = round(summary.quantile(q), 6)
+                    summaries[name].append(entry)
+        return {"created_at": time.time(), "counters": counters, "summaries": summaries}
+
+    def to_prometheus(self) -> str:
+        """Exposición en formato de texto de Prometheus (0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+            for name, series in sorted(self._summaries.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} summary")
+                for key, summary in series.items():
+                    for q in QUANTILES:
+                        labels = _format_labels(key + (("quantile", str(q)),))
+                        lines.append(f"{name}{labels} {_format_value(summary.quantile(q))}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(summary.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path) -> None:
+        """
+        Guarda las métricas (escritura atómica)
+
+        Args:
+            path: ".prom"/".txt" -> Prometheus; cualquier otro -> JSON
+        """
+        path = Path(path)
+        if path.suffix in (".prom", ".txt"):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(content, encoding='utf-8')
+        os.replace(tmp, path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# --- logging ---
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por evento, con los campos pasados en extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field, value in vars(record).items():
+            if field not in _RECORD_FIELDS and not field.startswith("_"):
+                event[field] = value
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    stream=None
+) -> None:
+    """
+    Configura el logging de los módulos kling_* (para los CLIs)
+
+    Args:
+        level: Nivel (por defecto KLING_LOG_LEVEL o INFO)
+        json_format: Una línea JSON por evento (por defecto KLING_LOG_JSON=1)
+        stream: Destino (por defecto stderr)
+    """
+    level = (level or os.getenv("KLING_LOG_LEVEL", "INFO")).upper()
+    if json_format is None:
+        json_format = os.getenv("KLING_LOG_JSON", "") in ("1", "true", "yes")
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
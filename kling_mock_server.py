@@ -0,0 +1,576 @@
+"""
+Servidor Simulado de la API - Kling AI
+======================================
+
+Reemplazo local de api-singapore.klingai.com para probar y medir el
+cliente sin gastar créditos ni depender de la red.
+
+Implementa lo que usa el cliente:
+  POST /v1/videos/image2video              submit (valida JSON e imagen base64)
+  GET  /v1/videos/image2video/{task_id}    estado de una tarea
+  GET  /v1/videos/image2video?pageNum=&pageSize=   listado (más recientes primero)
+  GET  /media/{task_id}.mp4                MP4 falso, con soporte de Range
+  GET  /mock/stats                         contadores del servidor (JSON)
+
+El JWT se valida como en el servicio real: HS256 con la SecretKey,
+"iss" igual a la AccessKey y ventana exp/nbf. Cada respuesta lleva el
+header Date, así que el cliente también puede medir el desfase de reloj.
+
+Comportamiento configurable (MockConfig):
+  - Tiempo de render por tarea: "fixed:S", "uniform:A:B",
+    "normal:MEDIA:DESVIO" o "lognormal:MU:SIGMA" (segundos), escalado
+    por time_scale para simular horas en minutos
+  - Tasa de errores 500 y de 429 (código 1302 + Retry-After)
+  - Cuota de tareas simultáneas (429, código 1303, al excederla)
+  - Fracción de renders que terminan en "failed"
+  - Descargas lentas (bytes/s) y cortadas a la mitad
+  - Descargas completas pero con el MP4 dañado (para kling_validation)
+  - POST al callback_url del submit al empezar y al terminar cada
+    render, con una fracción opcional de avisos perdidos
+
+Uso:
+  python kling_mock_server.py --port 8765 --render-time uniform:60:180 --time-scale 0.05
+  KLING_API_DOMAIN=http://127.0.0.1:8765 python generar_lote.py lote.jsonl
+
+  with MockKlingServer(MockConfig(render_time="fixed:2")) as server:
+      client = KlingAPICorrect("mock-access", "mock-secret", api_domain=server.url)
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+
+
+# Kling business codes
+CODE_OK = 0
+CODE_AUTH_FAILED = 1000
+CODE_AUTH_EMPTY = 1001
+CODE_AUTH_INVALID = 1002
+CODE_AUTH_NOT_YET_VALID = 1003
+CODE_AUTH_EXPIRED = 1004
+CODE_BAD_REQUEST = 1200
+CODE_NOT_FOUND = 1203
+CODE_RATE_LIMIT = 1302
+CODE_CONCURRENCY = 1303
+CODE_SERVER_ERROR = 5000
+
+STATUS_ROUTE = re.compile(r"^/v1/videos/image2video/([\w-]+)$")
+MEDIA_ROUTE = re.compile(r"^/media/([\w-]+)\.mp4$")
+
+
+@dataclass
+class MockConfig:
+    """Parámetros del servidor simulado"""
+
+    access_key: str = "mock-access"
+    secret_key: str = "mock-secret"
+    render_time: str = "uniform:60:180"
+    time_scale: float = 1.0
+    queue_time: float = 2.0
+    concurrency_quota: int = 3
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    failure_rate: float = 0.0
+    video_bytes: int = 2 * 1024 * 1024
+    download_rate: int = 0  # bytes/s, 0 = unlimited
+    partial_rate: float = 0.0
+    corrupt_rate: float = 0.0
+    callback_loss_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+def parse_distribution(spec: str, rng: random.Random) -> Callable[[], float]:
+    """
+    Muestreador de tiempos a partir de una especificación
+
+    Args:
+        spec: "fixed:S", "uniform:A:B", "normal:MEDIA:DESVIO" o "lognormal:MU:SIGMA"
+        rng: Generador aleatorio a usar
+
+    Returns:
+        Función sin argumentos que devuelve segundos (>= 0)
+
+    Raises:
+        ValueError: Si la especificación no es válida
+    """
+    name, *args = spec.split(":")
+    try:
+        values = [float(a) for a in args]
+    except ValueError:
+        raise ValueError(f"distribución inválida: {spec!r}")
+
+    samplers = {
+        ("fixed", 1): lambda: values[0],
+        ("uniform", 2): lambda: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda: rng.gauss(values[0], values[1]),
+        ("lognormal", 2): lambda: rng.lognormvariate(values[0], values[1])
+    }
+    sampler = samplers.get((name, len(values)))
+    if sampler is None:
+        raise ValueError(f"distribución inválida: {spec!r}")
+    return lambda: max(0.0, sampler())
+
+
+def fake_mp4(size: int, corrupt: bool = False) -> bytes:
+    """
+    Bytes con cajas MP4 (ftyp + moov vacío + mdat) del tamaño pedido
+
+    Args:
+        size: Tamaño total
+        corrupt: La caja mdat declara más bytes de los que hay (truncado)
+    """
+    ftyp = b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2"
+    moov = b"\x00\x00\x00\x08moov"
+    mdat_size = max(8, size - len(ftyp) - len(moov))
+    declared = mdat_size * 2 if corrupt else mdat_size
+    mdat = declared.to_bytes(4, "big") + b"mdat" + bytes(mdat_size - 8)
+    return ftyp + moov + mdat
+
+
+class MockState:
+    """Tareas, cuota y contadores compartidos por los handlers"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.render_time = parse_distribution(config.render_time, self.rng)
+        self.video = fake_mp4(config.video_bytes)
+        self.corrupt_video = fake_mp4(config.video_bytes, corrupt=True)
+        self.tasks: Dict[str, Dict] = {}
+        self.stats: Dict[str, int] = {
+            "submit": 0, "status": 0, "list": 0, "download": 0,
+            "bytes_uploaded": 0, "bytes_downloaded": 0,
+            "auth_errors": 0, "rate_limited": 0, "quota_rejected": 0,
+            "server_errors": 0, "partial_downloads": 0, "corrupt_downloads": 0,
+            "callbacks": 0, "callbacks_lost": 0, "callback_errors": 0
+        }
+        self.lock = threading.Lock()
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += amount
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def task_view(self, task: Dict, base_url: str) -> Dict:
+        """Tarea con el estado que corresponde al momento actual"""
+        now = time.time()
+        if now < task["start_at"]:
+            status = "submitted"
+        elif now < task["done_at"]:
+            status = "processing"
+        else:
+            status = task["outcome"]
+
+        view = {
+            "task_id": task["task_id"],
+            "task_status": status,
+            "task_status_msg": "mock render failure" if status == "failed" else "",
+            "created_at": int(task["created_at"] * 1000),
+            "updated_at": int(min(now, task["done_at"]) * 1000)
+        }
+        if status == "succeed":
+            view["task_result"] = {"videos": [{
+                "id": task["task_id"],
+                "url": f"{base_url}/media/{task['task_id']}.mp4",
+                "duration": str(task["duration"])
+            }]}
+        return view
+
+    def active_tasks(self) -> int:
+        now = time.time()
+        return sum(1 for task in self.tasks.values() if task["done_at"] > now)
+
+    def schedule_callbacks(self, task: Dict, base_url: str) -> None:
+        """Avisa al callback_url cuando la tarea empieza y cuando termina"""
+        now = time.time()
+        for at in (task["start_at"], task["done_at"]):
+            timer = threading.Timer(max(0.0, at - now), self.send_callback, (task, base_url))
+            timer.daemon = True
+            timer.start()
+
+    def send_callback(self, task: Dict, base_url: str) -> None:
+        view = self.task_view(task, base_url)
+        if view["task_status"] in ("succeed", "failed") and self.roll(self.config.callback_loss_rate):
+            self.count("callbacks_lost")
+            return
+
+        request = urllib.request.Request(
+            task["callback_url"],
+            data=json.dumps(view).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                self.count("callbacks")
+        except (OSError, ValueError):
+            self.count("callback_errors")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Handler HTTP del servidor simulado"""
+
+    protocol_version = "HTTP/1.1"
+    state: MockState = None  # set per server class
+
+    def log_message(self, *args):
+        pass
+
+    # --- helpers ---
+
+    @property
+    def base_url(self) -> str:
+        host = self.headers.get("Host") or "%s:%d" % self.server.server_address[:2]
+        return f"http://{host}"
+
+    def send_json(self, status: int, code: int, data=None, message: str = "SUCCEED",
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps({
+            "code": code,
+            "message": message,
+            "request_id": uuid.uuid4().hex,
+            "data": data
+        }).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorize(self) -> bool:
+        """Valida el JWT como el servicio real; responde 401 si falla"""
+        config = self.state.config
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            self.state.count("auth_errors")
+            self.send_json(401, CODE_AUTH_EMPTY, message="Authorization header is empty")
+            return False
+
+        try:
+            claims = jwt.decode(
+                header[len("Bearer "):], config.secret_key, algorithms=["HS256"],
+                options={"require": ["exp", "nbf", "iss"]}
+            )
+            if claims["iss"] != config.access_key:
+                raise jwt.InvalidIssuerError("unknown access key")
+        except jwt.ExpiredSignatureError:
+            code, message = CODE_AUTH_EXPIRED, "token expired"
+        except jwt.ImmatureSignatureError:
+            code, message = CODE_AUTH_NOT_YET_VALID, "token not yet valid"
+        except jwt.InvalidIssuerError:
+            code, message = CODE_AUTH_FAILED, "unknown access key"
+        except jwt.InvalidTokenError as e:
+            code, message = CODE_AUTH_INVALID, f"invalid token: {e}"
+        else:
+            return True
+
+        self.state.count("auth_errors")
+        self.send_json(401, code, message=message)
+        return False
+
+    def inject_faults(self) -> bool:
+        """Errores 500/429 aleatorios; True si ya se respondió"""
+        config = self.state.config
+        if self.state.roll(config.rate_limit_rate):
+            self.state.count("rate_limited")
+            self.send_json(429, CODE_RATE_LIMIT, message="rate limit exceeded",
+                           headers={"Retry-After": str(config.retry_after)})
+            return True
+        if self.state.roll(config.error_rate):
+            self.state.count("server_errors")
+            self.send_json(500, CODE_SERVER_ERROR, message="internal error")
+            return True
+        return False
+
+    def drain_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    # --- routes ---
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.drain_body()
+        if path != "/v1/videos/image2video":
+            self.send_json(404, CODE_NOT_FOUND, message="not found")
+            return
+
+        self.state.count("submit")
+        self.state.count("bytes_uploaded", len(body))
+        if not self.authorize() or self.inject_faults():
+            return
+
+        try:
+            payload = json.loads(body)
+            base64.b64decode(payload["image"], validate=True)
+            duration = int(payload.get("duration", 5))
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            self.send_json(400, CODE_BAD_REQUEST, message=f"invalid request: {e}")
+            return
+
+        state = self.state
+        config = state.config
+        with state.lock:
+            if state.active_tasks() >= config.concurrency_quota:
+                state.stats["quota_rejected"] += 1
+                rejected = True
+            else:
+                rejected = False
+                now = time.time()
+                start_at = now + config.queue_time * config.time_scale
+                task = {
+                    "task_id": uuid.uuid4().hex,
+                    "created_at": now,
+                    "start_at": start_at,
+                    "done_at": start_at + state.render_time() * config.time_scale,
+                    "outcome": "failed" if state.rng.random() < config.failure_rate else "succeed",
+                    "duration": duration,
+                    "mode": payload.get("mode", "std"),
+                    "callback_url": payload.get("callback_url")
+                }
+                state.tasks[task["task_id"]] = task
+
+        if rejected:
+            self.send_json(429, CODE_CONCURRENCY, message="concurrent task limit exceeded",
+                           headers={"Retry-After": str(config.retry_after)})
+            return
+
+        if task["callback_url"]:
+            state.schedule_callbacks(task, self.base_url)
+
+        self.send_json(200, CODE_OK, {
+            "task_id": task["task_id"],
+            "task_status": "submitted",
+            "created_at": int(task["created_at"] * 1000),
+            "updated_at": int(task["created_at"] * 1000)
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path == "/mock/stats":
+            with self.state.lock:
+                data = dict(self.state.stats, tasks=len(self.state.tasks),
+                            active=self.state.active_tasks())
+            self.send_json(200, CODE_OK, data)
+            return
+
+        media = MEDIA_ROUTE.match(url.path)
+        if media:
+            self.serve_media(media.group(1))
+            return
+
+        status = STATUS_ROUTE.match(url.path)
+        if status or url.path == "/v1/videos/image2video":
+            self.state.count("status" if status else "list")
+            if not self.authorize() or self.inject_faults():
+                return
+
+        if status:
+            task = self.state.tasks.get(status.group(1))
+            if task is None:
+                self.send_json(404, CODE_NOT_FOUND, message="task not found")
+            else:
+                self.send_json(200, CODE_OK, self.state.task_view(task, self.base_url))
+        elif url.path == "/v1/videos/image2video":
+            query = parse_qs(url.query)
+            page_num = max(1, int(query.get("pageNum", ["1"])[0]))
+            page_size = min(500, max(1, int(query.get("pageSize", ["30"])[0])))
+            with self.state.lock:
+                tasks = sorted(self.state.tasks.values(), key=lambda t: t["created_at"], reverse=True)
+            page = tasks[(page_num - 1) * page_size:page_num * page_size]
+            self.send_json(200, CODE_OK, [self.state.task_view(t, self.base_url) for t in page])
+        else:
+            self.send_json(404, CODE_NOT_FOUND, message="not found")
+
+    def serve_media(self, task_id: str) -> None:
+        """MP4 falso con Range, descarga lenta y cortes opcionales"""
+        state = self.state
+        task = state.tasks.get(task_id)
+        if task is None or task["outcome"] != "succeed" or time.time() < task["done_at"]:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        state.count("download")
+        video = memoryview(state.video)
+        if not self.headers.get("Range") and state.roll(state.config.corrupt_rate):
+            # Same length, so HTTP sees a complete body; only the container is broken
+            state.count("corrupt_downloads")
+            video = memoryview(state.corrupt_video)
+        total = len(video)
+        start, end = 0, total - 1
+
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or total - 1), total - 1)
+            if start >= total:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+        else:
+            self.send_response(200)
+
+        length = end - start + 1
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+        # Promise the full length, then hang up halfway through
+        if state.roll(state.config.partial_rate):
+            state.count("partial_downloads")
+            end = start + length // 2 - 1
+            self.close_connection = True
+
+        chunk = 64 * 1024
+        rate = state.config.download_rate
+        try:
+            for offset in range(start, end + 1, chunk):
+                piece = video[offset:min(offset + chunk, end + 1)]
+                self.wfile.write(piece)
+                state.count("bytes_downloaded", len(piece))
+                if rate:
+                    time.sleep(len(piece) / rate)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class MockKlingServer:
+    """
+    Servidor simulado en un thread de fondo
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Inicializar servidor
+
+        Args:
+            config: Comportamiento simulado (por defecto MockConfig())
+            host: Interfaz donde escuchar
+            port: Puerto (0 = uno libre)
+        """
+        self.config = config or MockConfig()
+        self.state = MockState(self.config)
+        handler = type("BoundMockHandler", (MockHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> Dict[str, int]:
+        """Copia de los contadores del servidor"""
+        with self.state.lock:
+            return dict(self.state.stats)
+
+    def start(self) -> "MockKlingServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockKlingServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    """Función principal"""
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Servidor local que simula la API de Kling")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--access-key", default=defaults.access_key)
+    parser.add_argument("--secret-key", default=defaults.secret_key)
+    parser.add_argument("--render-time", default=defaults.render_time,
+                        help="fixed:S | uniform:A:B | normal:MEDIA:DESVIO | lognormal:MU:SIGMA")
+    parser.add_argument("--time-scale", type=float, default=defaults.time_scale,
+                        help="Multiplica los tiempos de cola y render (0.01 = 100x más rápido)")
+    parser.add_argument("--queue-time", type=float, default=defaults.queue_time)
+    parser.add_argument("--quota", type=int, default=defaults.concurrency_quota,
+                        help="Tareas simultáneas antes de responder 429/1303")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument("--video-bytes", type=int, default=defaults.video_bytes)
+    parser.add_argument("--download-rate", type=int, default=defaults.download_rate,
+                        help="Bytes/s por descarga (0 = sin límite)")
+    parser.add_argument("--partial-rate", type=float, default=defaults.partial_rate,
+                        help="Fracción de descargas cortadas a la mitad")
+    parser.add_argument("--corrupt-rate", type=float, default=defaults.corrupt_rate,
+                        help="Fracción de descargas completas con el MP4 dañado")
+    parser.add_argument("--callback-loss-rate", type=float, default=defaults.callback_loss_rate,
+                        help="Fracción de callbacks de fin que nunca se envían")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        access_key=args.access_key,
+        secret_key=args.secret_key,
+        render_time=args.render_time,
+        time_scale=args.time_scale,
+        queue_time=args.queue_time,
+        concurrency_quota=args.quota,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        failure_rate=args.failure_rate,
+        video_bytes=args.video_bytes,
+        download_rate=args.download_rate,
+        partial_rate=args.partial_rate,
+        corrupt_rate=args.corrupt_rate,
+        callback_loss_rate=args.callback_loss_rate,
+        seed=args.seed
+    )
+    server = MockKlingServer(config, args.host, args.port)
+
+    print(f"[MOCK] Escuchando en {server.url}")
+    print(f"[MOCK] Credenciales: {config.access_key} / {config.secret_key}")
+    print(f"[MOCK] Config: {json.dumps(asdict(config))}")
+    print(f"[MOCK] Usa: KLING_API_DOMAIN={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[MOCK] Detenido")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Consulta de Estado - Kling AI
+=============================
+
+Cuándo consultar (PollingStrategy) y cómo consultar muchas tareas a la
+vez (BatchStatusPoller).
+
+Calendario adaptativo (AdaptivePolling):
+  Un clip pro de 10s tarda minutos; consultar cada 10s desde el inicio
+  desperdicia requests, y si termina justo después de una consulta se
+  pierden hasta 10s por clip. La estrategia aprende el tiempo típico
+  de render por (modo, duración) y:
+    - Consulta poco al principio (la mitad de lo que falta para el ETA)
+    - Consulta seguido cerca del ETA estimado
+    - Si la tarea se pasa del ETA, se aleja con backoff exponencial
+    - Añade jitter para no sincronizar muchas tareas
+  y cuenta cuántos requests ahorró frente a consultar cada 10s.
+
+Consulta en lote (BatchStatusPoller):
+  Con 50 tareas en vuelo, consultar una por una cuesta 50 requests por
+  ciclo. BatchStatusPoller obtiene el estado de muchas tareas con una
+  sola consulta paginada al listado de image2video y reparte el
+  resultado a cada tarea. Solo las tareas que no aparecen en las
+  páginas leídas (rezagadas) se consultan de forma individual.
+  Costo por ciclo: O(páginas) en lugar de O(tareas).
+
+Uso:
+  poller = BatchStatusPoller(client)
+  results = poller.poll(["task_a", "task_b"])
+  # results["task_a"] tiene el mismo formato que check_task_status()
+
+  polling = AdaptivePolling()
+  time.sleep(polling.next_delay(elapsed, mode="pro", duration=10))
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import math
+import random
+import statistics
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Tuple
+
+
+class PollingStrategy:
+    """
+    Calendario fijo: consulta cada `interval` segundos (comportamiento original)
+    """
+
+    def __init__(self, interval: float = 10):
+        self.interval = interval
+        self.polls = 0
+        self.baseline_polls = 0
+        self.completed = 0
+
+    def next_delay(self, elapsed: float, mode: str = "pro", duration: int = 10) -> float:
+        """
+        Segundos a esperar antes de la siguiente consulta
+
+        Args:
+            elapsed: Segundos desde que se envió la tarea
+            mode: "std" o "pro"
+            duration: Duración del clip en segundos
+        """
+        return self.interval
+
+    def record_completion(self, seconds: float, polls: int, mode: str = "pro", duration: int = 10) -> None:
+        """
+        Registra una tarea terminada
+
+        Args:
+            seconds: Tiempo total desde el envío hasta el resultado
+            polls: Consultas de estado hechas para esta tarea
+            mode: "std" o "pro"
+            duration: Duración del clip en segundos
+        """
+        self.completed += 1
+        self.polls += polls
+        # What a fixed 10 s schedule would have cost
+        self.baseline_polls += max(1, math.ceil(seconds / 10))
+
+    def report(self) -> Dict[str, int]:
+        """Consultas hechas vs. las de un calendario fijo de 10s"""
+        return {
+            "tasks": self.completed,
+            "polls": self.polls,
+            "baseline_polls": self.baseline_polls,
+            "saved": self.baseline_polls - self.polls
+        }
+
+
+class AdaptivePolling(PollingStrategy):
+    """
+    Calendario con ETA aprendido, backoff exponencial y jitter
+    """
+
+    # Initial render time guesses (seconds) until real samples arrive
+    DEFAULT_ETAS = {
+        ("std", 5): 90,
+        ("std", 10): 150,
+        ("pro", 5): 150,
+        ("pro", 10): 300
+    }
+
+    def __init__(
+        self,
+        min_interval: float = 5,
+        max_interval: float = 60,
+        backoff: float = 1.5,
+        jitter: float = 0.2,
+        history: int = 20,
+        default_eta: float = 180
+    ):
+        """
+        Inicializar estrategia
+
+        Args:
+            min_interval: Espera mínima entre consultas
+            max_interval: Espera máxima entre consultas
+            backoff: Factor de crecimiento una vez pasado el ETA
+            jitter: Variación aleatoria relativa (0.2 = ±20%)
+            history: Tiempos de render recordados por (modo, duración)
+            default_eta: ETA para combinaciones sin valor por defecto
+        """
+        super().__init__()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.history = history
+        self.default_eta = default_eta
+        self._samples: Dict[Tuple[str, int], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def eta(self, mode: str = "pro", duration: int = 10) -> float:
+        """Tiempo de render esperado (mediana reciente) para (modo, duración)"""
+        samples = self._samples.get((mode, duration))
+        if samples:
+            return statistics.median(samples)
+        return self.DEFAULT_ETAS.get((mode, duration), self.default_eta)
+
+    def next_delay(self, elapsed: float, mode: str = "pro", duration: int = 10) -> float:
+        remaining = self.eta(mode, duration) - elapsed
+
+        if remaining > 0:
+            # Halve the distance to the ETA: rare early, dense near the end
+            delay = remaining / 2
+        else:
+            # Overdue: min_interval * backoff ** n, where n is how many such polls
+            # fit in the time past the ETA (sum of the geometric series)
+            overdue_polls = 0
+            if self.backoff > 1:
+                overdue_polls = int(math.log1p(-remaining * (self.backoff - 1) / self.min_interval)
+                                    / math.log(self.backoff) + 1e-9)
+            delay = self.min_interval * self.backoff ** min(overdue_polls, 64)
+
+        delay = min(self.max_interval, max(self.min_interval, delay))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(self.min_interval, delay)
+
+    def record_completion(self, seconds: float, polls: int, mode: str = "pro", duration: int = 10) -> None:
+        with self._lock:
+            super().record_completion(seconds, polls, mode, duration)
+            key = (mode, duration)
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.history)
+            self._samples[key].append(seconds)
+
+
+class BatchStatusPoller:
+    """
+    Estado de muchas tareas por ciclo usando el listado paginado
+    """
+
+    def __init__(self, client, page_size: int = 500, max_pages: int = 3):
+        """
+        Inicializar poller
+
+        Args:
+            client: Cliente de la API (KlingAPICorrect)
+            page_size: Tareas por página del listado (máx 500)
+            max_pages: Páginas leídas por ciclo antes de consultar rezagadas
+        """
+        self.client = client
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        # Request counters, for reporting
+        self.list_requests = 0
+        self.single_requests = 0
+        self.tasks_resolved = 0
+
+    def poll(self, task_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Consulta el estado de varias tareas
+
+        Args:
+            task_ids: IDs de las tareas en vuelo
+
+        Returns:
+            task_id -> respuesta con el formato de check_task_status()
+        """
+        wanted = set(task_ids)
+        found: Dict[str, Dict] = {}
+
+        if not wanted:
+            return found
+
+        # A single task is cheaper through its own endpoint
+        if len(wanted) > 1:
+            for page_num in range(1, self.max_pages + 1):
+                result = self.client.list_tasks(page_num, self.page_size)
+                self.list_requests += 1
+
+                if "error" in result:
+                    break
+
+                items = result.get("data") or []
+                for item in items:
+                    task_id = item.get("task_id")
+                    if task_id in wanted:
+                        found[task_id] = {"code": result.get("code"), "data": item}
+
+                if wanted.issubset(found) or len(items) < self.page_size:
+                    break
+
+        # Stragglers: not in the pages read (too old or not listed yet)
+        for task_id in wanted.difference(found):
+            found[task_id] = self.client.check_task_status(task_id)
+            self.single_requests += 1
+
+        self.tasks_resolved += len(found)
+        return found
+
+    @property
+    def requests_made(self) -> int:
+        """Requests HTTP totales hechos por el poller"""
+        return self.list_requests + self.single_requests
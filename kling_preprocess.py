@@ -0,0 +1,141 @@
+"""
+Preprocesamiento de Imágenes - Kling AI
+=======================================
+
+Ajusta cada imagen antes de codificarla en base64.
+
+Un PNG de varios MB o un JPEG 8K viaja +33% inflado en base64 dentro
+del JSON del submit, aunque el modelo no use más de ~1080p. Este paso:
+  - Recorta al centro (o encaja con bandas) al aspect_ratio pedido
+  - Reduce a la resolución máxima útil del modelo (nunca amplía)
+  - Corrige la orientación EXIF y descarta los metadatos
+  - Re-codifica como JPEG de alta calidad
+
+preprocess_batch() reparte el trabajo de un lote en un pool de procesos.
+
+Uso:
+  jpeg_bytes = preprocess_image("images/01.png", aspect_ratio="9:16")
+  futures = preprocess_batch(paths, aspect_ratio="9:16")
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import io
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+
+# Longest side the model makes use of (1080p output)
+MAX_LONG_SIDE = 1920
+JPEG_QUALITY = 92
+
+ASPECT_RATIOS = {
+    "9:16": (9, 16),
+    "16:9": (16, 9),
+    "1:1": (1, 1)
+}
+
+
+def target_size(aspect_ratio: str, long_side: int = MAX_LONG_SIDE) -> Tuple[int, int]:
+    """
+    Tamaño máximo (ancho, alto) para un aspect_ratio
+
+    Args:
+        aspect_ratio: "9:16", "16:9" o "1:1"
+        long_side: Lado mayor en píxeles
+    """
+    w, h = ASPECT_RATIOS.get(aspect_ratio, ASPECT_RATIOS["9:16"])
+    if w >= h:
+        return long_side, round(long_side * h / w)
+    return round(long_side * w / h), long_side
+
+
+def preprocess_image(
+    image_path: str,
+    aspect_ratio: str = "9:16",
+    fit: str = "crop",
+    long_side: int = MAX_LONG_SIDE,
+    quality: int = JPEG_QUALITY
+) -> bytes:
+    """
+    Prepara una imagen para el submit
+
+    Args:
+        image_path: Path a la imagen original
+        aspect_ratio: Relación de aspecto del video
+        fit: "crop" recorta al centro; "pad" encaja con bandas negras
+        long_side: Lado mayor máximo en píxeles
+        quality: Calidad JPEG
+
+    Returns:
+        Bytes JPEG listos para base64
+    """
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        max_w, max_h = target_size(aspect_ratio, long_side)
+        ratio_w, ratio_h = ASPECT_RATIOS.get(aspect_ratio, ASPECT_RATIOS["9:16"])
+
+        if fit == "pad":
+            img = ImageOps.contain(img, (max_w, max_h), Image.LANCZOS) \
+                if img.width > max_w or img.height > max_h else img
+            # Canvas with the target ratio around the image
+            canvas_w = max(img.width, round(img.height * ratio_w / ratio_h))
+            canvas_h = max(img.height, round(img.width * ratio_h / ratio_w))
+            canvas = Image.new("RGB", (canvas_w, canvas_h), (0, 0, 0))
+            canvas.paste(img, ((canvas_w - img.width) // 2, (canvas_h - img.height) // 2))
+            img = canvas
+        else:
+            # Largest centered crop with the target ratio, downscaled only
+            crop_w = min(img.width, round(img.height * ratio_w / ratio_h))
+            crop_h = min(img.height, round(img.width * ratio_h / ratio_w))
+            size = (min(crop_w, max_w), min(crop_h, max_h))
+            img = ImageOps.fit(img, size, Image.LANCZOS)
+
+        # New image without exif/icc/text chunks
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality, subsampling=0, optimize=True)
+        return buffer.getvalue()
+
+
+def preprocess_batch(
+    image_paths: Iterable[str],
+    aspect_ratio: str = "9:16",
+    workers: Optional[int] = None,
+    executor: Optional[ProcessPoolExecutor] = None
+) -> Dict[str, Future]:
+    """
+    Preprocesa varias imágenes en un pool de procesos
+
+    Args:
+        image_paths: Imágenes a preparar
+        aspect_ratio: Relación de aspecto del video
+        workers: Procesos del pool (None = núcleos disponibles)
+        executor: Pool existente a reutilizar (opcional)
+
+    Returns:
+        path -> Future con los bytes JPEG
+    """
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    futures = {
+        str(path): pool.submit(preprocess_image, str(path), aspect_ratio)
+        for path in image_paths
+    }
+
+    if executor is None:
+        # Workers exit once the submitted work is done
+        pool.shutdown(wait=False)
+
+    return futures
@@ -0,0 +1,273 @@
+"""
+Limitador de Tasa - Kling AI
+============================
+
+Mantiene al cliente justo en el límite de la cuenta sin que el
+servidor lo frene.
+
+  - Un token bucket por tipo de llamada: submit, status y download
+  - Un tope de tareas en render simultáneas para toda la cuenta
+    (compartido por todos los lotes/threads que usan el mismo cliente)
+  - Frenado adaptativo (AIMD): un 429, o los códigos Kling 1302 (tasa
+    excedida) y 1303 (concurrencia excedida), reducen la tasa a la
+    mitad y pausan ese tipo de llamada lo que pida Retry-After; cada
+    respuesta correcta la recupera de a poco hasta la tasa configurada
+  - Un 1303 además ajusta el tope de tareas simultáneas a lo que la
+    cuenta realmente admite; se vuelve a ampliar tras varios envíos
+    aceptados seguidos
+
+Las esperas se calculan con reserve() (segundos a esperar), así el
+mismo limitador sirve al cliente síncrono (time.sleep) y al asíncrono
+(asyncio.sleep).
+
+Uso:
+  limiter = RateLimiter(submit_rate=0.5, max_in_flight=3)
+  client.limiter = limiter
+  limiter.wait("submit")
+  ...
+  limiter.observe("submit", response.status_code, response.headers, code)
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+
+# Kling business codes that mean "slow down"
+CODE_RATE_LIMIT = 1302
+CODE_CONCURRENCY = 1303
+
+KINDS = ("submit", "status", "download")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Segundos de un header Retry-After (número o fecha HTTP)
+
+    Args:
+        value: Valor del header
+
+    Returns:
+        Segundos a esperar, o None si no hay header válido
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe con tasa ajustable y pausa
+    """
+
+    def __init__(self, rate: float, burst: float = 1):
+        """
+        Inicializar bucket
+
+        Args:
+            rate: Tokens por segundo
+            burst: Tokens acumulables (ráfaga máxima)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Toma un token y devuelve cuánto esperar antes de usarlo
+
+        Los tokens pueden quedar en negativo: cada llamador reserva su
+        turno y las esperas se encadenan sin despertar a todos a la vez.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._paused_until - now)
+            self.waited += wait
+            return wait
+
+    def scale(self, factor: float, low: float, high: float) -> None:
+        """Multiplica la tasa por `factor`, acotada a [low, high]"""
+        with self._lock:
+            self.rate = min(high, max(low, self.rate * factor))
+
+    def pause(self, seconds: float) -> None:
+        """Ninguna reserva sale antes de `seconds` desde ahora"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Drop the burst so calls resume one by one
+            self._tokens = min(self._tokens, 0)
+
+
+class RateLimiter:
+    """
+    Buckets por tipo de llamada, tope de tareas en vuelo y frenado adaptativo
+    """
+
+    def __init__(
+        self,
+        submit_rate: float = 1.0,
+        status_rate: float = 5.0,
+        download_rate: float = 5.0,
+        max_in_flight: int = 3,
+        slowdown: float = 0.5,
+        recovery: float = 1.1,
+        min_fraction: float = 0.05,
+        default_pause: float = 5.0,
+        grow_after: int = 10
+    ):
+        """
+        Inicializar limitador
+
+        Args:
+            submit_rate: Envíos por segundo
+            status_rate: Consultas de estado/listado por segundo
+            download_rate: Descargas iniciadas por segundo
+            max_in_flight: Tareas en render simultáneas (cuota de la cuenta)
+            slowdown: Factor de la tasa ante un 429/1302/1303
+            recovery: Factor de recuperación por respuesta correcta
+            min_fraction: Tasa mínima relativa a la configurada
+            default_pause: Pausa si el 429 no trae Retry-After
+            grow_after: Envíos aceptados seguidos para ampliar el tope
+                de tareas tras un 1303
+        """
+        base = {"submit": submit_rate, "status": status_rate, "download": download_rate}
+        self.base_rates = dict(base)
+        self.buckets = {kind: TokenBucket(rate, burst=max(1.0, rate)) for kind, rate in base.items()}
+
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight_limit = self.max_in_flight
+        self.in_flight = 0
+
+        self.slowdown = slowdown
+        self.recovery = recovery
+        self.min_fraction = min_fraction
+        self.default_pause = default_pause
+        self.grow_after = grow_after
+
+        self.throttled: Dict[str, int] = {kind: 0 for kind in KINDS}
+        self._accepted_streak = 0
+        self._slots = threading.Condition()
+
+    # --- request rate ---
+
+    def reserve(self, kind: str) -> float:
+        """Reserva un turno para `kind`; devuelve los segundos a esperar"""
+        return self.buckets[kind].reserve()
+
+    def wait(self, kind: str) -> float:
+        """Bloquea hasta que `kind` tenga turno; devuelve lo esperado"""
+        delay = self.reserve(kind)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def observe(
+        self,
+        kind: str,
+        status_code: int,
+        headers: Optional[Mapping[str, str]] = None,
+        code: Optional[int] = None
+    ) -> bool:
+        """
+        Ajusta la tasa según una respuesta
+
+        Args:
+            kind: "submit", "status" o "download"
+            status_code: Status HTTP
+            headers: Headers de la respuesta (Retry-After)
+            code: Código de negocio Kling del cuerpo JSON, si se conoce
+
+        Returns:
+            True si la respuesta pide frenar (el request se puede reintentar)
+        """
+        bucket = self.buckets[kind]
+
+        if status_code == 429 or code in (CODE_RATE_LIMIT, CODE_CONCURRENCY):
+            self.throttled[kind] += 1
+            retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+            bucket.scale(self.slowdown, self.base_rates[kind] * self.min_fraction, self.base_rates[kind])
+            bucket.pause(retry_after if retry_after is not None else self.default_pause)
+
+            if code == CODE_CONCURRENCY:
+                self._shrink_in_flight()
+            return True
+
+        if status_code < 400:
+            bucket.scale(self.recovery, self.base_rates[kind] * self.min_fraction, self.base_rates[kind])
+            if kind == "submit":
+                self._grow_in_flight()
+        return False
+
+    # --- in-flight tasks ---
+
+    def acquire_slot(self, timeout: Optional[float] = None) -> bool:
+        """
+        Reserva un lugar para una tarea en render
+
+        Args:
+            timeout: Segundos máximos de espera (0 = no esperar, None = sin límite)
+
+        Returns:
+            True si se obtuvo el lugar
+        """
+        with self._slots:
+            if not self._slots.wait_for(lambda: self.in_flight < self.in_flight_limit, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def claim_slot(self) -> None:
+        """Cuenta una tarea que ya está en render (p.ej. al reanudar)"""
+        with self._slots:
+            self.in_flight += 1
+
+    def release_slot(self) -> None:
+        """La tarea salió del render"""
+        with self._slots:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._slots.notify()
+
+    def _shrink_in_flight(self) -> None:
+        with self._slots:
+            # The submitting task holds a slot; the rest is what the account allows
+            self.in_flight_limit = max(1, min(self.in_flight_limit, self.in_flight - 1))
+            self._accepted_streak = 0
+
+    def _grow_in_flight(self) -> None:
+        with self._slots:
+            if self.in_flight_limit >= self.max_in_flight:
+                return
+            self._accepted_streak += 1
+            if self._accepted_streak >= self.grow_after:
+                self.in_flight_limit += 1
+                self._accepted_streak = 0
+                self._slots.notify()
+
+    def report(self) -> Dict:
+        """Tasas actuales, frenadas y segundos esperados por tipo"""
+        return {
+            "rates": {kind: round(bucket.rate, 3) for kind, bucket in self.buckets.items()},
+            "throttled": dict(self.throttled),
+            "waited": {kind: round(bucket.waited, 1) for kind, bucket in self.buckets.items()},
+            "in_flight_limit": self.in_flight_limit
+        }
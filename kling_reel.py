@@ -0,0 +1,298 @@
+"""
+Armado de Reels - Kling AI
+==========================
+
+Une los clips de un lote en un solo video mientras el resto del lote
+todavía está en render, en lugar de dejar clips sueltos para editar a
+mano.
+
+Cada clip se prepara apenas termina su descarga, en cualquier orden:
+  - ffprobe lee códec, resolución, pix_fmt y fps
+  - El primer clip que llega fija el formato del reel; los que coinciden
+    se remuxean a MPEG-TS sin recodificar (stream copy, milisegundos)
+  - Solo los que no coinciden se recodifican (escala + pad, fps, pix_fmt)
+Al terminar el lote queda un único concat con stream copy de segmentos
+ya listos, así el reel está a segundos del último clip.
+
+Los clips que fallan se omiten (se avisa cuáles faltan). El reel sale
+sin audio: los clips image2video no lo traen.
+
+Requiere ffmpeg y ffprobe en el PATH (o KLING_FFMPEG / KLING_FFPROBE);
+sin ellos el armado se omite con un aviso.
+
+Uso:
+  reel = ReelAssembler("outputs/reel_01-06.mp4", [1, 2, 3, 4, 5, 6])
+  run_batch(client, jobs, store, on_complete=reel.on_complete)
+  reel.finish()
+
+  python generar_lote.py lote.jsonl --reel outputs/reel.mp4
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Stream properties that must match for a stream-copy concat
+COMPAT_FIELDS = ("codec", "width", "height", "pix_fmt", "fps")
+
+# Encoder used to re-encode a clip into the reel's codec
+ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+# ffmpeg/ffprobe limits: a stuck process must not hang the batch's reel step
+PROBE_TIMEOUT = 60
+FFMPEG_TIMEOUT = 60              # fixed part of every ffmpeg run
+FFMPEG_SECONDS_PER_SECOND = 10   # plus this much per second of video (re-encode worst case)
+DEFAULT_CLIP_SECONDS = 10        # length assumed when ffprobe reports none
+
+
+def find_tool(name: str) -> Optional[str]:
+    """Path de ffmpeg/ffprobe (KLING_FFMPEG / KLING_FFPROBE o el PATH)"""
+    return os.getenv(f"KLING_{name.upper()}") or shutil.which(name)
+
+
+def _concat_quote(path: str) -> str:
+    """Path entre comillas para una lista del demuxer concat de ffmpeg"""
+    # Inside single quotes nothing is special, so a quote closes, is escaped and reopens
+    return "'" + path.replace("'", "'\\''") + "'"
+
+
+def probe_video(path, ffprobe: Optional[str] = None) -> Optional[Dict]:
+    """
+    Propiedades del primer stream de video
+
+    Args:
+        path: Archivo de video
+        ffprobe: Ejecutable (por defecto find_tool("ffprobe"))
+
+    Returns:
+        {"codec", "width", "height", "pix_fmt", "fps", "duration"}, o None
+        si el archivo no se puede leer o no tiene video
+    """
+    ffprobe = ffprobe or find_tool("ffprobe")
+    if not ffprobe:
+        return None
+
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=codec_name,width,height,pix_fmt,r_frame_rate:format=duration",
+             "-of", "json", str(path)],
+            capture_output=True, check=True, stdin=subprocess.DEVNULL, timeout=PROBE_TIMEOUT
+        )
+        info = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+    streams = info.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+
+    return {
+        "codec": stream.get("codec_name"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "fps": stream.get("r_frame_rate"),
+        "duration": duration
+    }
+
+
+class ReelAssembler:
+    """
+    Prepara cada clip al llegar y los concatena en orden al final
+    """
+
+    def __init__(
+        self,
+        output_path,
+        clip_numbers: List[int],
+        workers: int = 2,
+        ffmpeg: Optional[str] = None,
+        ffprobe: Optional[str] = None
+    ):
+        """
+        Inicializar armado
+
+        Args:
+            output_path: Reel final (.mp4)
+            clip_numbers: Clips en el orden del reel
+            workers: Clips preparados a la vez
+            ffmpeg: Ejecutable (por defecto find_tool("ffmpeg"))
+            ffprobe: Ejecutable (por defecto find_tool("ffprobe"))
+        """
+        self.output_path = Path(output_path)
+        self.clip_numbers = list(clip_numbers)
+        self.ffmpeg = ffmpeg or find_tool("ffmpeg")
+        self.ffprobe = ffprobe or find_tool("ffprobe")
+        self.available = bool(self.ffmpeg and self.ffprobe)
+
+        self.reference: Optional[Dict] = None  # format set by the first clip
+        self.stats: Dict[str, int] = {"copied": 0, "reencoded": 0, "failed": 0}
+        self.work_dir = self.output_path.with_name(f".{self.output_path.stem}.parts")
+
+        self._futures: Dict[int, Future] = {}
+        self._seconds: Dict[int, float] = {}  # clip -> length, for the concat timeout
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers) if self.available else None
+
+        if not self.available:
+            logger.warning("[!] ffmpeg/ffprobe no encontrados: no se arma el reel")
+
+    def on_complete(self, job) -> None:
+        """Callback para BatchEngine / run_batch (on_complete)"""
+        if job.status == "succeed" and job.output_path:
+            self.add(job.clip_number, job.output_path)
+
+    def add(self, clip_number: int, path) -> None:
+        """Empieza a preparar un clip descargado (no bloquea)"""
+        if not self.available or clip_number not in self.clip_numbers:
+            return
+        with self._lock:
+            if clip_number in self._futures:
+                return
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+            self._futures[clip_number] = self._pool.submit(self._prepare, clip_number, Path(path))
+
+    def _prepare(self, clip_number: int, path: Path) -> Optional[Path]:
+        info = probe_video(path, self.ffprobe)
+        if info is None:
+            logger.error(f"[X] Reel: clip {clip_number:02d} ilegible ({path})", extra={"clip": clip_number})
+            self._count("failed")
+            return None
+
+        seconds = info["duration"] or DEFAULT_CLIP_SECONDS
+        with self._lock:
+            if self.reference is None:
+                self.reference = info
+            reference = self.reference
+            self._seconds[clip_number] = seconds
+
+        segment = self.work_dir / f"clip_{clip_number:02d}.ts"
+        compatible = all(info[field] == reference[field] for field in COMPAT_FIELDS)
+        if compatible:
+            codec_args = ["-c:v", "copy"]
+        else:
+            width, height = reference["width"], reference["height"]
+            codec_args = [
+                "-vf", (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+                        f"fps={reference['fps']},format={reference['pix_fmt']}"),
+                "-c:v", ENCODERS.get(reference["codec"], "libx264"),
+                "-preset", "veryfast", "-crf", "18"
+            ]
+
+        try:
+            self._run(["-i", str(path), "-map", "0:v:0", "-an"] + codec_args + ["-f", "mpegts", str(segment)],
+                      seconds)
+        except subprocess.SubprocessError as e:
+            logger.error(f"[X] Reel: no se pudo preparar el clip {clip_number:02d}: {e}",
+                         extra={"clip": clip_number})
+            self._count("failed")
+            return None
+
+        self._count("copied" if compatible else "reencoded")
+        logger.debug(f"Reel: clip {clip_number:02d} listo ({'copia' if compatible else 'recodificado'})",
+                     extra={"clip": clip_number})
+        return segment
+
+    def _run(self, args: List[str], seconds: float) -> None:
+        """
+        Ejecuta ffmpeg
+
+        Args:
+            args: Argumentos después de las opciones comunes
+            seconds: Duración del video procesado (fija el timeout)
+
+        Raises:
+            subprocess.SubprocessError: Error de ffmpeg o timeout
+        """
+        timeout = FFMPEG_TIMEOUT + seconds * FFMPEG_SECONDS_PER_SECOND
+        try:
+            result = subprocess.run([self.ffmpeg, "-y", "-v", "error"] + args,
+                                    capture_output=True, stdin=subprocess.DEVNULL, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # run() already killed the process
+            raise subprocess.SubprocessError(f"ffmpeg no terminó en {timeout:.0f}s")
+        if result.returncode != 0:
+            lines = result.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise subprocess.SubprocessError(lines[-1] if lines else f"ffmpeg salió con código {result.returncode}")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def finish(self) -> Optional[Path]:
+        """
+        Espera los clips en preparación y concatena el reel
+
+        Returns:
+            Path del reel, o None si no había ningún clip utilizable
+        """
+        if not self.available:
+            return None
+
+        start = time.perf_counter()
+        with self._lock:
+            futures = dict(self._futures)
+        self._pool.shutdown(wait=True)
+
+        segments = []
+        missing = []
+        for clip_number in self.clip_numbers:
+            segment = futures[clip_number].result() if clip_number in futures else None
+            if segment is None:
+                missing.append(clip_number)
+            else:
+                segments.append(segment)
+
+        try:
+            if not segments:
+                logger.error("[X] Reel: ningún clip disponible")
+                return None
+            if missing:
+                logger.warning(f"[!] Reel sin los clips: {', '.join(f'{n:02d}' for n in missing)}")
+
+            concat_list = self.work_dir / "concat.txt"
+            concat_list.write_text(
+                "".join(f"file {_concat_quote(segment.resolve().as_posix())}\n" for segment in segments),
+                encoding='utf-8'
+            )
+            tmp = self.output_path.with_name(self.output_path.stem + ".tmp.mp4")
+            try:
+                seconds = sum(self._seconds.get(n, DEFAULT_CLIP_SECONDS) for n in self.clip_numbers
+                              if n not in missing)
+                self._run(["-f", "concat", "-safe", "0", "-i", str(concat_list),
+                           "-c", "copy", "-movflags", "+faststart", str(tmp)], seconds)
+            except subprocess.SubprocessError as e:
+                logger.error(f"[X] Reel: falló la concatenación: {e}")
+                if tmp.exists():
+                    tmp.unlink()
+                return None
+            os.replace(tmp, self.output_path)
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+        logger.info(
+            f"[OK] Reel: {self.output_path} ({len(segments)} clips, {self.stats['copied']} sin recodificar,"
+            f" {self.stats['reencoded']} recodificados; concat en {time.perf_counter() - start:.1f}s)",
+            extra={"reel": str(self.output_path), "clips": len(segments), **self.stats}
+        )
+        return self.output_path
@@ -0,0 +1,105 @@
+"""
+Resolución de Endpoints de Estado - Kling AI
+============================================
+
+La ruta para consultar el estado de una tarea no está garantizada
+(/v1/videos/image2video/{id}, /v1/tasks/{id}, /v1/videos/{id}).
+TaskRouteResolver prueba las candidatas solo hasta encontrar la que
+responde y la recuerda por tipo de tarea durante la vida del cliente
+(y opcionalmente en disco), así cada consulta posterior cuesta
+exactamente un request.
+
+Solo un 404 sobre una ruta aún no aprendida significa "probar la
+siguiente"; cualquier otro error se devuelve tal cual.
+
+Uso:
+  routes = TaskRouteResolver(cache_path="outputs/.routes.json")
+  for template in routes.candidates("image2video"):
+      url = domain + template.format(task_id=task_id)
+      ...
+      routes.record("image2video", template)
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_STATUS_ROUTES = [
+    "/v1/videos/image2video/{task_id}",
+    "/v1/tasks/{task_id}",
+    "/v1/videos/{task_id}"
+]
+
+
+class TaskRouteResolver:
+    """
+    Aprende y memoriza el endpoint de estado que funciona por tipo de tarea
+    """
+
+    def __init__(self, routes: Optional[List[str]] = None, cache_path: Optional[str] = None):
+        """
+        Inicializar resolvedor
+
+        Args:
+            routes: Plantillas candidatas con {task_id}, en orden de prueba
+            cache_path: Archivo JSON para persistir las rutas aprendidas
+        """
+        self.routes = list(routes or DEFAULT_STATUS_ROUTES)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._learned: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        if self.cache_path and self.cache_path.exists():
+            try:
+                cached = json.loads(self.cache_path.read_text(encoding='utf-8'))
+                self._learned = {k: v for k, v in cached.items() if v in self.routes}
+            except (OSError, ValueError):
+                self._learned = {}
+
+    def is_learned(self, task_type: str) -> bool:
+        """True si ya se conoce la ruta de este tipo de tarea"""
+        return task_type in self._learned
+
+    def candidates(self, task_type: str) -> List[str]:
+        """
+        Rutas a probar para un tipo de tarea
+
+        Args:
+            task_type: Tipo de tarea (p. ej. "image2video")
+
+        Returns:
+            Solo la ruta aprendida, o todas las candidatas si aún no se conoce
+        """
+        learned = self._learned.get(task_type)
+        if learned:
+            return [learned]
+        return list(self.routes)
+
+    def record(self, task_type: str, template: str) -> None:
+        """
+        Memoriza la ruta que respondió correctamente
+
+        Args:
+            task_type: Tipo de tarea
+            template: Plantilla de ruta con {task_id}
+        """
+        if self._learned.get(task_type) == template:
+            return
+
+        with self._lock:
+            self._learned[task_type] = template
+            if self.cache_path:
+                try:
+                    self.cache_path.write_text(json.dumps(self._learned, indent=2), encoding='utf-8')
+                except OSError:
+                    pass
+
+    def forget(self, task_type: str) -> None:
+        """Olvida la ruta aprendida (p. ej. si la API cambia)"""
+        with self._lock:
+            self._learned.pop(task_type, None)
@@ -0,0 +1,201 @@
+"""
+Planificador de Trabajos - Kling AI
+===================================
+
+Decide qué clip se envía cuando se libera un lugar de render, en lugar
+de seguir el orden de los archivos.
+
+Orden de envío:
+  1. Un trabajo con deadline en riesgo (su último momento para empezar
+     y terminar a tiempo está a menos de `deadline_margin` segundos)
+     sale primero, sea cual sea su prioridad
+  2. Mayor prioridad
+  3. Deadline más cercano (EDF; sin deadline va al final)
+  4. Clase de costo más barata: std antes que pro, 5s antes que 10s
+     (tiempo de render esperado, aprendido por AdaptivePolling)
+  5. Orden de llegada
+
+Las vistas previas (prioridad >= PREVIEW_PRIORITY, típicamente std 5s)
+saltan delante de los envíos masivos en cola, y el motor puede reservar
+lugares de render solo para ellas (BatchEngine reserved_slots), así una
+vista previa no espera a que termine un render pro de 10s del lote.
+
+Los trabajos ya enviados nunca se cancelan: Kling no devuelve créditos.
+
+Uso:
+  scheduler = JobScheduler(client.polling)
+  scheduler.push(job)
+  job = scheduler.pop(bulk_allowed=False)   # solo vistas previas
+
+  engine = BatchEngine(client, reserved_slots=1).start()
+  engine.submit(BatchJob(...))                        # lote en segundo plano
+  engine.preview("images/01.jpg", 99, timeout=600)    # vuelve rápido
+
+La espera en cola de cada trabajo se registra en
+kling_schedule_wait_seconds{lane, cost_class} y el motor la resume al
+terminar.
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from kling_polling import AdaptivePolling, PollingStrategy
+
+
+# Jobs at or above this priority may use slots reserved for previews
+PREVIEW_PRIORITY = 10
+
+# Deadline jobs whose latest start is this close jump every queue
+DEADLINE_MARGIN = 60
+
+
+def cost_class(mode: str, duration: int) -> str:
+    """Etiqueta de la clase de costo, p.ej. "std-5s" """
+    return f"{mode}-{duration}s"
+
+
+def expected_render_seconds(polling: Optional[PollingStrategy], mode: str, duration: int) -> float:
+    """Tiempo de render esperado (aprendido si el polling lo estima)"""
+    eta = getattr(polling, "eta", None)
+    if eta is not None:
+        return eta(mode, duration)
+    return AdaptivePolling.DEFAULT_ETAS.get((mode, duration), 180)
+
+
+class JobScheduler:
+    """
+    Cola de trabajos pendientes con prioridad, deadline y clase de costo
+    """
+
+    def __init__(
+        self,
+        polling: Optional[PollingStrategy] = None,
+        preview_priority: int = PREVIEW_PRIORITY,
+        deadline_margin: float = DEADLINE_MARGIN
+    ):
+        """
+        Inicializar planificador
+
+        Args:
+            polling: Estrategia de polling (para el costo de cada clase)
+            preview_priority: Prioridad mínima de una vista previa
+            deadline_margin: Segundos de holgura bajo los que un trabajo
+                con deadline pasa adelante de todos
+        """
+        self.polling = polling
+        self.preview_priority = preview_priority
+        self.deadline_margin = deadline_margin
+
+        self._heap: List[Tuple] = []       # (-priority, latest_start, cost, seq, job)
+        self._deadlines: List[Tuple] = []  # (latest_start, seq, job)
+        self._keys: Dict[int, Tuple] = {}  # id(job) -> heap key of its live entries, while queued
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self.seq = 0
+
+        # Called after every push or wake (e.g. to wake a waiting engine)
+        self.on_wake: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._keys)
+
+    def _key(self, job) -> Tuple:
+        cost = expected_render_seconds(self.polling, job.mode, job.duration)
+        latest_start = job.deadline - cost if job.deadline else float("inf")
+        return (-job.priority, latest_start, cost, next(self._counter))
+
+    def push(self, job) -> None:
+        """Encola un trabajo pendiente"""
+        if job.queued_at is None:
+            job.queued_at = time.time()
+        with self._cond:
+            if id(job) in self._keys:
+                return
+            key = self._key(job)
+            self._keys[id(job)] = key
+            heapq.heappush(self._heap, key + (job,))
+            if job.deadline:
+                heapq.heappush(self._deadlines, (key[1], key[3], job))
+            self.seq += 1
+            self._cond.notify_all()
+        if self.on_wake is not None:
+            self.on_wake()
+
+    def _live(self, job, seq: int) -> bool:
+        # Entries keep their job alive, so id() stays unique while queued;
+        # the per-push seq tells a re-pushed job's new entries from stale ones
+        key = self._keys.get(id(job))
+        return key is not None and key[3] == seq
+
+    def _prune(self, heap: List[Tuple], seq_index: int) -> None:
+        while heap and not self._live(heap[0][-1], heap[0][seq_index]):
+            heapq.heappop(heap)
+
+    def is_preview(self, job, now: Optional[float] = None) -> bool:
+        """Vista previa o trabajo con deadline en riesgo"""
+        if job.priority >= self.preview_priority:
+            return True
+        if not job.deadline:
+            return False
+        latest_start = job.deadline - expected_render_seconds(self.polling, job.mode, job.duration)
+        return latest_start - (now or time.time()) <= self.deadline_margin
+
+    def pop(self, bulk_allowed: bool = True):
+        """
+        Siguiente trabajo a enviar
+
+        Args:
+            bulk_allowed: False si solo quedan lugares reservados para
+                vistas previas
+
+        Returns:
+            El trabajo, o None si no hay uno que pueda salir ahora
+        """
+        now = time.time()
+        with self._cond:
+            self._prune(self._deadlines, 1)
+            self._prune(self._heap, 3)
+
+            if self._deadlines and self._deadlines[0][0] - now <= self.deadline_margin:
+                job = heapq.heappop(self._deadlines)[-1]
+            elif self._heap and (bulk_allowed or self.is_preview(self._heap[0][-1], now)):
+                job = heapq.heappop(self._heap)[-1]
+            else:
+                return None
+
+            # The entry left in the other heap is dropped lazily, even if
+            # the job is pushed again before it surfaces
+            del self._keys[id(job)]
+            return job
+
+    def peek(self, n: int) -> List:
+        """Los próximos `n` trabajos en orden de prioridad (sin sacarlos)"""
+        with self._cond:
+            queued = (entry for entry in self._heap if self._live(entry[-1], entry[3]))
+            return [entry[-1] for entry in heapq.nsmallest(n, queued)]
+
+    def wait(self, seq: int, timeout: Optional[float] = None) -> int:
+        """
+        Bloquea hasta un push posterior a `seq` (o hasta `timeout`)
+
+        Returns:
+            El `seq` actual
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout)
+            return self.seq
+
+    def wake(self) -> None:
+        """Despierta a quien espera en wait() sin encolar nada"""
+        with self._cond:
+            self.seq += 1
+            self._cond.notify_all()
+        if self.on_wake is not None:
+            self.on_wake()
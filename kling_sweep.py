@@ -0,0 +1,405 @@
+"""
+Barridos de Prompts - Kling AI
+==============================
+
+Genera la grilla imagen x movimiento x plantilla en un solo lote, en
+lugar de aplicar un único movimiento a todas las imágenes.
+
+Fuentes:
+  - Movimientos: MOVEMENTS de generar_lote (nombres o números del menú)
+    y los nombres que usan las plantillas (subtle_zoom, gentle_pan,
+    atmospheric)
+  - Plantillas: prompt_templates/prompt_templates.json; sin
+    --movimientos cada plantilla usa sus propios "movements"
+
+Antes de enviar nada el plan:
+  - Descarta las celdas repetidas: misma imagen (por contenido, no por
+    nombre) con el mismo prompt efectivo y los mismos parámetros
+  - Marca las que ya están en la caché de resultados (no cuestan render)
+  - Estima requests (envíos, consultas de estado, descargas) y tiempo
+    total de render con la concurrencia y los tiempos aprendidos
+
+Las variantes de una imagen se encolan juntas, así el motor la lee y la
+prepara (recorte + JPEG) una sola vez para todas (ver
+BatchEngine._prefetch); el hash sale del catálogo.
+
+Uso:
+  python kling_sweep.py --plantillas vineyard,cinematic_premium --plan
+  python kling_sweep.py 01.jpg 02.jpg --movimientos zoom_in,aerial_orbit --modo std --duracion 5
+  python kling_sweep.py --tag bodega --plantillas todas --si --reel outputs/barrido.mp4
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from generar_lote import MOVEMENTS, MOVEMENT_OPTIONS, create_client, reserve_clip_numbers, run_batch
+from kling_batch import BatchJob
+from kling_cache import cache_key
+from kling_catalog import ImageCatalog
+from kling_jobs import JobStore
+from kling_metrics import configure_logging
+from kling_polling import PollingStrategy
+from kling_preprocess import ASPECT_RATIOS
+from kling_reel import ReelAssembler
+from kling_scheduler import expected_render_seconds
+
+logger = logging.getLogger(__name__)
+
+
+TEMPLATES_FILE = Path(__file__).parent / "prompt_templates" / "prompt_templates.json"
+
+# Movement names used by prompt_templates.json that MOVEMENTS lacks
+TEMPLATE_MOVEMENTS = {
+    "subtle_zoom": MOVEMENTS["zoom_in"],
+    "gentle_pan": "slow gentle pan, smooth lateral camera movement, natural flow",
+    "atmospheric": "static camera, subtle atmospheric motion, drifting light and air, natural ambience"
+}
+
+# Polls simulated per render before giving up on an estimate
+MAX_ESTIMATED_POLLS = 1000
+
+
+def load_templates(path=None) -> Dict[str, Dict]:
+    """Plantillas de prompt_templates.json por nombre"""
+    with open(path or TEMPLATES_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def movement_prompt(name: str) -> str:
+    """
+    Prompt de un movimiento por nombre, número de menú o nombre de plantilla
+
+    Raises:
+        ValueError: Si el movimiento no existe
+    """
+    name = MOVEMENT_OPTIONS.get(name, name)
+    if name in MOVEMENTS:
+        return MOVEMENTS[name]
+    if name in TEMPLATE_MOVEMENTS:
+        return TEMPLATE_MOVEMENTS[name]
+    raise ValueError(f"movimiento desconocido: {name!r}")
+
+
+@dataclass
+class SweepCell:
+    """Una combinación imagen x movimiento x plantilla"""
+
+    image_path: str
+    movement: str
+    template: Optional[str]
+    prompt: str
+    key: str
+    job: Optional[BatchJob] = None  # shared by every cell with the same key
+    duplicate: bool = False
+    cached: bool = False
+
+
+@dataclass
+class SweepPlan:
+    """Celdas del barrido y los trabajos únicos que las cubren"""
+
+    cells: List[SweepCell]
+    jobs: List[BatchJob]
+    mode: str
+    duration: int
+    aspect_ratio: str
+    cached: List[BatchJob] = field(default_factory=list)
+
+    @property
+    def renders(self) -> int:
+        """Trabajos que pasan por un render pago"""
+        return len(self.jobs) - len(self.cached)
+
+    def estimate(self, polling: Optional[PollingStrategy], max_concurrency: int) -> Dict:
+        """
+        Requests y tiempo de render esperados
+
+        Las tareas salen en tandas de `max_concurrency`; cada ciclo de
+        polling consulta todas las tareas en vuelo con un solo request al
+        listado (ver BatchStatusPoller), así las consultas de estado
+        crecen con las tandas, no con los clips.
+
+        Args:
+            polling: Estrategia de polling del cliente (tiempos aprendidos)
+            max_concurrency: Tareas simultáneas
+
+        Returns:
+            {"renders", "cached", "duplicates", "waves", "render_seconds",
+             "seconds", "submits", "status_queries", "downloads", "requests"}
+        """
+        render_seconds = expected_render_seconds(polling, self.mode, self.duration)
+        waves = math.ceil(self.renders / max(1, max_concurrency))
+        status_queries = waves * _polls_per_render(polling, render_seconds, self.mode, self.duration)
+        downloads = self.renders
+        return {
+            "renders": self.renders,
+            "cached": len(self.cached),
+            "duplicates": len([cell for cell in self.cells if cell.duplicate]),
+            "waves": waves,
+            "render_seconds": render_seconds,
+            "seconds": waves * render_seconds,
+            "submits": self.renders,
+            "status_queries": status_queries,
+            "downloads": downloads,
+            "requests": self.renders + status_queries + downloads
+        }
+
+
+def _polls_per_render(polling: Optional[PollingStrategy], render_seconds: float, mode: str, duration: int) -> int:
+    """Consultas hasta ver terminado un render de `render_seconds`"""
+    if polling is None:
+        return max(1, math.ceil(render_seconds / 10))
+
+    elapsed = 0.0
+    polls = 0
+    while polls < MAX_ESTIMATED_POLLS:
+        elapsed += polling.next_delay(elapsed, mode, duration)
+        polls += 1
+        if elapsed >= render_seconds:
+            break
+    return polls
+
+
+def expand(
+    images: Sequence[str],
+    movements: Optional[Sequence[str]] = None,
+    templates: Optional[Sequence[str]] = None,
+    template_defs: Optional[Dict[str, Dict]] = None
+) -> List[Tuple[str, str, Optional[str], str]]:
+    """
+    Combinaciones del barrido, agrupadas por imagen
+
+    Con plantillas y sin movimientos, cada plantilla usa sus propios
+    "movements"; con ambos, el producto cruzado; sin plantillas, solo
+    los movimientos.
+
+    Args:
+        images: Paths de las imágenes
+        movements: Nombres de movimiento
+        templates: Nombres de plantilla
+        template_defs: Contenido de prompt_templates.json (por defecto se lee)
+
+    Returns:
+        Lista de (imagen, movimiento, plantilla o None, prompt)
+
+    Raises:
+        ValueError: Si un movimiento o una plantilla no existen
+    """
+    if not movements and not templates:
+        raise ValueError("se necesita al menos un movimiento o una plantilla")
+
+    variants: List[Tuple[str, Optional[str], str]] = []
+    if templates:
+        template_defs = template_defs if template_defs is not None else load_templates()
+        for name in templates:
+            if name not in template_defs:
+                raise ValueError(f"plantilla desconocida: {name!r}")
+            text = template_defs[name]["template"]
+            for movement in movements or template_defs[name].get("movements") or ["static"]:
+                variants.append((movement, name, f"{movement_prompt(movement)}, {text}"))
+    else:
+        variants = [(movement, None, movement_prompt(movement)) for movement in movements]
+
+    return [(image, movement, template, prompt)
+            for image in images for movement, template, prompt in variants]
+
+
+def plan_sweep(
+    client,
+    images: Sequence,
+    movements: Optional[Sequence[str]] = None,
+    templates: Optional[Sequence[str]] = None,
+    mode: str = "pro",
+    duration: int = 10,
+    aspect_ratio: str = "9:16",
+    template_defs: Optional[Dict[str, Dict]] = None
+) -> SweepPlan:
+    """
+    Expande el barrido y lo reduce a trabajos únicos
+
+    Args:
+        client: Cliente de la API (prompt final, hash y caché)
+        images: Paths o ImageInfo del catálogo (traen el hash)
+        movements: Nombres de movimiento
+        templates: Nombres de plantilla
+        mode: "std" o "pro"
+        duration: 5 o 10
+        aspect_ratio: Relación de aspecto
+        template_defs: Contenido de prompt_templates.json (por defecto se lee)
+
+    Returns:
+        SweepPlan con clip_number 0 en los trabajos (se numeran al enviar)
+    """
+    paths = []
+    for image in images:
+        path = str(getattr(image, "path", image))
+        # Catalog entries already carry the hash: the image is not read here
+        client.image_hash(path, known=getattr(image, "sha256", None))
+        paths.append(path)
+
+    cells: List[SweepCell] = []
+    jobs: List[BatchJob] = []
+    cached: List[BatchJob] = []
+    by_key: Dict[str, BatchJob] = {}
+
+    for path, movement, template, prompt in expand(paths, movements, templates, template_defs):
+        payload = client.build_payload("", client.build_prompt(prompt), duration, mode, aspect_ratio)
+        key = cache_key(client.image_hash(path), payload)
+        cell = SweepCell(path, movement, template, prompt, key)
+
+        if key in by_key:
+            cell.job = by_key[key]
+            cell.duplicate = True
+        else:
+            cell.job = by_key[key] = BatchJob(image_path=path, clip_number=0, prompt=prompt, mode=mode,
+                                              duration=duration, aspect_ratio=aspect_ratio)
+            jobs.append(cell.job)
+            if client.cache is not None and client.cache.contains(key):
+                cell.cached = True
+                cached.append(cell.job)
+        cells.append(cell)
+
+    return SweepPlan(cells, jobs, mode, duration, aspect_ratio, cached)
+
+
+def print_plan(plan: SweepPlan, estimate: Dict, max_concurrency: int) -> None:
+    """Resumen del plan por consola"""
+    print(f"\n{'='*70}")
+    print("PLAN DEL BARRIDO")
+    print(f"{'='*70}")
+    images = len({cell.image_path for cell in plan.cells})
+    print(f"Celdas: {len(plan.cells)} ({images} imagen(es) x {len(plan.cells) // max(1, images)} variante(s))")
+    print(f"Repetidas (se generan una vez): {estimate['duplicates']}")
+    print(f"Ya en caché (sin render): {estimate['cached']}")
+    print(f"Renders: {estimate['renders']} ({plan.mode}, {plan.duration}s, {plan.aspect_ratio})")
+    print(f"\nRequests estimados: ~{estimate['requests']}")
+    print(f"  - Envíos: {estimate['submits']}")
+    print(f"  - Consultas de estado: ~{estimate['status_queries']} (menos con webhook)")
+    print(f"  - Descargas: {estimate['downloads']}")
+    print(f"Tiempo estimado: ~{estimate['seconds'] / 60:.0f} minutos "
+          f"({estimate['waves']} tanda(s) de {max_concurrency}, ~{estimate['render_seconds']:.0f}s por render)")
+
+
+def select_images(args) -> List:
+    """Imágenes pedidas por argumento, o las del catálogo con sus filtros"""
+    if args.imagenes:
+        images = []
+        for name in args.imagenes:
+            path = Path(name)
+            if not path.exists():
+                path = Path(args.carpeta) / name
+            if not path.exists():
+                raise ValueError(f"imagen no encontrada: {name}")
+            images.append(str(path))
+        return images
+
+    catalog = ImageCatalog(args.carpeta)
+    try:
+        catalog.refresh()
+        return catalog.list(orientation=args.orientacion, tag=args.tag)
+    finally:
+        catalog.close()
+
+
+def _names(value: Optional[str], every: Sequence[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    if value in ("todas", "todos", "all"):
+        return list(every)
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def main(argv=None) -> int:
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Barrido imagen x movimiento x plantilla")
+    parser.add_argument("imagenes", nargs="*", help="Imágenes (por defecto todas las del catálogo)")
+    parser.add_argument("--carpeta", default="images", help="Carpeta de imágenes")
+    parser.add_argument("--orientacion", choices=("portrait", "landscape", "square"),
+                        help="Solo imágenes con esta orientación")
+    parser.add_argument("--tag", help="Solo imágenes con esta etiqueta del catálogo")
+    parser.add_argument("--movimientos", help="Lista separada por comas, o 'todos'")
+    parser.add_argument("--plantillas", help="Lista separada por comas, o 'todas'")
+    parser.add_argument("--modo", choices=("std", "pro"), default="pro")
+    parser.add_argument("--duracion", type=int, choices=(5, 10), default=10)
+    parser.add_argument("--aspecto", choices=tuple(ASPECT_RATIOS), default="9:16")
+    parser.add_argument("--concurrencia", type=int,
+                        default=int(os.getenv("KLING_MAX_CONCURRENCY", "3")),
+                        help="Tareas simultáneas")
+    parser.add_argument("--plan", action="store_true", help="Solo mostrar el plan y la estimación")
+    parser.add_argument("--si", action="store_true", help="No pedir confirmación")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar clips cacheados")
+    parser.add_argument("--store", help="Archivo SQLite de trabajos (por defecto outputs/jobs.sqlite)")
+    parser.add_argument("--reel", help="Unir los clips del barrido, en orden, en este .mp4")
+    parser.add_argument("--metricas", default=os.getenv("KLING_METRICS_FILE"),
+                        help="Exportar métricas al terminar (.prom o .json)")
+    args = parser.parse_args(argv)
+
+    client = create_client(use_cache=not args.sin_cache)
+    configure_logging(stream=sys.stdout)
+    if client is None:
+        logger.error("ERROR: Credenciales no configuradas en .env (KLING_ACCESS_KEY / KLING_SECRET_KEY)")
+        return 2
+
+    template_defs = load_templates()
+    try:
+        movements = _names(args.movimientos, list(MOVEMENTS) + list(TEMPLATE_MOVEMENTS))
+        templates = _names(args.plantillas, template_defs)
+        images = select_images(args)
+        if not images:
+            raise ValueError("no hay imágenes que coincidan")
+        plan = plan_sweep(client, images, movements, templates, args.modo, args.duracion,
+                          args.aspecto, template_defs)
+    except ValueError as e:
+        logger.error(f"ERROR: {e}")
+        return 2
+
+    print_plan(plan, plan.estimate(client.polling, args.concurrencia), args.concurrencia)
+    if args.plan:
+        return 0
+    if not args.si and input("\n¿Continuar? (s/N): ").strip().lower() != 's':
+        print("Cancelado.")
+        return 0
+
+    store = JobStore(args.store)
+    try:
+        # Numbers are reserved in the store, so concurrent runs never collide
+        first_clip = reserve_clip_numbers(len(plan.jobs), store, client.manifest)
+        for i, job in enumerate(plan.jobs):
+            job.clip_number = first_clip + i
+
+        reel = ReelAssembler(args.reel, [job.clip_number for job in plan.jobs]) if args.reel else None
+        run_batch(client, plan.jobs, store, args.concurrencia,
+                  on_complete=reel.on_complete if reel is not None else None,
+                  metrics_path=args.metricas)
+        if reel is not None:
+            reel.finish()
+    finally:
+        store.close()
+        if client.webhook is not None:
+            client.webhook.stop()
+
+    print(f"\n{'='*70}")
+    print("RESULTADO DEL BARRIDO")
+    print(f"{'='*70}")
+    for cell in plan.cells:
+        variant = f"{cell.template}/{cell.movement}" if cell.template else cell.movement
+        status = "OK" if cell.job.status == "succeed" else cell.job.status
+        same = " (repetida)" if cell.duplicate else ""
+        print(f"  Clip {cell.job.clip_number:02d}  {Path(cell.image_path).name}  {variant}  {status}{same}")
+
+    failed = len([job for job in plan.jobs if job.status != "succeed"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
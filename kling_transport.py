@@ -0,0 +1,114 @@
+"""
+Transporte HTTP - Kling AI
+==========================
+
+Capa HTTP compartida por todas las llamadas de KlingAPICorrect.
+
+Usa una requests.Session con pool de conexiones por host y keep-alive,
+así el envío, las consultas de estado y las descargas reutilizan la
+misma conexión TCP+TLS en lugar de abrir una nueva por request.
+
+Reintentos:
+  - GET: reintenta errores de conexión y 5xx con backoff; los 429 los
+    maneja kling_ratelimit (frena el bucket y respeta Retry-After)
+  - POST: solo reintenta errores de conexión (la tarea no llegó a
+    enviarse); nunca reenvía un submit que el servidor pudo aceptar
+
+Uso:
+  transport = HTTPTransport(pool_maxsize=32, retries=5)
+  client = KlingAPICorrect(access_key, secret_key, transport=transport)
+
+Cualquier objeto con los métodos get()/post() de requests.Session
+puede inyectarse como transporte (tests, benchmarks).
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+from typing import Iterable, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HTTPTransport:
+    """
+    Sesión HTTP con pool, keep-alive y política de reintentos
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 32,
+        connect_timeout: float = 10,
+        read_timeout: float = 60,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        status_forcelist: Iterable[int] = (500, 502, 503, 504)
+    ):
+        """
+        Inicializar transporte
+
+        Args:
+            pool_connections: Hosts distintos con pool propio
+            pool_maxsize: Conexiones keep-alive por host
+            connect_timeout: Timeout de conexión en segundos
+            read_timeout: Timeout de lectura por defecto en segundos
+            retries: Reintentos máximos por request
+            backoff_factor: Factor de backoff exponencial entre reintentos
+            status_forcelist: Status HTTP que se reintentan (solo GET); sin
+                429, así el RateLimiter ve cada límite de la API
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=tuple(status_forcelist),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _timeout(self, timeout: Optional[Timeout]) -> Timeout:
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def get(self, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """GET sobre la sesión compartida"""
+        return self.session.get(url, timeout=self._timeout(timeout), **kwargs)
+
+    def post(self, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """POST sobre la sesión compartida"""
+        return self.session.post(url, timeout=self._timeout(timeout), **kwargs)
+
+    def close(self) -> None:
+        """Cierra todas las conexiones del pool"""
+        self.session.close()
+
+    def __enter__(self) -> "HTTPTransport":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,228 @@
+"""
+Validación de Clips - Kling AI
+==============================
+
+Revisa cada clip apenas se descarga, en un pool propio, mientras siguen
+las demás descargas y renders:
+
+  - Contenedor: recorre las cajas MP4 de primer nivel (ftyp, moov, mdat);
+    una caja que se sale del archivo es un MP4 truncado. Con ffprobe,
+    además, el archivo tiene que poder leerse
+  - Duración y resolución (ffprobe) contra lo pedido: `duration` con
+    una tolerancia y la relación de aspecto de `aspect_ratio`
+  - Póster: un cuadro del clip en clip_XX_poster.jpg (ffmpeg)
+
+El resultado se registra en el JobStore (tabla validations) y en las
+métricas kling_validations_total{result} / kling_validation_seconds.
+
+Qué hace el motor con un clip roto (ver BatchEngine._validated):
+  - Contenedor dañado   -> se vuelve a descargar (URL fresca), una vez
+  - Sigue dañado, o no coincide duración/aspecto -> se regenera (nueva
+    tarea, consume créditos), hasta `max_regenerations` veces
+  - Después de eso el trabajo queda "failed" con el motivo
+
+Sin ffprobe/ffmpeg solo se revisa la estructura del contenedor.
+KLING_VALIDATE=0 desactiva la validación en los CLIs.
+
+Uso:
+  validator = ClipValidator()
+  report = validator.validate("outputs/clip_01.mp4", duration=10, aspect_ratio="9:16")
+  future = validator.submit("outputs/clip_02.mp4", 10, "9:16")
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import logging
+import os
+import struct
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from kling_preprocess import ASPECT_RATIOS
+from kling_reel import find_tool, probe_video
+
+logger = logging.getLogger(__name__)
+
+
+# Problem kinds, in the order the engine remedies them
+CONTAINER = "container"
+MISMATCH = "mismatch"
+
+# Boxes a playable MP4 needs at the top level
+REQUIRED_BOXES = ("ftyp", "moov", "mdat")
+
+
+def check_container(path) -> Optional[str]:
+    """
+    Revisa la estructura de cajas MP4 de primer nivel
+
+    Args:
+        path: Archivo descargado
+
+    Returns:
+        Descripción del problema, o None si la estructura está completa
+    """
+    path = Path(path)
+    try:
+        size = path.stat().st_size
+        seen = []
+        with open(path, 'rb') as f:
+            offset = 0
+            while offset < size:
+                header = f.read(8)
+                if len(header) < 8:
+                    return f"caja incompleta en el byte {offset}"
+                box_size, box_type = struct.unpack(">I4s", header)
+                header_size = 8
+                if box_size == 1:
+                    extended = f.read(8)
+                    if len(extended) < 8:
+                        return f"caja incompleta en el byte {offset}"
+                    box_size = struct.unpack(">Q", extended)[0]
+                    header_size = 16
+                elif box_size == 0:
+                    box_size = size - offset  # box runs to the end of the file
+
+                name = box_type.decode("latin-1")
+                if box_size < header_size:
+                    return f"caja '{name}' inválida en el byte {offset}"
+                if offset + box_size > size:
+                    return f"truncado: '{name}' necesita {offset + box_size} bytes, hay {size}"
+
+                seen.append(name)
+                offset += box_size
+                f.seek(offset)
+    except OSError as e:
+        return f"no se pudo leer: {e}"
+
+    if not seen or seen[0] != "ftyp":
+        return "no es un MP4 (falta 'ftyp' al inicio)"
+    missing = [box for box in REQUIRED_BOXES if box not in seen]
+    if missing:
+        return f"faltan cajas: {', '.join(missing)}"
+    return None
+
+
+class ClipValidator:
+    """
+    Valida clips descargados y extrae su póster, en un pool de threads
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        duration_tolerance: float = 0.5,
+        aspect_tolerance: float = 0.02,
+        max_regenerations: int = 1,
+        posters: bool = True,
+        ffprobe: Optional[str] = None,
+        ffmpeg: Optional[str] = None
+    ):
+        """
+        Inicializar validador
+
+        Args:
+            workers: Clips validados a la vez
+            duration_tolerance: Segundos de diferencia aceptados
+            aspect_tolerance: Diferencia relativa aceptada en ancho/alto
+            max_regenerations: Nuevas tareas por clip antes de darlo por fallido
+            posters: Extraer clip_XX_poster.jpg
+            ffprobe: Ejecutable (por defecto find_tool("ffprobe"))
+            ffmpeg: Ejecutable (por defecto find_tool("ffmpeg"))
+        """
+        self.duration_tolerance = duration_tolerance
+        self.aspect_tolerance = aspect_tolerance
+        self.max_regenerations = max_regenerations
+        self.posters = posters
+        self.ffprobe = ffprobe or find_tool("ffprobe")
+        self.ffmpeg = ffmpeg or find_tool("ffmpeg")
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="validate")
+
+        if not self.ffprobe:
+            logger.debug("ffprobe no encontrado: solo se valida la estructura del MP4")
+
+    @classmethod
+    def from_env(cls) -> Optional["ClipValidator"]:
+        """Validador salvo KLING_VALIDATE=0"""
+        if os.getenv("KLING_VALIDATE", "1") in ("0", "false", "no"):
+            return None
+        return cls()
+
+    def submit(self, path, duration: int, aspect_ratio: str) -> "Future[Dict]":
+        """validate() en el pool; no bloquea"""
+        return self._pool.submit(self.validate, path, duration, aspect_ratio)
+
+    def validate(self, path, duration: int, aspect_ratio: str) -> Dict:
+        """
+        Valida un clip
+
+        Args:
+            path: Clip descargado
+            duration: Duración pedida (segundos)
+            aspect_ratio: Relación de aspecto pedida ("9:16", ...)
+
+        Returns:
+            {"ok", "kind", "problems", "codec", "width", "height",
+             "duration", "poster", "seconds"}; kind es "container",
+            "mismatch" o None
+        """
+        start = time.perf_counter()
+        path = Path(path)
+        report = {"ok": True, "kind": None, "problems": [], "codec": None, "width": None,
+                  "height": None, "duration": None, "poster": None, "seconds": 0.0}
+
+        problem = check_container(path)
+        if problem is None and self.ffprobe:
+            info = probe_video(path, self.ffprobe)
+            if info is None:
+                problem = "ffprobe no puede leer el video"
+            else:
+                report.update({key: info[key] for key in ("codec", "width", "height", "duration")})
+
+        if problem is not None:
+            report["problems"].append(problem)
+            report["kind"] = CONTAINER
+        elif self.ffprobe:
+            report["problems"] = self._mismatches(report, duration, aspect_ratio)
+            if report["problems"]:
+                report["kind"] = MISMATCH
+            elif self.posters and self.ffmpeg:
+                report["poster"] = self._poster(path, report["duration"])
+
+        report["ok"] = not report["problems"]
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+
+    def _mismatches(self, report: Dict, duration: int, aspect_ratio: str) -> List[str]:
+        problems = []
+        if report["duration"] is not None and abs(report["duration"] - duration) > self.duration_tolerance:
+            problems.append(f"duración {report['duration']:.2f}s, se pidieron {duration}s")
+
+        width, height = report["width"], report["height"]
+        if width and height and aspect_ratio in ASPECT_RATIOS:
+            w, h = ASPECT_RATIOS[aspect_ratio]
+            if abs((width / height) / (w / h) - 1) > self.aspect_tolerance:
+                problems.append(f"resolución {width}x{height} no es {aspect_ratio}")
+        return problems
+
+    def _poster(self, path: Path, duration: Optional[float]) -> Optional[str]:
+        poster = path.with_name(f"{path.stem}_poster.jpg")
+        # One second in skips fade-ins; short clips use their middle
+        at = min(1.0, (duration or 0) / 2)
+        try:
+            subprocess.run(
+                [self.ffmpeg, "-y", "-v", "error", "-ss", f"{at:.2f}", "-i", str(path),
+                 "-frames:v", "1", "-q:v", "3", str(poster)],
+                capture_output=True, check=True, timeout=60
+            )
+        except (OSError, subprocess.SubprocessError):
+            logger.warning(f"[!] No se pudo extraer el póster de {path.name}")
+            return None
+        return str(poster)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
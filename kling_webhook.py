@@ -0,0 +1,288 @@
+"""
+Receptor de Callbacks - Kling AI
+================================
+
+La API de image2video acepta un "callback_url": Kling hace un POST a esa
+URL cada vez que la tarea cambia de estado. Este módulo levanta un
+servidor HTTP liviano que recibe esos avisos y despierta a quien espera
+la tarea, así la descarga arranca apenas termina el render y casi no
+hacen falta consultas de estado.
+
+El polling queda como red de seguridad lenta (cada `safety_interval`
+segundos) por si un callback se pierde.
+
+Cada URL lleva un token aleatorio (?token=...); los POST sin ese token se
+rechazan con 403.
+
+Variables de entorno:
+  KLING_WEBHOOK=1                    activa el modo callback
+  KLING_CALLBACK_URL=https://...     URL pública que reenvía a este
+                                     receptor (túnel, proxy); sin ella se
+                                     usa http://HOST:PORT
+  KLING_CALLBACK_HOST / _PORT        interfaz y puerto donde escuchar
+
+Uso:
+  with CallbackReceiver(port=8766) as webhook:
+      client.webhook = webhook
+      client.generate_video_complete("images/01.jpg", 1)
+
+  python generar_lote.py lote.jsonl --webhook
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+CALLBACK_PATH = "/kling/callback"
+
+# Tasks whose events are kept until someone drains them
+MAX_TRACKED_TASKS = 10000
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    """Handler HTTP de los callbacks"""
+
+    protocol_version = "HTTP/1.1"
+    receiver: "CallbackReceiver" = None  # set per server class
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int) -> None:
+        body = json.dumps({"code": 0 if status == 200 else status}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        token = parse_qs(urlparse(self.path).query).get("token", [""])[0]
+        if not secrets.compare_digest(token, self.receiver.token):
+            self.receiver.count("rejected")
+            self.reply(403)
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            self.receiver.count("rejected")
+            self.reply(400)
+            return
+
+        # Callbacks carry the task itself; status queries wrap it in "data"
+        result = payload if isinstance(payload.get("data"), dict) else {"data": payload}
+        if not result["data"].get("task_id"):
+            self.receiver.count("rejected")
+            self.reply(400)
+            return
+
+        self.receiver.deliver(result)
+        self.reply(200)
+
+
+class CallbackReceiver:
+    """
+    Servidor de callbacks en un thread de fondo, con espera por tarea
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        public_url: Optional[str] = None,
+        safety_interval: float = 120
+    ):
+        """
+        Inicializar receptor
+
+        Args:
+            host: Interfaz donde escuchar ("0.0.0.0" para recibir de afuera)
+            port: Puerto (0 = uno libre)
+            public_url: URL base que ve Kling (túnel/proxy); por defecto
+                http://host:port
+            safety_interval: Segundos entre consultas de respaldo por tarea
+        """
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.safety_interval = safety_interval
+        self.token = secrets.token_urlsafe(16)
+        self.stats: Dict[str, int] = {"received": 0, "rejected": 0}
+
+        # task_id -> results not yet drained, oldest task first
+        self._events: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self.seq = 0
+
+        # task_id -> asyncio futures of async clients waiting for it
+        self._watchers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+
+        handler = type("BoundCallbackHandler", (CallbackHandler,), {"receiver": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, force: bool = False) -> Optional["CallbackReceiver"]:
+        """
+        Receptor según KLING_WEBHOOK / KLING_CALLBACK_* (sin iniciar)
+
+        Args:
+            force: Crear el receptor aunque KLING_WEBHOOK no esté activo
+
+        Returns:
+            CallbackReceiver, o None si el modo callback no está activo
+        """
+        public_url = os.getenv("KLING_CALLBACK_URL")
+        enabled = force or public_url or os.getenv("KLING_WEBHOOK", "") in ("1", "true", "yes")
+        if not enabled:
+            return None
+        return cls(
+            host=os.getenv("KLING_CALLBACK_HOST", "127.0.0.1"),
+            port=int(os.getenv("KLING_CALLBACK_PORT", "0")),
+            public_url=public_url
+        )
+
+    @property
+    def url(self) -> str:
+        """URL completa (con token) para el callback_url del payload"""
+        if self.public_url:
+            base = self.public_url
+        else:
+            host, port = self.httpd.server_address[:2]
+            base = f"http://{host}:{port}"
+        return f"{base}{CALLBACK_PATH}?token={self.token}"
+
+    def count(self, key: str) -> None:
+        with self._cond:
+            self.stats[key] += 1
+
+    def deliver(self, result: Dict) -> None:
+        """Guarda un resultado recibido y despierta a quien espera"""
+        task_id = result["data"]["task_id"]
+        with self._cond:
+            self._events.setdefault(task_id, []).append(result)
+            self._events.move_to_end(task_id)
+            while len(self._events) > MAX_TRACKED_TASKS:
+                self._events.popitem(last=False)
+            self.stats["received"] += 1
+            self.seq += 1
+            self._cond.notify_all()
+            watchers = self._watchers.pop(task_id, [])
+
+        for loop, future in watchers:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiting event loop is already closed
+                pass
+
+    def drain(self, task_id: str) -> List[Dict]:
+        """Resultados recibidos para la tarea desde la última llamada"""
+        with self._cond:
+            return self._events.pop(task_id, [])
+
+    def wait(self, task_id: str, timeout: Optional[float] = None) -> List[Dict]:
+        """
+        Bloquea hasta recibir algo para la tarea
+
+        Args:
+            task_id: ID de la tarea
+            timeout: Segundos máximos de espera
+
+        Returns:
+            Resultados recibidos (vacío si venció el timeout)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: task_id in self._events, timeout)
+            return self._events.pop(task_id, [])
+
+    def watch(self, task_id: str, loop: asyncio.AbstractEventLoop) -> "asyncio.Future":
+        """
+        Future (de `loop`) que se completa con el próximo callback de la tarea
+
+        Para clientes asyncio: esperar el future no ocupa ningún thread;
+        los resultados se leen después con drain().
+
+        Args:
+            task_id: ID de la tarea
+            loop: Event loop que espera
+
+        Returns:
+            Future que se resuelve (con None) al llegar algo para la tarea
+        """
+        future = loop.create_future()
+        with self._cond:
+            if task_id in self._events:
+                future.set_result(None)
+            else:
+                self._watchers.setdefault(task_id, []).append((loop, future))
+        return future
+
+    def unwatch(self, task_id: str, future: "asyncio.Future") -> None:
+        """Deja de esperar (p.ej. tras un timeout)"""
+        with self._cond:
+            watchers = [w for w in self._watchers.get(task_id, []) if w[1] is not future]
+            if watchers:
+                self._watchers[task_id] = watchers
+            else:
+                self._watchers.pop(task_id, None)
+
+    def wait_any(self, seq: int, timeout: Optional[float] = None) -> int:
+        """
+        Bloquea hasta que llegue cualquier callback posterior a `seq`
+
+        Leer `seq` antes de drenar evita perder un aviso que llegue
+        entre el drenaje y la espera.
+
+        Returns:
+            El `seq` actual
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout)
+            return self.seq
+
+    def wake(self) -> None:
+        """Despierta a quien espera en wait_any() sin un callback"""
+        with self._cond:
+            self.seq += 1
+            self._cond.notify_all()
+
+    def discard(self, task_id: str) -> None:
+        """Olvida los resultados de una tarea que ya se resolvió"""
+        with self._cond:
+            self._events.pop(task_id, None)
+
+    def start(self) -> "CallbackReceiver":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "CallbackReceiver":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _resolve(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
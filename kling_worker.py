@@ -0,0 +1,235 @@
+"""
+Modo Worker (varios procesos o máquinas) - Kling AI
+===================================================
+
+Varios workers toman trabajos de un mismo JobStore (SQLite) sin pisarse:
+
+  - Cada worker reclama unos pocos trabajos a la vez con un lease
+    (dueño + vencimiento) y lo renueva con un heartbeat
+  - Si un worker muere, sus leases vencen y otro worker retoma esos
+    trabajos: los que ya tenían task_id se vuelven a consultar (no se
+    paga otro render), los pendientes se envían
+  - Los números de clip se reservan al encolar, dentro de una
+    transacción, así dos procesos nunca escriben el mismo clip_XX.mp4
+  - Una descarga fallida libera el trabajo con una demora para
+    reintentarlo más tarde (en este u otro worker)
+  - Al terminar informa cuántos trabajos salieron bien, fallaron o
+    tomó otro worker; sale con código 1 si alguno falló
+
+Para varias máquinas, el archivo SQLite (y outputs/) deben estar en un
+disco compartido con locks funcionales; cada máquina respeta su propio
+KLING_MAX_CONCURRENCY, así que repartir la cuota de la cuenta entre
+los workers (p.ej. 3 workers x 1).
+
+Uso:
+  python generar_lote.py lote.jsonl --encolar     # solo registra los trabajos
+  python kling_worker.py                          # en cada núcleo / máquina
+  python kling_worker.py --concurrencia 1 --hasta-vaciar
+
+Author: AI Assistant
+Date: October 2025
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+from typing import Dict, Optional
+
+from generar_lote import create_client
+from kling_api_correcto import KlingAPICorrect
+from kling_batch import LEASE_LOST, BatchEngine, BatchJob
+from kling_jobs import FINAL_STATES, LEASE_SECONDS, JobStore, LeaseKeeper, default_worker_id
+from kling_metrics import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Toma trabajos del registro compartido y los ejecuta en un BatchEngine
+    """
+
+    def __init__(
+        self,
+        client: KlingAPICorrect,
+        store: JobStore,
+        worker_id: Optional[str] = None,
+        max_concurrency: int = 3,
+        lease_seconds: float = LEASE_SECONDS,
+        backlog: Optional[int] = None,
+        idle_seconds: float = 5,
+        retry_delay: float = 60,
+        **engine_options
+    ):
+        """
+        Inicializar worker
+
+        Args:
+            client: Cliente de la API
+            store: Registro compartido por todos los workers
+            worker_id: ID de este worker (por defecto host-pid-sufijo)
+            max_concurrency: Tareas en render simultáneas de este worker
+            lease_seconds: Vencimiento de un lease sin heartbeat
+            backlog: Trabajos tomados a la vez (por defecto 2x concurrencia);
+                chico para que el resto quede para otros workers
+            idle_seconds: Espera entre búsquedas cuando no hay trabajo
+            retry_delay: Demora antes de reintentar una descarga fallida
+            **engine_options: Opciones extra de BatchEngine
+        """
+        self.client = client
+        self.store = store
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.backlog = backlog or max_concurrency * 2
+        self.idle_seconds = idle_seconds
+        self.retry_delay = retry_delay
+
+        self.leases = LeaseKeeper(store, self.worker_id, lease_seconds)
+        self.engine = BatchEngine(
+            client,
+            max_concurrency=max_concurrency,
+            store=store,
+            on_complete=self._on_complete,
+            owner=self.worker_id,
+            **engine_options
+        )
+        # A job taken over by another worker is dropped here
+        self.leases.on_lost = self.engine.drop
+
+        self.active: Dict[int, BatchJob] = {}
+        self.processed = 0  # every job this worker let go of
+        self.counts: Dict[str, int] = {"succeed": 0, "failed": 0, "download_failed": 0, "lost": 0}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stopping = threading.Event()
+
+    def run(self, until_empty: bool = False) -> int:
+        """
+        Procesa trabajos hasta stop() (o hasta que no quede ninguno libre)
+
+        Args:
+            until_empty: Terminar cuando no haya trabajos libres ni propios
+
+        Returns:
+            Trabajos terminados por este worker
+        """
+        logger.info(f"[WORKER] {self.worker_id} iniciado", extra={"worker": self.worker_id})
+        self.leases.start()
+        self.engine.start()
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    room = self.backlog - len(self.active)
+
+                claimed = self.store.claim(self.worker_id, room, self.lease_seconds) if room > 0 else []
+                for job in claimed:
+                    with self._lock:
+                        self.active[job.job_id] = job
+                    self.leases.track(job.job_id)
+                    action = "retoma" if job.task_id else "toma"
+                    logger.info(f"[WORKER] {action} clip {job.clip_number:02d} ({job.status})",
+                                extra={"worker": self.worker_id, "clip": job.clip_number, "task_id": job.task_id})
+                    self.engine.submit(job)
+
+                with self._lock:
+                    idle = not self.active
+                if until_empty and not claimed and idle:
+                    break
+
+                self._changed.wait(self.idle_seconds)
+                self._changed.clear()
+        finally:
+            # Finish what was claimed; unclaimed work stays for other workers
+            self.engine.stop()
+            self.leases.stop()
+
+        counts = self.counts
+        logger.info(f"[WORKER] {self.worker_id} terminado: {counts['succeed']} ok, {counts['failed']} fallidos, "
+                    f"{counts['download_failed']} descargas fallidas (se reintentan), "
+                    f"{counts['lost']} tomados por otro worker",
+                    extra=dict(counts, worker=self.worker_id, processed=self.processed))
+        return self.processed
+
+    @property
+    def failures(self) -> int:
+        """Renders y descargas que fallaron en este worker"""
+        return self.counts["failed"] + self.counts["download_failed"]
+
+    def stop(self) -> None:
+        """Deja de tomar trabajos; run() vuelve cuando termina los propios"""
+        self._stopping.set()
+        self._changed.set()
+
+    def _on_complete(self, job: BatchJob) -> None:
+        if job.error == LEASE_LOST:
+            outcome = "lost"
+        elif job.status in FINAL_STATES:
+            outcome = job.status
+        else:
+            outcome = "download_failed"
+        with self._lock:
+            self.active.pop(job.job_id, None)
+            self.processed += 1
+            self.counts[outcome] += 1
+
+        # A failed download keeps its paid task_id; retry it later, anywhere
+        delay = 0 if job.status in FINAL_STATES else self.retry_delay
+        self.leases.release(job.job_id, delay)
+        self._changed.set()
+
+
+def main(argv=None) -> int:
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Worker que toma trabajos del registro compartido")
+    parser.add_argument("--store", help="Archivo SQLite de trabajos (por defecto outputs/jobs.sqlite)")
+    parser.add_argument("--concurrencia", type=int,
+                        default=int(os.getenv("KLING_MAX_CONCURRENCY", "3")),
+                        help="Tareas simultáneas de este worker")
+    parser.add_argument("--id", help="ID del worker (por defecto host-pid-sufijo)")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="Segundos sin heartbeat antes de que otro worker retome un trabajo")
+    parser.add_argument("--hasta-vaciar", action="store_true",
+                        help="Terminar cuando no queden trabajos libres")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar clips cacheados")
+    parser.add_argument("--metricas", default=os.getenv("KLING_METRICS_FILE"),
+                        help="Exportar métricas al terminar (.prom o .json)")
+    args = parser.parse_args(argv)
+
+    client = create_client(use_cache=not args.sin_cache)
+    configure_logging()
+    if client is None:
+        logger.error("ERROR: Credenciales no configuradas en .env (KLING_ACCESS_KEY / KLING_SECRET_KEY)")
+        return 2
+
+    store = JobStore(args.store)
+    worker = Worker(client, store, args.id, args.concurrencia, args.lease)
+
+    def graceful(signum, frame):
+        if worker._stopping.is_set():
+            raise KeyboardInterrupt
+        logger.info("[WORKER] Deteniendo: se terminan los trabajos tomados (Ctrl+C de nuevo para salir ya)")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, graceful)
+    signal.signal(signal.SIGTERM, graceful)
+    try:
+        worker.run(until_empty=args.hasta_vaciar)
+    except KeyboardInterrupt:
+        # Unfinished leases expire and another worker picks them up
+        pass
+    finally:
+        if args.metricas:
+            client.metrics.write(args.metricas)
+        if client.webhook is not None:
+            client.webhook.stop()
+        store.close()
+    # Non-zero when a render or download failed here, so supervisors notice
+    return 1 if worker.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
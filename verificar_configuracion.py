@@ -64,10 +64,22 @@ def verificar():
     
     # 7. Check images folder
     images_folder = Path("images")
-    if images_folder.exists():
-        images = list(images_folder.glob("*.png")) + list(images_folder.glob("*.jpg"))
-        checks.append(("[OK]", f"Carpeta images con {len(images)} imagenes"))
-    else:
+    try:
+        from kling_catalog import ImageCatalog
+    except ImportError:
+        ImageCatalog = None
+        checks.append(("[X]", "Pillow NO instalado"))
+    if images_folder.exists() and ImageCatalog is not None:
+        catalog = ImageCatalog(images_folder)
+        counts = catalog.refresh()
+        images = catalog.list()
+        unreadable = catalog.errors()
+        catalog.close()
+        checks.append(("[OK]", f"Carpeta images con {len(images)} imagenes "
+                               f"({counts['added'] + counts['updated']} indexadas ahora)"))
+        for path, error in unreadable:
+            checks.append(("[X]", f"Imagen ilegible: {Path(path).name} ({error})"))
+    elif not images_folder.exists():
         checks.append(("[X]", "Carpeta images NO encontrada"))
     
     # 8. Check outputs folder